@@ -0,0 +1,86 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from . import audit
+from .models import HoraExtra, HoraExtraArchivada, Permiso, PermisoArchivado
+
+# Archival of old permisos and horas extras.
+#
+# Closed records (anything but pendiente) dated before the horizon are moved
+# to PermisoArchivado / HoraExtraArchivada in chunks: each chunk is copied with
+# one bulk_create and removed from the hot table with a regular delete() in
+# its own transaction, so locks stay short and an interrupted run just
+# resumes. The rows keep their id. Of the post_delete handlers, the
+# RegistroEliminado tombstone (delta-sync clients must drop the row) is
+# wanted, and the audit entry is not: the rows move, they are not deleted, so
+# the audit trail is paused. The hour counters are not signal-driven and
+# already count archived rows.
+#
+# The hot tables are what every list, visibility filter, overlap check and
+# report reads; archived rows are only read on request (?include_archived=true).
+
+CHUNK_SIZE = 1000
+
+# (hot model, archive model)
+TABLAS = {
+    'permisos': (Permiso, PermisoArchivado),
+    'horas_extras': (HoraExtra, HoraExtraArchivada),
+}
+
+
+def horizonte(hoy=None):
+    """First fecha_solicitud that stays in the hot tables."""
+    return (hoy or date.today()) - timedelta(days=settings.ARCHIVO_HORIZONTE_DIAS)
+
+
+def candidatos(model, limite):
+    return model.objects.filter(fecha_solicitud__lt=limite).exclude(estado='pendiente')
+
+
+def _columns(archive):
+    return [f.attname for f in archive._meta.concrete_fields if f.attname != 'archivado_en']
+
+
+def archivar(model, archive, limite, chunk_size=CHUNK_SIZE):
+    """Moves every candidate of `model` to `archive`; returns how many rows moved."""
+    columns = _columns(archive)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(candidatos(model, limite).order_by('pk').values(*columns)[:chunk_size])
+            if not rows:
+                return moved
+            ids = [row['id'] for row in rows]
+            archive.objects.bulk_create([archive(**row) for row in rows])
+            with audit.paused():
+                model.objects.filter(pk__in=ids).delete()
+        moved += len(rows)
+
+
+def _best_ms(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def medir(model, archive, page_size=50):
+    """
+    Sizes and timings of the hot table: rows, archived rows, and the best of
+    three runs of the admin list (count plus first page by fecha_solicitud)
+    and of one employee's rows (the visibility filter for non-admin users).
+    """
+    qs = model.objects.select_related('empleado__departamento', 'aprobador_asignado').order_by('-fecha_solicitud')
+    empleado_id = model.objects.values_list('empleado_id', flat=True).order_by('-fecha_solicitud').first()
+    return {
+        'filas': model.objects.count(),
+        'archivadas': archive.objects.count(),
+        'lista_ms': _best_ms(lambda: (qs.count(), list(qs[:page_size]))),
+        'empleado_ms': _best_ms(lambda: list(qs.filter(empleado_id=empleado_id))),
+    }
@@ -0,0 +1,154 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import AuditEntry
+
+# Field-level audit trail of the HR models (AUDITED_MODELS in api.signals).
+#
+# Each instance remembers the values it was loaded with (post_init copies its
+# __dict__, no query), so on post_save the diff against them is free and a
+# post_delete keeps the last values. Entries are not written one by one: they
+# are appended to a per-request buffer once their transaction commits (rolled
+# back changes never reach it) and AuditMiddleware writes the whole buffer
+# with a single bulk_create when the request ends. Outside a request (shell,
+# commands) each entry is inserted on commit, unless the code runs inside
+# buffered().
+#
+# Queryset.update() and bulk_create() send no signals; code using them for
+# audited models calls record() itself (see liquidar_masivo).
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping columns, not worth an entry
+IGNORED_FIELDS = {'created_at', 'updated_at'}
+
+_buffer = ContextVar('audit_buffer', default=None)
+_request = ContextVar('audit_request', default=None)
+_paused = ContextVar('audit_paused', default=False)
+_fields_cache = {}
+
+
+def _fields(model):
+    try:
+        return _fields_cache[model]
+    except KeyError:
+        fields = _fields_cache[model] = [
+            (f.attname, isinstance(f, models.FileField))
+            for f in model._meta.concrete_fields
+            if not f.primary_key and f.name not in IGNORED_FIELDS
+        ]
+        return fields
+
+
+def _values(model, data):
+    """{attname: value} for the audited columns present in `data` (an instance __dict__)."""
+    values = {}
+    for attname, is_file in _fields(model):
+        if attname in data:
+            value = data[attname]
+            values[attname] = (getattr(value, 'name', value) or None) if is_file else value
+    return values
+
+
+def _actor_id():
+    request = _request.get()
+    # DRF authenticates inside the view and sets the user on the Django request
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def record(model, objeto_id, accion, cambios):
+    """Queues one entry; it is kept only if the current transaction commits."""
+    if _paused.get():
+        return
+    entry = AuditEntry(
+        modelo=model._meta.label_lower, objeto_id=objeto_id, accion=accion, cambios=cambios,
+        actor_id=_actor_id(), fecha=timezone.now(),
+    )
+    buffer = _buffer.get()
+    transaction.on_commit(lambda: _keep(buffer, entry))
+
+
+class _Buffer(list):
+    closed = False
+
+
+def _keep(buffer, entry):
+    # A transaction that commits after the buffer was written (or with no
+    # buffer at all) inserts its entry directly
+    if buffer is None or buffer.closed:
+        entry.save()
+    else:
+        buffer.append(entry)
+
+
+def flush():
+    buffer = _buffer.get()
+    if buffer:
+        entries = buffer[:]
+        buffer.clear()
+        AuditEntry.objects.bulk_create(entries, batch_size=500)
+
+
+@contextmanager
+def paused():
+    """Nothing done in the block is audited (rows moved by api.archivo are not deleted)."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+@contextmanager
+def buffered(request=None):
+    """Collects the entries of the block and writes them at the end with one bulk_create."""
+    buffer = _Buffer()
+    buffer_token = _buffer.set(buffer)
+    request_token = _request.set(request)
+    try:
+        yield
+    finally:
+        try:
+            flush()
+        except Exception:
+            # The audited changes are already committed; do not fail the request
+            logger.exception('Could not write the audit entries')
+        finally:
+            buffer.closed = True
+            _request.reset(request_token)
+            _buffer.reset(buffer_token)
+
+
+# --- Signal handlers (connected in api.signals) ---
+
+def remember(sender, instance, **kwargs):
+    original = instance.__dict__.copy()
+    original.pop('_audit_original', None)
+    instance._audit_original = original
+
+
+def on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = _values(sender, instance.__dict__)
+    if created:
+        cambios = {k: [None, v] for k, v in new.items() if v not in (None, '')}
+        accion = 'crear'
+    else:
+        # Fields deferred when the instance was loaded have no known old value
+        old = _values(sender, getattr(instance, '_audit_original', {}))
+        cambios = {k: [old[k], v] for k, v in new.items() if k in old and old[k] != v}
+        accion = 'modificar'
+    if cambios:
+        record(sender, instance.pk, accion, cambios)
+    remember(sender, instance)
+
+
+def on_delete(sender, instance, **kwargs):
+    cambios = {k: [v, None] for k, v in _values(sender, instance.__dict__).items() if v not in (None, '')}
+    record(sender, instance.pk, 'eliminar', cambios)
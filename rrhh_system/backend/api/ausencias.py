@@ -0,0 +1,156 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from django.db.models import Count
+
+from .conflicts import permisos_vigentes, vacaciones_vigentes
+from .models import Departamento, Empleado
+
+# Daily absences per department, for the heatmap and the minimum staffing
+# check on vacation requests.
+#
+# Counts come from a sweep over interval endpoints: every employee's vacations
+# are clipped to the range and merged (overlapping requests count once), each
+# merged range adds +1 on its first day and -1 after its last in a difference
+# array per department, and a running sum gives the per-day totals. A permiso
+# marks its day; the employee counts as absent once even with a vacation too.
+# Only employees currently active in the department are considered.
+
+# Longest range the heatmap serves in one request
+MAX_DIAS = 366
+
+
+def _merge(ranges):
+    """Union of (inicio, fin) inclusive date ranges sorted by inicio."""
+    merged = []
+    for inicio, fin in ranges:
+        if merged and inicio <= merged[-1][1] + timedelta(days=1):
+            if fin > merged[-1][1]:
+                merged[-1][1] = fin
+        else:
+            merged.append([inicio, fin])
+    return merged
+
+
+def _covered(merged, day):
+    # Last merged range starting on or before `day`
+    i = bisect_right(merged, [day, date.max]) - 1
+    return i >= 0 and merged[i][1] >= day
+
+
+def daily_absences(desde, hasta, departamento_ids=None, exclude_empleado=None):
+    """
+    {departamento_id: {'vacaciones': [...], 'permisos': [...], 'ausentes': [...]}}
+    with one count per day from `desde` to `hasta` (inclusive). 'ausentes' is
+    the number of distinct employees out that day for either reason.
+    """
+    n = (hasta - desde).days + 1
+    empleados = Empleado.objects.filter(estado='activo', departamento__isnull=False)
+    if departamento_ids is not None:
+        empleados = empleados.filter(departamento_id__in=departamento_ids)
+    if exclude_empleado is not None:
+        empleados = empleados.exclude(pk=exclude_empleado)
+
+    vacaciones = (
+        vacaciones_vigentes()
+        .filter(empleado__in=empleados, fecha_inicio__lte=hasta, fecha_fin__gte=desde)
+        .order_by('empleado_id', 'fecha_inicio')
+        .values_list('empleado__departamento_id', 'empleado_id', 'fecha_inicio', 'fecha_fin')
+    )
+    by_empleado = {}
+    for depto, empleado_id, inicio, fin in vacaciones:
+        by_empleado.setdefault((depto, empleado_id), []).append((max(inicio, desde), min(fin, hasta)))
+
+    result = {}
+
+    def counts(depto):
+        if depto not in result:
+            result[depto] = {'vacaciones': [0] * (n + 1), 'permisos': [0] * n, 'ausentes': None}
+        return result[depto]
+
+    merged_by_empleado = {}
+    for (depto, empleado_id), ranges in by_empleado.items():
+        merged = _merge(sorted(ranges))
+        merged_by_empleado[empleado_id] = merged
+        diff = counts(depto)['vacaciones']
+        for inicio, fin in merged:
+            diff[(inicio - desde).days] += 1
+            diff[(fin - desde).days + 1] -= 1
+
+    # Permisos on a day the employee is already on vacation add to 'permisos'
+    # but not to 'ausentes'
+    permisos = (
+        permisos_vigentes()
+        .filter(empleado__in=empleados, fecha_solicitud__range=(desde, hasta))
+        .values_list('empleado__departamento_id', 'empleado_id', 'fecha_solicitud')
+        .distinct()
+    )
+    extra = {}
+    for depto, empleado_id, dia in permisos:
+        i = (dia - desde).days
+        counts(depto)['permisos'][i] += 1
+        if not _covered(merged_by_empleado.get(empleado_id, []), dia):
+            extra.setdefault(depto, [0] * n)[i] += 1
+
+    for depto, data in result.items():
+        running, vac = 0, []
+        for delta in data['vacaciones'][:n]:
+            running += delta
+            vac.append(running)
+        data['vacaciones'] = vac
+        more = extra.get(depto, [0] * n)
+        data['ausentes'] = [v + p for v, p in zip(vac, more)]
+    return result
+
+
+def plantilla(departamento_ids=None):
+    """{departamento_id: active employees} for the given departments."""
+    qs = Empleado.objects.filter(estado='activo', departamento__isnull=False)
+    if departamento_ids is not None:
+        qs = qs.filter(departamento_id__in=departamento_ids)
+    return dict(qs.values('departamento_id').annotate(n=Count('id')).values_list('departamento_id', 'n'))
+
+
+def staffing_shortfalls(empleado, desde, hasta):
+    """
+    Days in [desde, hasta] on which `empleado` going on vacation would leave
+    their department below its minimo_personal, as (fecha, presentes, minimo).
+    Sundays are not working days and are not checked.
+    """
+    depto = empleado.departamento
+    if depto is None or depto.minimo_personal is None:
+        return []
+    # Everyone else in the department, minus those already on vacation each day
+    total = Empleado.objects.filter(estado='activo', departamento=depto).exclude(pk=empleado.pk).count()
+    vac = daily_absences(desde, hasta, [depto.id], exclude_empleado=empleado.id).get(depto.id, {}).get('vacaciones')
+    shortfalls = []
+    for i in range((hasta - desde).days + 1):
+        dia = desde + timedelta(days=i)
+        if dia.weekday() == 6:
+            continue
+        presentes = total - (vac[i] if vac else 0)
+        if presentes < depto.minimo_personal:
+            shortfalls.append((dia, presentes, depto.minimo_personal))
+    return shortfalls
+
+
+def heatmap(desde, hasta, departamento_ids=None):
+    """Payload of the departamentos/ausencias endpoint."""
+    deptos = Departamento.objects.order_by('nombre')
+    if departamento_ids is not None:
+        deptos = deptos.filter(pk__in=departamento_ids)
+    deptos = list(deptos.values('id', 'nombre', 'minimo_personal'))
+    ids = [d['id'] for d in deptos]
+    n = (hasta - desde).days + 1
+    absences = daily_absences(desde, hasta, ids)
+    staff = plantilla(ids)
+    empty = {'vacaciones': [0] * n, 'permisos': [0] * n, 'ausentes': [0] * n}
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'fechas': [desde + timedelta(days=i) for i in range(n)],
+        'departamentos': [
+            {**d, 'plantilla': staff.get(d['id'], 0), **absences.get(d['id'], empty)}
+            for d in deptos
+        ],
+    }
@@ -0,0 +1,79 @@
+import gzip
+
+from django.apps import apps
+
+# Shared by the export_jsonl / import_jsonl commands.
+#
+# Backups are JSON Lines in Django's "jsonl" serialization format (one object
+# per line, UTF-8), written model by model in FK order so a restore can insert
+# each model in batches as it streams the file.
+
+# Rebuilt by migrate (contenttypes, permissions) or not worth restoring
+# (sessions). References to them, and to groups and users, are written as
+# natural keys, since migrate numbers those rows on its own in the target
+# database. The search index is derived data and is rebuilt after import.
+DEFAULT_EXCLUDE = ('contenttypes', 'auth.permission', 'sessions', 'api.empleadotrigrama')
+
+
+def open_backup(path, mode):
+    """Opens `path` for text I/O in UTF-8, gzip-compressed when it ends in .gz."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8', newline='\n')
+
+
+def _excluded(model, exclude):
+    return model._meta.app_label in exclude or model._meta.label_lower in exclude
+
+
+def backup_models(labels=(), exclude=DEFAULT_EXCLUDE):
+    """
+    Concrete models to back up, ordered so every model comes after the models
+    it references. `labels` may name apps ("api") or models ("api.permiso");
+    empty means every installed app.
+    """
+    exclude = {e.lower() for e in exclude}
+    if labels:
+        models = []
+        for label in labels:
+            if '.' in label:
+                models.append(apps.get_model(label))
+            else:
+                models.extend(apps.get_app_config(label).get_models())
+    else:
+        models = list(apps.get_models())
+    models = [
+        m for m in models
+        if m._meta.managed and not m._meta.proxy and not _excluded(m, exclude)
+    ]
+    return order_by_dependencies(models)
+
+
+def order_by_dependencies(models):
+    """
+    Topological order over the FK / M2M references between `models`.
+    Cycles (Empleado.departamento <-> Departamento.jefe_departamento, the
+    Empleado.jefe self reference) are broken by keeping the declared order;
+    the import runs with deferred constraint checks, so they still load.
+    """
+    pending = list(dict.fromkeys(models))
+    deps = {}
+    for model in pending:
+        targets = set()
+        for field in model._meta.get_fields():
+            if (field.many_to_one or field.one_to_one or field.many_to_many) and field.concrete:
+                target = field.related_model
+                if target is not model and target in pending:
+                    targets.add(target)
+        deps[model] = targets
+
+    ordered = []
+    while pending:
+        ready = [m for m in pending if not (deps[m] - set(ordered))]
+        if not ready:
+            # Cycle: take the first pending model, ignoring what is left
+            ready = [pending[0]]
+        for model in ready:
+            ordered.append(model)
+            pending.remove(model)
+    return ordered
@@ -0,0 +1,118 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+# Versioned read-through cache for small catalogs (departamentos, cargos, jefes).
+#
+# Every model that feeds a cached response has a version counter stored in the
+# shared cache. Cached payloads are keyed by the versions of all the models
+# they depend on, so bumping a version (once the post_save / post_delete
+# transaction commits, see api.signals) makes every worker miss on its next
+# read; old entries simply
+# expire. Nothing has to be deleted, which keeps invalidation consistent across
+# gunicorn workers as long as CACHES points at a shared backend.
+
+KEY_PREFIX = 'catalog'
+PAYLOAD_TIMEOUT = 60 * 60 * 6
+STATS_FLUSH_SECONDS = 10
+
+# Hit/miss counters are accumulated per process and flushed to the shared cache
+# every few seconds, so a cache hit does not pay for an extra write.
+_local_stats = Counter()
+_last_flush = time.monotonic()
+
+
+def _version_key(model):
+    return f'{KEY_PREFIX}:version:{model._meta.label_lower}'
+
+
+def _stat_key(name):
+    return f'{KEY_PREFIX}:stats:{name}'
+
+
+def get_versions(models):
+    """Returns the current version of each model, creating missing counters."""
+    keys = [_version_key(m) for m in models]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            # Seed with the clock so a counter lost to eviction never goes back
+            # to a value that older payloads were stored under.
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def bump_version(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+    _incr_shared(_stat_key(f'invalidations:{model._meta.label_lower}'))
+
+
+def make_key(name, models, extra='', versions=None):
+    if versions is None:
+        versions = get_versions(models)
+    versions = '.'.join(str(v) for v in versions)
+    digest = hashlib.md5(extra.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{versions}:{digest}'
+
+
+def get_or_set(key, producer, timeout=PAYLOAD_TIMEOUT):
+    """Returns the cached value for `key`, computing and storing it on a miss."""
+    value = cache.get(key)
+    if value is not None:
+        record('hits')
+        return value
+    record('misses')
+    value = producer()
+    cache.set(key, value, timeout)
+    return value
+
+
+def record(name, amount=1):
+    global _last_flush
+    _local_stats[name] += amount
+    if time.monotonic() - _last_flush >= STATS_FLUSH_SECONDS:
+        flush_stats()
+
+
+def flush_stats():
+    global _last_flush
+    _last_flush = time.monotonic()
+    pending = dict(_local_stats)
+    _local_stats.clear()
+    for name, amount in pending.items():
+        _incr_shared(_stat_key(name), amount)
+
+
+def _incr_shared(key, amount=1):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def get_stats(models):
+    """Aggregated stats across all workers, for the monitoring endpoint."""
+    flush_stats()
+    labels = [m._meta.label_lower for m in models]
+    keys = [_stat_key('hits'), _stat_key('misses')] + [_stat_key(f'invalidations:{l}') for l in labels]
+    values = cache.get_many(keys)
+    hits = values.get(_stat_key('hits'), 0)
+    misses = values.get(_stat_key('misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'invalidations': {l: values.get(_stat_key(f'invalidations:{l}'), 0) for l in labels},
+        'versions': dict(zip(labels, get_versions(models))),
+    }
@@ -0,0 +1,169 @@
+import heapq
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from .models import HoraExtra, Permiso, SolicitudVacacion
+
+# Time conflicts between an employee's vacations, permisos and horas extras.
+#
+# Each of them is a half-open [inicio, fin) interval of local wall-clock time:
+# a vacation covers whole days, a permiso or hora extra its hours on
+# fecha_solicitud (an end before the start runs past midnight; an end equal to
+# the start, which the serializers reject but older or imported rows may
+# have, is read as 24 hours). Two live
+# intervals of the same employee that overlap are a conflict, whatever their
+# kinds: a permiso inside a vacation, overtime during a permiso, two vacations.
+#
+# find_conflicts checks one new interval with indexed range queries (the
+# (empleado, fecha) indexes on the three tables); sweep finds every
+# overlapping pair of a sorted stream in O(n log n) for the audit_overlaps
+# command.
+
+Interval = namedtuple('Interval', 'tipo id empleado_id inicio fin estado')
+
+VACACION, PERMISO, HORA_EXTRA = 'vacacion', 'permiso', 'hora_extra'
+
+# States that hold the time. Permisos and horas extras count while pending,
+# so a second request for the same hours is caught when it is made.
+ESTADOS_VIGENTES = {
+    VACACION: ('aprobado',),
+    PERMISO: ('pendiente', 'aprobado'),
+    HORA_EXTRA: ('pendiente', 'aprobado'),
+}
+
+# The rows written by a liquidation (views.liquidar) are balance movements,
+# not days off
+LIQUIDACION_PREFIX = 'Liquidación'
+
+# Rows fetched per query by the audit
+CHUNK_SIZE = 5000
+
+
+def _hours(fecha, inicio, fin):
+    start = datetime.combine(fecha, inicio)
+    end = datetime.combine(fecha, fin)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def vacacion(id, empleado_id, fecha_inicio, fecha_fin, estado='aprobado'):
+    start = datetime.combine(fecha_inicio, time.min)
+    end = datetime.combine(fecha_fin + timedelta(days=1), time.min)
+    return Interval(VACACION, id, empleado_id, start, end, estado)
+
+
+def permiso(id, empleado_id, fecha, hora_salida, hora_regreso, estado='pendiente'):
+    return Interval(PERMISO, id, empleado_id, *_hours(fecha, hora_salida, hora_regreso), estado)
+
+
+def hora_extra(id, empleado_id, fecha, hora_inicio, hora_fin, estado='pendiente'):
+    return Interval(HORA_EXTRA, id, empleado_id, *_hours(fecha, hora_inicio, hora_fin), estado)
+
+
+# --- Live rows ---
+
+def vacaciones_vigentes():
+    return SolicitudVacacion.objects.filter(estado__in=ESTADOS_VIGENTES[VACACION]).exclude(
+        observacion__startswith=LIQUIDACION_PREFIX,
+    )
+
+
+def permisos_vigentes():
+    return Permiso.objects.filter(estado__in=ESTADOS_VIGENTES[PERMISO])
+
+
+def horas_extras_vigentes():
+    return HoraExtra.objects.filter(estado__in=ESTADOS_VIGENTES[HORA_EXTRA])
+
+
+def _intervals(queryset, kind, chunk_size=None):
+    if kind == VACACION:
+        columns, make = ('id', 'empleado_id', 'fecha_inicio', 'fecha_fin', 'estado'), vacacion
+    elif kind == PERMISO:
+        columns, make = ('id', 'empleado_id', 'fecha_solicitud', 'hora_salida', 'hora_regreso', 'estado'), permiso
+    else:
+        columns, make = ('id', 'empleado_id', 'fecha_solicitud', 'hora_inicio', 'hora_fin', 'estado'), hora_extra
+    rows = queryset.values_list(*columns)
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    return (make(*row) for row in rows)
+
+
+# --- One new interval ---
+
+def find_conflicts(candidate):
+    """Live intervals of the candidate's employee that overlap it, by start."""
+    first_day = candidate.inicio.date()
+    last_day = (candidate.fin - timedelta(microseconds=1)).date()
+    empleado_id = candidate.empleado_id
+    # Hours may start the day before and run past midnight
+    hours_range = (first_day - timedelta(days=1), last_day)
+    found = [
+        *_intervals(vacaciones_vigentes().filter(
+            empleado_id=empleado_id, fecha_inicio__lte=last_day, fecha_fin__gte=first_day,
+        ), VACACION),
+        *_intervals(permisos_vigentes().filter(empleado_id=empleado_id, fecha_solicitud__range=hours_range), PERMISO),
+        *_intervals(horas_extras_vigentes().filter(empleado_id=empleado_id, fecha_solicitud__range=hours_range), HORA_EXTRA),
+    ]
+    conflicts = [
+        other for other in found
+        if other.inicio < candidate.fin and candidate.inicio < other.fin
+        and (other.tipo, other.id) != (candidate.tipo, candidate.id)
+    ]
+    conflicts.sort(key=lambda other: other.inicio)
+    return conflicts
+
+
+def describe(interval):
+    """Readable description for validation errors and the audit report."""
+    if interval.tipo == VACACION:
+        ultimo = (interval.fin - timedelta(days=1)).date()
+        return f'Vacación #{interval.id} del {interval.inicio.date()} al {ultimo}'
+    nombre = 'Permiso' if interval.tipo == PERMISO else 'Hora extra'
+    return (
+        f'{nombre} #{interval.id} el {interval.inicio.date()} de '
+        f'{interval.inicio:%H:%M} a {interval.fin:%H:%M} ({interval.estado})'
+    )
+
+
+# --- Whole history ---
+
+def all_intervals(empleado_ids=None, desde=None, chunk_size=CHUNK_SIZE):
+    """
+    Every live interval ordered by (empleado_id, inicio). Each table is read
+    in that order and the three streams are merged, so nothing is held in
+    memory beyond one chunk per table.
+    """
+    sources = [
+        (vacaciones_vigentes(), VACACION, ('empleado_id', 'fecha_inicio', 'id'), 'fecha_fin__gte'),
+        (permisos_vigentes(), PERMISO, ('empleado_id', 'fecha_solicitud', 'hora_salida', 'id'), 'fecha_solicitud__gte'),
+        (horas_extras_vigentes(), HORA_EXTRA, ('empleado_id', 'fecha_solicitud', 'hora_inicio', 'id'), 'fecha_solicitud__gte'),
+    ]
+    streams = []
+    for queryset, kind, ordering, since_lookup in sources:
+        if empleado_ids:
+            queryset = queryset.filter(empleado_id__in=empleado_ids)
+        if desde:
+            queryset = queryset.filter(**{since_lookup: desde})
+        streams.append(_intervals(queryset.order_by(*ordering), kind, chunk_size))
+    return heapq.merge(*streams, key=lambda i: (i.empleado_id, i.inicio))
+
+
+def sweep(intervals):
+    """
+    Yields every overlapping (earlier, later) pair of `intervals`, which must
+    be sorted by (empleado_id, inicio). Intervals still open are kept in a
+    heap by end, so the cost is O(n log n) plus one step per pair found.
+    """
+    open_intervals = []
+    empleado_id = None
+    for seq, interval in enumerate(intervals):
+        if interval.empleado_id != empleado_id:
+            open_intervals = []
+            empleado_id = interval.empleado_id
+        while open_intervals and open_intervals[0][0] <= interval.inicio:
+            heapq.heappop(open_intervals)
+        for _, _, other in open_intervals:
+            yield other, interval
+        heapq.heappush(open_intervals, (interval.fin, seq, interval))
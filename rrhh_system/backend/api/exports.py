@@ -0,0 +1,116 @@
+import csv
+import tempfile
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .pagination import keyset_chunks
+
+# Server-side exports (XLSX / CSV) for the roster, permisos and vacation
+# ledgers. Rows are read CHUNK_SIZE at a time with keyset queries
+# (pagination.keyset_chunks) and written while the response streams, so
+# memory stays flat however many rows there are: CSV goes straight to the
+# socket; XLSX is written by openpyxl in write_only mode to a temporary file
+# (a zip needs its directory at the end) and then streamed from disk.
+
+FORMATS = ('xlsx', 'csv')
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched per query while exporting
+CHUNK_SIZE = 2000
+# CSV rows per chunk sent to the client
+CSV_ROWS_PER_CHUNK = 500
+# Bytes per chunk when streaming the finished XLSX file
+XLSX_READ_SIZE = 64 * 1024
+
+
+def _final_field(model, lookup):
+    field = None
+    for part in lookup.split('__'):
+        field = model._meta.get_field(part)
+        model = field.related_model
+    return field
+
+
+def _plain(value):
+    # Excel has no timezones: local wall time, like the screens show it
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def queryset_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """
+    Yields one tuple per row of `queryset` for `columns`, a list of
+    (header, lookup) pairs. Choice fields come out as their labels.
+    """
+    lookups = [lookup for _, lookup in columns]
+    labels = []
+    for lookup in lookups:
+        field = _final_field(queryset.model, lookup)
+        labels.append(dict(field.flatchoices) if field.choices else None)
+
+    if not queryset.query.combinator:
+        # A union (see ArchiveMixin) cannot take prefetch_related and has none
+        queryset = queryset.prefetch_related(None)
+    for chunk in keyset_chunks(queryset.values(*lookups), chunk_size):
+        for row in chunk:
+            yield tuple(
+                _plain(choices.get(row[lookup], row[lookup]) if choices and row[lookup] is not None else row[lookup])
+                for lookup, choices in zip(lookups, labels)
+            )
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the UTF-8 file with the accents right
+    chunk = ['\ufeff', writer.writerow(header)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= CSV_ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def xlsx_stream(title, header, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])  # Excel's sheet name limit
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(XLSX_READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_response(formato, filename, header, rows, title=None):
+    """
+    StreamingHttpResponse downloading `rows` (an iterable of tuples matching
+    `header`) as `<filename>.<formato>`. Nothing is read until it streams.
+    """
+    if formato == 'csv':
+        response = StreamingHttpResponse(csv_stream(header, rows), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(xlsx_stream(title or filename, header, rows), content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{formato}"'
+    return response
+
+
+def export_queryset(formato, filename, queryset, columns, title=None):
+    header = [h for h, _ in columns]
+    return export_response(formato, filename, header, queryset_rows(queryset, columns), title=title)
@@ -0,0 +1,280 @@
+import operator
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+
+# Read-only fast path for large lists.
+#
+# A FastSerializer is compiled once from an existing ModelSerializer: every
+# readable field becomes a (key, column, converter) step over `.values()` rows,
+# in the serializer's own field order, with the same conversions DRF applies
+# (ISO dates, decimals as strings, absolute file URLs, omitted dotted sources).
+# Nested single objects are read through joins on the same query and nested
+# collections with one extra query each, so the output is the same JSON the
+# serializer produces without instantiating models or walking DRF fields.
+#
+# Only what the compiled serializers use is supported; anything else (e.g. a
+# SerializerMethodField) raises ImproperlyConfigured at compile time.
+
+# Step kinds
+VALUE, DOTTED, FILE, ONE, MANY = range(5)
+
+# Rows of nested collections are fetched for this many parents per query
+MANY_CHUNK_SIZE = 900
+
+
+def _identity(value):
+    return value
+
+
+def _converter(field, model_field=None):
+    """Cheapest function equivalent to field.to_representation for non-null values."""
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+        return _identity
+    if isinstance(field, (relations.RelatedField, relations.ManyRelatedField)):
+        raise ImproperlyConfigured(f'{field.field_name}: only primary key relations can be compiled')
+    if isinstance(field, drf_fields.FileField):
+        # use_url=False: the stored name
+        return str
+    if isinstance(field, drf_fields.ReadOnlyField):
+        return _identity
+    # The column already comes out of the database as the type DRF returns
+    text_column = isinstance(model_field, (models.CharField, models.TextField))
+    if isinstance(field, drf_fields.BooleanField):
+        return _identity if isinstance(model_field, models.BooleanField) else bool
+    if isinstance(field, drf_fields.ChoiceField):
+        choices = field.choice_strings_to_values
+        if text_column and all(isinstance(key, str) for key in choices.values()):
+            return _identity
+        return lambda value: choices.get(str(value), value) if value != '' else value
+    if isinstance(field, drf_fields.CharField):
+        return _identity if text_column else str
+    if isinstance(field, drf_fields.IntegerField):
+        return _identity if isinstance(model_field, models.IntegerField) else int
+    if isinstance(field, (drf_fields.DateField, drf_fields.TimeField)) and not isinstance(field, drf_fields.DateTimeField):
+        default = api_settings.DATE_FORMAT if isinstance(field, drf_fields.DateField) else api_settings.TIME_FORMAT
+        if (getattr(field, 'format', default) or '').lower() == drf_fields.ISO_8601:
+            return lambda value: value.isoformat()
+    if isinstance(field, drf_fields.DateTimeField) and not hasattr(field, 'timezone'):
+        if (getattr(field, 'format', api_settings.DATETIME_FORMAT) or '').lower() == drf_fields.ISO_8601:
+            return _DateTimeConverter(field)
+    # DecimalField and the rest: DRF's own
+    return field.to_representation
+
+
+class _DateTimeConverter:
+    """
+    ISO DateTimeField output. DRF looks the current timezone up for every
+    value; here it is resolved once per represent() call (see bind).
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self, tz):
+        fallback = self.field.to_representation
+        if tz is None:
+            def convert(value):
+                return fallback(value) if value.tzinfo is not None else value.isoformat()
+        else:
+            def convert(value):
+                if value.tzinfo is None:
+                    return fallback(value)
+                value = value.astimezone(tz).isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+
+def _plan(steps, tz):
+    """
+    Runtime form of `steps` for timezone `tz`: (getter, keys, specials).
+    Every key is first filled straight from a column in field order; the
+    specials then overwrite (or drop) the keys that need more than a copy,
+    which keeps the serializer's key order.
+    """
+    keys, columns, specials = [], [], []
+    for kind, key, spec in steps:
+        keys.append(key)
+        columns.append(spec[0])
+        if kind in (VALUE, DOTTED):
+            convert = spec[1]
+            if isinstance(convert, _DateTimeConverter):
+                spec = (spec[0], convert.bind(tz)) + spec[2:]
+            if kind == DOTTED or spec[1] is not _identity:
+                specials.append((kind, key, spec))
+        elif kind == ONE:
+            specials.append((kind, key, (spec[0], _plan(spec[1], tz))))
+        elif kind == MANY:
+            specials.append((kind, key, spec[:3] + (_plan(spec[3], tz),) + spec[4:]))
+        else:
+            specials.append((kind, key, spec))
+    getter = operator.itemgetter(*columns) if len(columns) > 1 else lambda row, c=columns[0]: (row[c],)
+    return getter, keys, specials
+
+
+def _missing_policy(field):
+    """What DRF does when an intermediate object of a dotted source is None."""
+    if field.default is not empty:
+        return ('default', field.get_default())
+    if field.allow_null:
+        return ('default', None)
+    if not field.required:
+        return ('skip', None)
+    raise ImproperlyConfigured(f'{field.field_name}: required dotted source cannot be compiled')
+
+
+class FastSerializer:
+    _compiled = {}
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.steps, self.columns = self._compile(serializer, self.model, '', top=True)
+        pk = self.model._meta.pk.attname
+        if any(kind == MANY for kind, _, _ in self.steps) and pk not in self.columns:
+            self.columns.append(pk)
+
+    @classmethod
+    def for_class(cls, serializer_class):
+        """Compiled FastSerializer for `serializer_class`, built on first use."""
+        fast = cls._compiled.get(serializer_class)
+        if fast is None:
+            fast = cls._compiled[serializer_class] = cls(serializer_class)
+        return fast
+
+    # --- Compilation ---
+
+    def _compile(self, serializer, model, prefix, top=False):
+        steps, columns = [], []
+        for field in serializer._readable_fields:
+            key = field.field_name
+            source = field.source
+
+            if isinstance(field, serializers.ListSerializer):
+                if not top:
+                    raise ImproperlyConfigured(f'{key}: nested collections are only supported at the top level')
+                rel = model._meta.get_field(source)
+                if not rel.one_to_many:
+                    raise ImproperlyConfigured(f'{key}: only reverse foreign key collections can be compiled')
+                child = field.child
+                child_steps, child_columns = self._compile(child, rel.related_model, '')
+                fk = rel.field.attname
+                steps.append((MANY, key, (model._meta.pk.attname, rel.related_model, fk, child_steps, child_columns + [fk])))
+                continue
+
+            if isinstance(field, serializers.BaseSerializer):
+                path = prefix + source.replace('.', '__') + '__'
+                related = _related_model(model, source)
+                child_steps, child_columns = self._compile(field, related, path)
+                pk_column = path + related._meta.pk.attname
+                columns.append(pk_column)
+                columns.extend(child_columns)
+                steps.append((ONE, key, (pk_column, child_steps)))
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField) or source == '*':
+                raise ImproperlyConfigured(f'{serializer.__class__.__name__}.{key} cannot be compiled')
+
+            parts = source.split('.')
+            target_model = _related_model(model, '.'.join(parts[:-1])) if len(parts) > 1 else model
+            attr = parts[-1]
+
+            display = attr.startswith('get_') and attr.endswith('_display')
+            if display:
+                # get_<field>_display: precomputed choice label lookup
+                choice_field = target_model._meta.get_field(attr[4:-8])
+                labels = {k: str(v) for k, v in choice_field.flatchoices}
+                column = prefix + '__'.join(parts[:-1] + [choice_field.name])
+                convert = lambda value, labels=labels: labels.get(value, value)
+            else:
+                model_field = target_model._meta.get_field(attr)
+                column = prefix + '__'.join(parts[:-1] + [attr])
+                if isinstance(model_field, models.FileField) and getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                    columns.append(column)
+                    steps.append((FILE, key, (column, model_field.storage)))
+                    continue
+                convert = _converter(field, model_field)
+            columns.append(column)
+
+            if len(parts) > 1:
+                # One FK id per intermediate object, to tell a missing object
+                # from a null value the way DRF's get_attribute does.
+                checks = [prefix + '__'.join(parts[:i]) for i in range(1, len(parts))]
+                columns.extend(checks)
+                steps.append((DOTTED, key, (column, convert, checks, _missing_policy(field))))
+            else:
+                steps.append((VALUE, key, (column, convert)))
+        return steps, list(dict.fromkeys(columns))
+
+    # --- Runtime ---
+
+    def values(self, queryset):
+        """`queryset` (filters, ordering, annotations kept) as `.values()` rows."""
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def represent(self, rows, request=None):
+        rows = list(rows)
+        plan = _plan(self.steps, timezone.get_current_timezone() if settings.USE_TZ else None)
+        pk = self.model._meta.pk.attname
+        collections = {}
+        for kind, key, spec in plan[2]:
+            if kind == MANY:
+                collections[key] = self._fetch_many(spec, [row[pk] for row in rows], request)
+        return [_row(plan, row, request, collections) for row in rows]
+
+    def _fetch_many(self, spec, ids, request):
+        _, related_model, fk, child_plan, child_columns = spec
+        grouped = {}
+        for i in range(0, len(ids), MANY_CHUNK_SIZE):
+            chunk = ids[i:i + MANY_CHUNK_SIZE]
+            queryset = (
+                related_model._default_manager.filter(**{f'{fk}__in': chunk})
+                .order_by(related_model._meta.pk.name)
+                .values(*child_columns)
+            )
+            for row in queryset:
+                grouped.setdefault(row[fk], []).append(_row(child_plan, row, request))
+        return grouped
+
+
+def _row(plan, row, request, collections=None):
+    getter, keys, specials = plan
+    out = dict(zip(keys, getter(row)))
+    for kind, key, spec in specials:
+        if kind == VALUE:
+            value = out[key]
+            if value is not None:
+                out[key] = spec[1](value)
+        elif kind == DOTTED:
+            column, convert, checks, (policy, default) = spec
+            if any(row[c] is None for c in checks):
+                if policy == 'skip':
+                    del out[key]
+                else:
+                    out[key] = default
+            elif out[key] is not None:
+                out[key] = convert(out[key])
+        elif kind == FILE:
+            name = out[key]
+            if not name:
+                out[key] = None
+            else:
+                url = spec[1].url(name)
+                out[key] = request.build_absolute_uri(url) if request is not None else url
+        elif kind == ONE:
+            out[key] = None if out[key] is None else _row(spec[1], row, request)
+        else:
+            out[key] = collections[key].get(out[key], [])
+    return out
+
+
+def _related_model(model, path):
+    for name in path.split('.'):
+        model = model._meta.get_field(name).related_model
+    return model
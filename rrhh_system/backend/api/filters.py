@@ -0,0 +1,17 @@
+from rest_framework import filters
+
+from . import search
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """
+    Accent-insensitive, ranked replacement for SearchFilter backed by the
+    employee trigram index. The view declares which field holds the Empleado
+    id through `search_index_field` ('pk' for Empleado itself).
+    """
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        field = getattr(view, 'search_index_field', None)
+        if field is None or not query.strip():
+            return queryset
+        return search.rank_queryset(queryset, query, field)
@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from . import conflicts
+from .models import TIPO_PERMISO_CHOICES, Permiso, PermisoArchivado, PermisoHorasMes
+
+# Monthly permiso hours per employee and tipo_permiso.
+#
+# PermisoHorasMes holds the minutes of every live permiso (the states that
+# hold the time in api.conflicts: pendiente and aprobado) by month of its
+# fecha_solicitud. PermisoViewSet moves them in the same transaction as the
+# permiso itself on create, update, approve, reject and delete, so the cap in
+# PERMISO_TOPE_HORAS_MES is checked by reading one row: reservar adds the new
+# minutes with a conditional UPDATE that only matches while the total stays
+# within the cap, which also keeps two concurrent requests from both passing.
+# Changes to an existing permiso go through cambiar, which reserves whatever
+# it adds the same way.
+#
+# Rows written outside the API (admin, imports) are not counted until
+# reconcile_permiso_horas recomputes the table from the permisos.
+
+ESTADOS = conflicts.ESTADOS_VIGENTES[conflicts.PERMISO]
+
+
+class TopeExcedido(Exception):
+    def __init__(self, tipo, usados, tope, minutos):
+        self.tipo, self.usados, self.tope, self.minutos = tipo, usados, tope, minutos
+        nombre = dict(TIPO_PERMISO_CHOICES).get(tipo, tipo)
+        super().__init__(
+            f'Se supera el tope mensual de permisos de tipo {nombre}: ya hay {usados / 60:g} h de '
+            f'{tope / 60:g} h y este permiso suma {minutos / 60:g} h.'
+        )
+
+
+def minutos(fecha, hora_salida, hora_regreso):
+    interval = conflicts.permiso(None, None, fecha, hora_salida, hora_regreso)
+    return int((interval.fin - interval.inicio).total_seconds()) // 60
+
+
+def clave(empleado_id, fecha, tipo_permiso):
+    return empleado_id, fecha.year, fecha.month, tipo_permiso
+
+
+def entrada(permiso):
+    """(clave, minutos) that `permiso` adds to the counters, or None if it does not count."""
+    if permiso.estado not in ESTADOS:
+        return None
+    fecha = permiso.fecha_solicitud
+    return (
+        clave(permiso.empleado_id, fecha, permiso.tipo_permiso),
+        minutos(fecha, permiso.hora_salida, permiso.hora_regreso),
+    )
+
+
+def tope(tipo_permiso):
+    """Monthly cap in minutes, None when the tipo has none."""
+    horas = settings.PERMISO_TOPE_HORAS_MES.get(tipo_permiso) or 0
+    return int(horas * 60) if horas > 0 else None
+
+
+def _counter(key):
+    empleado_id, anio, mes, tipo = key
+    return PermisoHorasMes.objects.filter(empleado_id=empleado_id, anio=anio, mes=mes, tipo_permiso=tipo)
+
+
+def _ensure(key):
+    empleado_id, anio, mes, tipo = key
+    PermisoHorasMes.objects.get_or_create(empleado_id=empleado_id, anio=anio, mes=mes, tipo_permiso=tipo)
+
+
+def usados(empleado_id, fecha, tipo_permiso):
+    """Minutes already counted for the employee in the month of `fecha`."""
+    return _counter(clave(empleado_id, fecha, tipo_permiso)).values_list('minutos', flat=True).first() or 0
+
+
+def reservar(empleado_id, fecha, tipo_permiso, cantidad):
+    """
+    Counts a new permiso of `cantidad` minutes, or raises TopeExcedido. Call
+    it inside the transaction that saves the permiso.
+    """
+    _reservar(clave(empleado_id, fecha, tipo_permiso), cantidad)
+
+
+def _reservar(key, cantidad):
+    limite = tope(key[3])
+    _ensure(key)
+    counter = _counter(key)
+    if limite is not None:
+        counter = counter.filter(minutos__lte=limite - cantidad)
+    if not counter.update(minutos=F('minutos') + cantidad):
+        usados = _counter(key).values_list('minutos', flat=True).first() or 0
+        raise TopeExcedido(key[3], usados, limite, cantidad)
+
+
+def mover(antes, despues):
+    """Applies a change from entrada() `antes` to entrada() `despues` (either may be None)."""
+    if antes == despues:
+        return
+    if antes:
+        # Never below zero, even if the counter missed the permiso
+        _counter(antes[0]).update(minutos=Greatest(F('minutos') - antes[1], Value(0)))
+    if despues:
+        _ensure(despues[0])
+        _counter(despues[0]).update(minutos=F('minutos') + despues[1])
+
+
+def cambiar(antes, despues):
+    """
+    Like mover() for a permiso that already counted `antes`, but when it now
+    counts more (longer, moved to another month or tipo, or back to a live
+    state) the new minutes go through reservar() and may raise TopeExcedido.
+    Call it inside the transaction that saves the permiso, with its row locked.
+    """
+    if despues is None or (antes and antes[0] == despues[0] and despues[1] <= antes[1]):
+        mover(antes, despues)
+        return
+    mover(antes, None)
+    _reservar(*despues)
+
+
+def recalcular(empleado_ids=None):
+    """{clave: minutos} computed from the permisos themselves, archived ones included."""
+    totals = defaultdict(int)
+    for model in (Permiso, PermisoArchivado):
+        permisos = model.objects.filter(estado__in=ESTADOS)
+        if empleado_ids:
+            permisos = permisos.filter(empleado_id__in=empleado_ids)
+        rows = permisos.values_list('empleado_id', 'fecha_solicitud', 'tipo_permiso', 'hora_salida', 'hora_regreso')
+        for empleado_id, fecha, tipo, salida, regreso in rows.iterator(chunk_size=conflicts.CHUNK_SIZE):
+            totals[clave(empleado_id, fecha, tipo)] += minutos(fecha, salida, regreso)
+    return totals
+
+
+def reconciliar(empleado_ids=None, dry_run=False):
+    """
+    Rewrites the counters that differ from recalcular(). Returns the
+    differences as (clave, guardado, real) sorted by clave.
+    """
+    with transaction.atomic():
+        stored = PermisoHorasMes.objects.select_for_update()
+        if empleado_ids:
+            stored = stored.filter(empleado_id__in=empleado_ids)
+        stored = {
+            (r.empleado_id, r.anio, r.mes, r.tipo_permiso): r for r in stored
+        }
+        actual = recalcular(empleado_ids)
+
+        diffs, changed, created, empty = [], [], [], []
+        for key in sorted(stored.keys() | actual.keys()):
+            row = stored.get(key)
+            guardado = row.minutos if row else 0
+            real = actual.get(key, 0)
+            if guardado != real:
+                diffs.append((key, guardado, real))
+            if row is None:
+                empleado_id, anio, mes, tipo = key
+                created.append(PermisoHorasMes(empleado_id=empleado_id, anio=anio, mes=mes, tipo_permiso=tipo, minutos=real))
+            elif real == 0:
+                empty.append(row.pk)
+            elif guardado != real:
+                row.minutos = real
+                changed.append(row)
+
+        if not dry_run:
+            PermisoHorasMes.objects.bulk_create(created, batch_size=conflicts.CHUNK_SIZE)
+            PermisoHorasMes.objects.bulk_update(changed, ['minutos'], batch_size=conflicts.CHUNK_SIZE)
+            PermisoHorasMes.objects.filter(pk__in=empty).delete()
+    return diffs
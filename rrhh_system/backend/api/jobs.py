@@ -0,0 +1,271 @@
+import os
+import socket
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobRun, PeriodicJob
+
+# Periodic jobs run by `manage.py run_jobs`.
+#
+# Jobs and their schedules are declared in code with @register; each one has
+# a PeriodicJob row holding its run state. Any number of runners may poll the
+# same database: a runner claims a due job with a single conditional UPDATE
+# (due, and no unexpired lease) that writes its own name and a lease
+# deadline, so exactly one of them gets the row. If a runner dies mid-job the
+# lease expires and another one takes over. Every run is recorded in JobRun
+# with its duration and result. Only plain UPDATEs are used, so it behaves the
+# same on SQLite and PostgreSQL.
+#
+# There is no balance snapshot job: vacation saldos are not stored anywhere,
+# SolicitudVacacionViewSet computes them from the ledger on every request
+# (_saldos_bulk for lists), so there is nothing to rebuild.
+
+
+# --- Schedules ---
+
+class Every:
+    """Fixed interval between the end of one run and the next."""
+
+    def __init__(self, **kwargs):
+        self.interval = timedelta(**kwargs)
+
+    def next_after(self, moment):
+        return moment + self.interval
+
+    def __str__(self):
+        return f'every {self.interval}'
+
+
+class Cron:
+    """
+    Five-field cron expression (minute hour day month weekday) in
+    JOBS_TIME_ZONE, not in TIME_ZONE (UTC). Fields accept *, numbers, ranges a-b, lists and /step; weekday 0 or 7 is
+    Sunday. As in cron, when both day and weekday are restricted either one
+    matching is enough.
+    """
+    BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, lo, hi) for field, (lo, hi) in zip(fields, self.BOUNDS)
+        )
+        # Python weekday(): Monday = 0
+        self.weekdays = {(d - 1) % 7 for d in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, lo, hi):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-'))
+            else:
+                start = end = int(part)
+                if step:
+                    end = hi
+            if not lo <= start <= end <= hi:
+                raise ValueError(f'Cron field out of range: {field!r}')
+            values.update(range(start, end + 1, int(step or 1)))
+        return values
+
+    def _day_matches(self, day):
+        dom = day.day in self.days
+        dow = day.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, moment):
+        zone = ZoneInfo(settings.JOBS_TIME_ZONE)
+        local = timezone.localtime(moment, zone).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        # Jump a day / hour / minute at a time; four years covers Feb 29
+        limit = local + timedelta(days=4 * 366)
+        while local < limit:
+            if local.month not in self.months or not self._day_matches(local):
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+            elif local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(local, zone)
+        raise ValueError(f'Cron expression never matches: {self.expression!r}')
+
+    def __str__(self):
+        return f'cron {self.expression} ({settings.JOBS_TIME_ZONE})'
+
+
+# --- Registry ---
+
+Job = namedtuple('Job', 'nombre func schedule lease')
+
+REGISTRY = {}
+
+
+def register(nombre, schedule, lease=timedelta(minutes=15)):
+    """
+    Declares `func` as a periodic job. It takes no arguments and may return a
+    short summary, stored in the run history. `lease` must exceed the longest
+    expected run, or a second runner could start it meanwhile.
+    """
+    def decorator(func):
+        REGISTRY[nombre] = Job(nombre, func, schedule, lease)
+        return func
+    return decorator
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def sync():
+    """Creates the PeriodicJob rows of newly registered jobs; returns {nombre: row}."""
+    rows = {row.nombre: row for row in PeriodicJob.objects.filter(nombre__in=REGISTRY)}
+    now = timezone.now()
+    for nombre, job in REGISTRY.items():
+        if nombre not in rows:
+            rows[nombre], _ = PeriodicJob.objects.get_or_create(
+                nombre=nombre, defaults={'proxima_ejecucion': job.schedule.next_after(now)},
+            )
+    return rows
+
+
+# --- Running ---
+
+def acquire(row, worker, lease, force=False):
+    """Takes the lease on `row` if it is due (or `force`) and not held by another runner."""
+    now = timezone.now()
+    claim = PeriodicJob.objects.filter(pk=row.pk, activo=True).filter(
+        Q(bloqueado_hasta__isnull=True) | Q(bloqueado_hasta__lt=now),
+    )
+    if not force:
+        claim = claim.filter(Q(proxima_ejecucion__isnull=True) | Q(proxima_ejecucion__lte=now))
+    return claim.update(bloqueado_por=worker, bloqueado_hasta=now + lease) == 1
+
+
+def run(job, row, worker):
+    """Runs a job whose lease `worker` holds, records the run and schedules the next one."""
+    started = timezone.now()
+    clock = time.perf_counter()
+    record = JobRun.objects.create(job=row, worker=worker, inicio=started)
+    try:
+        resultado, estado = job.func() or '', 'ok'
+    except Exception:
+        resultado, estado = traceback.format_exc(), 'error'
+    finished = timezone.now()
+    record.fin = finished
+    record.duracion_ms = int((time.perf_counter() - clock) * 1000)
+    record.estado = estado
+    record.resultado = str(resultado)
+    record.save(update_fields=['fin', 'duracion_ms', 'estado', 'resultado'])
+    # Release only our own lease: if it expired and someone else took over,
+    # their state wins
+    PeriodicJob.objects.filter(pk=row.pk, bloqueado_por=worker).update(
+        proxima_ejecucion=job.schedule.next_after(finished),
+        ultima_ejecucion=started,
+        ultimo_estado=estado,
+        bloqueado_por='',
+        bloqueado_hasta=None,
+    )
+    return record
+
+
+def run_pending(names=None, force=False, worker=None):
+    """One pass: runs every due job (or only `names`) this runner can claim."""
+    worker = worker or worker_name()
+    rows = sync()
+    runs = []
+    for nombre, job in REGISTRY.items():
+        if names and nombre not in names:
+            continue
+        row = rows[nombre]
+        if acquire(row, worker, job.lease, force=force):
+            runs.append(run(job, row, worker))
+    return runs
+
+
+def seconds_until_next(default):
+    """Wait until the next due job, capped at `default` seconds."""
+    nxt = PeriodicJob.objects.filter(activo=True, nombre__in=REGISTRY).exclude(
+        proxima_ejecucion__isnull=True,
+    ).order_by('proxima_ejecucion').values_list('proxima_ejecucion', flat=True).first()
+    if nxt is None:
+        return default
+    return min(default, max(1, (nxt - timezone.now()).total_seconds()))
+
+
+# --- Jobs ---
+
+@register('vencimientos_contratos', Cron('0 8 * * 1-6'))
+def vencimientos_contratos():
+    """Daily digest of contracts about to end (see notify_contract_expiry)."""
+    from . import vencimientos
+
+    dias = settings.CONTRATOS_AVISO_DIAS
+    rows, atrasados = vencimientos.proximos(dias), vencimientos.vencidos()
+    if not rows and not atrasados:
+        return 'Sin contratos por vencer'
+    whatsapp, email, encolados, sin_contacto = vencimientos.send_digests(rows, dias, atrasados)
+    return (
+        f'{len(rows)} por vencer y {len(atrasados)} vencidos; {whatsapp} WhatsApp, {email} email, '
+        f'{encolados} en resumen, {sin_contacto} sin contacto'
+    )
+
+
+@register('enviar_resumenes', Every(minutes=5))
+def enviar_resumenes():
+    """WhatsApp digests of the approvers whose window has passed (see api.notificaciones)."""
+    from . import notificaciones
+
+    mensajes, lineas = notificaciones.enviar_resumenes()
+    return f'{mensajes} resúmenes enviados ({lineas} avisos)'
+
+
+@register('purga_eliminados', Cron('30 3 * * *'))
+def purga_eliminados():
+    """Tombstones older than DELTA_SYNC_RETENTION_DAYS: those clients get 410 anyway."""
+    from .models import RegistroEliminado
+
+    limite = timezone.now() - timedelta(days=settings.DELTA_SYNC_RETENTION_DAYS)
+    borrados, _ = RegistroEliminado.objects.filter(eliminado_en__lt=limite).delete()
+    return f'{borrados} registros eliminados purgados'
+
+
+@register('reconciliar_horas_permiso', Cron('0 4 * * 0'))
+def reconciliar_horas_permiso():
+    """Catches permisos written outside the API (see reconcile_permiso_horas)."""
+    from . import horas_permiso
+
+    return f'{len(horas_permiso.reconciliar())} contadores corregidos'
+
+
+@register('archivar_historial', Cron('0 2 1 * *'), lease=timedelta(hours=2))
+def archivar_historial():
+    """Monthly move of old closed permisos / horas extras (see archive_history)."""
+    from . import archivo
+
+    limite = archivo.horizonte()
+    movidos = {nombre: archivo.archivar(model, archive, limite) for nombre, (model, archive) in archivo.TABLAS.items()}
+    return ', '.join(f'{n} {nombre}' for nombre, n in movidos.items()) + f' archivados (antes de {limite})'
+
+
+@register('purga_historial_jobs', Cron('45 3 * * 0'))
+def purga_historial_jobs():
+    limite = timezone.now() - timedelta(days=settings.JOBS_HISTORIAL_DIAS)
+    borrados, _ = JobRun.objects.filter(inicio__lt=limite).exclude(estado='en_curso').delete()
+    return f'{borrados} ejecuciones purgadas'
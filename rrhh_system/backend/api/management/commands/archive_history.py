@@ -0,0 +1,61 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves closed permisos and horas extras older than ARCHIVO_HORIZONTE_DIAS to the archive '
+        'tables in chunks, and reports hot-table sizes and query times before and after.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            help='Horizon in days (default ARCHIVO_HORIZONTE_DIAS)',
+        )
+        parser.add_argument(
+            '--tabla',
+            choices=sorted(archivo.TABLAS),
+            action='append',
+            default=[],
+            help='Only this table; repeatable',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=archivo.CHUNK_SIZE,
+            help='Rows moved per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the rows that would move',
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] is not None and options['dias'] < 0:
+            raise CommandError('--dias must not be negative')
+        limite = date.today() - timedelta(days=options['dias']) if options['dias'] is not None else archivo.horizonte()
+        self.stdout.write(f'Archiving closed rows dated before {limite}.')
+
+        for nombre in options['tabla'] or archivo.TABLAS:
+            model, archive = archivo.TABLAS[nombre]
+            if options['dry_run']:
+                self.stdout.write(f'{nombre}: {archivo.candidatos(model, limite).count()} rows would move')
+                continue
+            before = archivo.medir(model, archive)
+            start = time.perf_counter()
+            moved = archivo.archivar(model, archive, limite, chunk_size=options['chunk_size'])
+            elapsed = time.perf_counter() - start
+            after = archivo.medir(model, archive)
+            self.stdout.write(self.style.SUCCESS(f'{nombre}: {moved} rows moved in {elapsed:.1f}s'))
+            self.stdout.write(
+                f"  hot rows {before['filas']} -> {after['filas']}, archived {before['archivadas']} -> {after['archivadas']}\n"
+                f"  list (count + first page) {before['lista_ms']:.1f} -> {after['lista_ms']:.1f} ms\n"
+                f"  one employee {before['empleado_ms']:.1f} -> {after['empleado_ms']:.1f} ms"
+            )
@@ -0,0 +1,92 @@
+import csv
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import conflicts
+
+
+class Command(BaseCommand):
+    help = (
+        'Scans the whole history for overlapping vacaciones, permisos and horas extras of the '
+        'same employee (sort and sweep, O(n log n)) and reports every conflicting pair.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empleado',
+            type=int,
+            action='append',
+            default=[],
+            help='Only this employee id; repeatable',
+        )
+        parser.add_argument(
+            '--desde',
+            help='Only intervals ending on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--csv',
+            help='Also write every conflicting pair to this CSV file',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Pairs printed to the console (0 = none; the CSV always gets all)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else None
+        except ValueError:
+            raise CommandError(f'Invalid --desde date: {options["desde"]}')
+
+        start = time.perf_counter()
+        scanned = Counter()
+
+        def counted(intervals):
+            for interval in intervals:
+                scanned[interval.tipo] += 1
+                yield interval
+
+        intervals = counted(conflicts.all_intervals(empleado_ids=options['empleado'], desde=desde))
+        by_kind = Counter()
+        empleados = set()
+        out = writer = None
+        if options['csv']:
+            out = open(options['csv'], 'w', encoding='utf-8', newline='')
+            writer = csv.writer(out)
+            writer.writerow(['empleado_id', 'tipo_a', 'id_a', 'inicio_a', 'fin_a', 'tipo_b', 'id_b', 'inicio_b', 'fin_b'])
+        try:
+            for a, b in conflicts.sweep(intervals):
+                total = sum(by_kind.values())
+                by_kind[tuple(sorted((a.tipo, b.tipo)))] += 1
+                empleados.add(a.empleado_id)
+                if total < options['limit']:
+                    self.stdout.write(f'  empleado {a.empleado_id}: {conflicts.describe(a)} <> {conflicts.describe(b)}')
+                if writer:
+                    writer.writerow([
+                        a.empleado_id, a.tipo, a.id, a.inicio.isoformat(), a.fin.isoformat(),
+                        b.tipo, b.id, b.inicio.isoformat(), b.fin.isoformat(),
+                    ])
+        finally:
+            if out:
+                out.close()
+
+        total = sum(by_kind.values())
+        if total > options['limit'] > 0:
+            self.stdout.write(f'  ... {total - options["limit"]} more')
+        self.stdout.write(
+            f'Scanned {sum(scanned.values())} intervals '
+            f'({", ".join(f"{n} {k}" for k, n in sorted(scanned.items()))}) in {time.perf_counter() - start:.1f}s'
+        )
+        for (kind_a, kind_b), count in sorted(by_kind.items()):
+            self.stdout.write(f'  {kind_a} / {kind_b}: {count}')
+        if total:
+            self.stdout.write(self.style.WARNING(f'{total} conflicts across {len(empleados)} employees.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No conflicts.'))
+        if options['csv']:
+            self.stdout.write(f'Pairs written to {options["csv"]}')
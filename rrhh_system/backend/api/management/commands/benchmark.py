@@ -0,0 +1,262 @@
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from io import StringIO
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.fast import FastSerializer
+from api.models import Empleado
+from api.serializers import EmpleadoSerializer, FamiliarSerializer, EstudioSerializer, ContratoSerializer, PermisoSerializer
+from api.views import EmpleadoViewSet, PermisoViewSet, SolicitudVacacionViewSet
+
+CASES = (
+    'saldo_empleado', 'saldo_todos', 'global_ledger', 'empleados_serializer', 'empleados_fast',
+    'permisos_serializer', 'permisos_fast', 'empleado_nested_update', 'excel_import',
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the ledger, serializer and import hot paths against a seeded dataset of '
+        'each size, writes the results as JSON and compares them with a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='100,1000',
+            help='Comma separated employee counts to seed (each one is rolled back afterwards)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per case; the median is compared against the baseline',
+        )
+        parser.add_argument(
+            '--cases',
+            default=','.join(CASES),
+            help=f'Comma separated subset of: {", ".join(CASES)}',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Seed passed to create_employees',
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark_results.json',
+            help='Where to write the JSON results',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Previous results file to compare against',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.20,
+            help='Allowed slowdown over the baseline median (0.20 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers.')
+        cases = [c.strip() for c in options['cases'].split(',') if c.strip()]
+        unknown = set(cases) - set(CASES)
+        if unknown:
+            raise CommandError(f'Unknown cases: {", ".join(sorted(unknown))}')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline: {e}')
+
+        self.repeat = max(options['repeat'], 1)
+        self._excel_path = None
+        results = {}
+        try:
+            for size in sizes:
+                self.stdout.write(f'Seeding {size} employees...')
+                with transaction.atomic():
+                    call_command('create_employees', count=size, seed=options['seed'], stdout=StringIO())
+                    self._setup(size)
+                    results[str(size)] = {}
+                    for case in cases:
+                        stats = self._measure(getattr(self, f'case_{case}'))
+                        results[str(size)][case] = stats
+                        self.stdout.write(f'  {case:<24} median {stats["median"] * 1000:9.1f} ms  {stats["queries"]:>7} queries')
+                    # Benchmark data never outlives the run
+                    transaction.set_rollback(True)
+        finally:
+            if self._excel_path:
+                os.remove(self._excel_path)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeat': self.repeat,
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if baseline is not None:
+            self._compare(baseline, report, options['threshold'])
+
+    def _setup(self, size):
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+        # The employee with the longest vacation history is the worst case for the ledger
+        self.empleado = (
+            Empleado.objects.filter(estado='activo').order_by('fecha_ingreso_vigente', 'id').first()
+        )
+        self.size = size
+
+    def _measure(self, fn):
+        timings = []
+        counter = QueryCounter()
+        for _ in range(self.repeat):
+            counter.count = 0
+            with transaction.atomic(), connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+                # Writes made by a case must not leak into the next run
+                transaction.set_rollback(True)
+        return {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'queries': counter.count,
+            'runs': timings,
+        }
+
+    def _compare(self, baseline, report, threshold):
+        regressions = []
+        self.stdout.write(f'\nComparison against baseline (threshold {threshold:.0%}):')
+        for size, cases in report['results'].items():
+            for case, stats in cases.items():
+                before = baseline.get('results', {}).get(size, {}).get(case)
+                if not before or not before.get('median'):
+                    continue
+                ratio = stats['median'] / before['median']
+                flag = ''
+                if ratio > 1 + threshold:
+                    flag = '  REGRESSION'
+                    regressions.append(f'{case}@{size} ({ratio:.2f}x)')
+                self.stdout.write(f'  {case}@{size}: {before["median"] * 1000:.1f} ms -> {stats["median"] * 1000:.1f} ms ({ratio:.2f}x){flag}')
+        if regressions:
+            raise CommandError(f'Performance regressions: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    # --- Cases ---
+
+    def case_saldo_empleado(self):
+        SolicitudVacacionViewSet()._calculate_saldo_data(self.empleado)
+
+    def case_saldo_todos(self):
+        view = SolicitudVacacionViewSet()
+        for emp in Empleado.objects.all():
+            view._calculate_saldo_data(emp)
+
+    def case_global_ledger(self):
+        request = self.factory.get('/api/vacaciones-solicitudes/global_ledger/')
+        force_authenticate(request, user=self.admin)
+        response = SolicitudVacacionViewSet.as_view({'get': 'global_ledger'})(request)
+        response.render()
+
+    def case_empleados_serializer(self):
+        request = Request(self.factory.get('/api/empleados/'))
+        queryset = EmpleadoViewSet.queryset.all()
+        data = EmpleadoSerializer(queryset, many=True, context={'request': request}).data
+        JSONRenderer().render(data)
+
+    def case_empleados_fast(self):
+        # Same output as empleados_serializer, through the compiled read path
+        request = Request(self.factory.get('/api/empleados/'))
+        fast = FastSerializer.for_class(EmpleadoSerializer)
+        JSONRenderer().render(fast.represent(fast.values(EmpleadoViewSet.queryset.all()), request))
+
+    def case_permisos_serializer(self):
+        request = Request(self.factory.get('/api/permisos/'))
+        queryset = PermisoViewSet.queryset.select_related(*PermisoViewSet.related)
+        data = PermisoSerializer(queryset, many=True, context={'request': request}).data
+        JSONRenderer().render(data)
+
+    def case_permisos_fast(self):
+        request = Request(self.factory.get('/api/permisos/'))
+        fast = FastSerializer.for_class(PermisoSerializer)
+        JSONRenderer().render(fast.represent(fast.values(PermisoViewSet.queryset.all()), request))
+
+    def case_empleado_nested_update(self):
+        # Same payload the edit form sends: every nested collection resubmitted
+        empleado = EmpleadoViewSet.queryset.get(pk=self.empleado.pk)
+        data = {
+            'nombres': empleado.nombres,
+            'familiares': FamiliarSerializer(empleado.familiares.all(), many=True).data,
+            'estudios': EstudioSerializer(empleado.estudios.all(), many=True).data,
+            'contratos': ContratoSerializer(empleado.contratos.all(), many=True).data,
+        }
+        serializer = EmpleadoSerializer(empleado, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def case_excel_import(self):
+        path = self._excel_file()
+        call_command('import_employees', path=path, stdout=StringIO())
+
+    def _excel_file(self):
+        if self._excel_path and self._excel_size == self.size:
+            return self._excel_path
+        if self._excel_path:
+            os.remove(self._excel_path)
+        rows = Empleado.objects.select_related('departamento', 'cargo').order_by('id')[:self.size]
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for i, emp in enumerate(rows):
+            ws.append([
+                emp.nombres, emp.apellido_paterno, emp.apellido_materno, 90000000 + i,
+                emp.fecha_nacimiento, emp.fecha_ingreso_inicial,
+                emp.departamento.nombre if emp.departamento else 'GENERAL',
+                emp.cargo.nombre if emp.cargo else 'GENERAL',
+            ])
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        wb.save(path)
+        self._excel_path, self._excel_size = path, self.size
+        return path
@@ -1,14 +1,47 @@
 import random
-from datetime import date, timedelta
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from decimal import Decimal
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from faker import Faker
+from django.utils import timezone
+
+from api import horas_permiso, search
+from api.models import (
+    Empleado, EmpleadoTrigrama, Departamento, Cargo, Familiar, Estudio, Contrato, Permiso, HoraExtra,
+    SolicitudVacacion, VacacionGuardada,
+)
+from api.signals import VERSIONED_MODELS
+from api import cache as catalog_cache
+from .create_cargos import Command as CargosCommand
+from .create_departments import Command as DepartmentsCommand
+
+NOMBRES_M = [
+    'Juan', 'Carlos', 'Luis', 'José', 'Jorge', 'Miguel', 'Pedro', 'Marco', 'Raúl', 'Óscar',
+    'Fernando', 'Ramiro', 'Édgar', 'Víctor', 'Mario', 'Daniel', 'Álvaro', 'Rubén', 'Wilson', 'Freddy',
+]
+NOMBRES_F = [
+    'María', 'Ana', 'Rosa', 'Carmen', 'Lucía', 'Patricia', 'Sonia', 'Mónica', 'Verónica', 'Silvia',
+    'Gabriela', 'Jimena', 'Nashira', 'Inés', 'Roxana', 'Ximena', 'Elena', 'Sofía', 'Paola', 'Noemí',
+]
+APELLIDOS = [
+    'Rolón', 'Ríos', 'Orellana', 'Mamani', 'Quispe', 'Choque', 'Flores', 'Gutiérrez', 'Vargas',
+    'Rojas', 'Fernández', 'López', 'Pérez', 'Gonzáles', 'Rodríguez', 'Suárez', 'Céspedes', 'Montaño',
+    'Zurita', 'Arnez', 'Camacho', 'Terrazas', 'Peña', 'Guzmán', 'Salazar', 'Vásquez', 'Torrico',
+]
+PROVINCIAS = ['Cercado', 'Quillacollo', 'Sacaba', 'Tiquipaya', 'Colcapirhua', 'Vinto', 'Sipe Sipe']
+CARRERAS = ['Bachiller', 'Contaduría', 'Ingeniería de Sistemas', 'Administración', 'Mecánica', 'Veterinaria', 'Enfermería']
+INSTITUCIONES = ['UMSS', 'UCB', 'UPB', 'INFOCAL', 'Colegio Nacional', 'Instituto Técnico']
+OBSERVACIONES = ['Trámite bancario', 'Cita médica', 'Reunión escolar', 'Entrega de documentos', None]
+
+
+# Rows per INSERT statement in bulk_create
+INSERT_BATCH_SIZE = 1000
 
-from api.models import Employee, Departamento
 
 class Command(BaseCommand):
-    help = 'Creates a specified number of fake employees for testing.'
+    help = 'Seeds a deterministic synthetic dataset (employees with full multi-year history) for load testing.'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,41 +50,254 @@ class Command(BaseCommand):
             default=20,
             help='Number of employees to create',
         )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed; the same seed, count and --as-of date produce the same dataset on an empty database',
+        )
+        parser.add_argument(
+            '--as-of',
+            type=date.fromisoformat,
+            default=None,
+            help='Date the generated history ends at (YYYY-MM-DD, default today)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Employees generated and inserted per batch',
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=6,
+            help='Years of history to generate for permisos, horas extras and vacaciones',
+        )
 
-    @transaction.atomic
     def handle(self, *args, **options):
         count = options['count']
-        fake = Faker()
-
-        # Get all departments
-        departments = list(Departamento.objects.all())
-        if not departments:
-            raise CommandError('No departments found. Please create some departments first.')
-
-        # Predefined list of positions
-        positions = [
-            'Software Developer', 'Project Manager', 'System Analyst', 'Accountant',
-            'HR Manager', 'QA Tester', 'DevOps Engineer', 'Warehouse Manager'
-        ]
-
-        self.stdout.write(f'Creating {count} new employees...')
-        created_count = 0
-        for _ in range(count):
-            # Generate fake data
-            name = fake.name()
-            email = fake.unique.email()
-            position = random.choice(positions)
-            hire_date = date.today() - timedelta(days=random.randint(30, 365 * 5))
-            department = random.choice(departments)
-
-            # Create employee
-            Employee.objects.create(
-                name=name,
-                email=email,
-                position=position,
-                hire_date=hire_date,
-                departamento=department,
-            )
-            created_count += 1
-        
-        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully created {created_count} new employees.'))
+        batch_size = options['batch_size']
+        if count <= 0 or batch_size <= 0:
+            raise CommandError('--count and --batch-size must be positive.')
+
+        rng = random.Random(options['seed'])
+        # Every generated date is relative to --as-of, never to the clock
+        self.today = options['as_of'] or date.today()
+        self.history_start = self.today.replace(year=self.today.year - options['years'])
+        self.now = timezone.make_aware(datetime.combine(self.today, dtime(12)))
+
+        departamentos, cargos = self._ensure_catalogs()
+        # CI/email must be unique across runs; offset them past existing rows
+        offset = (Empleado.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+
+        self.stdout.write(f'Creating {count} employees in batches of {batch_size}...')
+        start = time.perf_counter()
+        totals = {}
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            with transaction.atomic():
+                batch_totals = self._create_batch(rng, offset + created, size, departamentos, cargos)
+            for key, value in batch_totals.items():
+                totals[key] = totals.get(key, 0) + value
+            created += size
+            self.stdout.write(f'  {created}/{count} employees ({time.perf_counter() - start:.1f}s)')
+
+        for model in VERSIONED_MODELS:
+            catalog_cache.bump_version(model)
+
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f'{v} {k}' for k, v in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'\nFinished in {elapsed:.1f}s: {summary}.'))
+
+    def _ensure_catalogs(self):
+        existing = set(Departamento.objects.values_list('nombre', flat=True))
+        Departamento.objects.bulk_create([Departamento(nombre=n) for n in DepartmentsCommand.DEPARTMENTS if n not in existing])
+        existing = set(Cargo.objects.values_list('nombre', flat=True))
+        Cargo.objects.bulk_create([Cargo(nombre=n) for n in CargosCommand.CARGOS if n not in existing])
+        return list(Departamento.objects.values_list('id', flat=True)), list(Cargo.objects.values_list('id', flat=True))
+
+    def _random_date(self, rng, start, end):
+        span = (end - start).days
+        return start + timedelta(days=rng.randint(0, max(span, 0)))
+
+    def _create_batch(self, rng, first_number, size, departamentos, cargos):
+        empleados = []
+        for n in range(first_number, first_number + size):
+            sexo = rng.choice('MF')
+            nombres = rng.choice(NOMBRES_M if sexo == 'M' else NOMBRES_F)
+            if rng.random() < 0.4:
+                nombres += ' ' + rng.choice(NOMBRES_M if sexo == 'M' else NOMBRES_F)
+            ingreso = self._random_date(rng, self.today - timedelta(days=365 * 15), self.today - timedelta(days=30))
+            # A third of the staff were rehired: the vigente cycle starts later
+            vigente = ingreso if rng.random() < 0.66 else self._random_date(rng, ingreso, self.today - timedelta(days=30))
+            empleados.append(Empleado(
+                nombres=nombres,
+                apellido_paterno=rng.choice(APELLIDOS),
+                apellido_materno=rng.choice(APELLIDOS) if rng.random() < 0.9 else None,
+                ci=str(3000000 + n),
+                fecha_nacimiento=self._random_date(rng, date(1960, 1, 1), date(2004, 12, 31)),
+                sexo=sexo,
+                estado_civil=rng.choice('SCCDV'),
+                celular=str(rng.randint(60000000, 79999999)),
+                email=f'empleado{n}@seed.example.com',
+                provincia=rng.choice(PROVINCIAS),
+                direccion=f'Calle {rng.randint(1, 300)} #{rng.randint(1, 2000)}',
+                tipo_vivienda=rng.choice('PAF'),
+                nacionalidad='Boliviana',
+                tiene_hijos=rng.random() < 0.6,
+                fecha_ingreso_inicial=ingreso,
+                fecha_ingreso_vigente=vigente,
+                estado='activo' if rng.random() < 0.93 else 'inactivo',
+                cargo_id=rng.choice(cargos),
+                departamento_id=rng.choice(departamentos),
+            ))
+        Empleado.objects.bulk_create(empleados, batch_size=INSERT_BATCH_SIZE)
+
+        familiares, estudios, contratos = [], [], []
+        for emp in empleados:
+            for _ in range(rng.randint(0, 3)):
+                familiares.append(Familiar(
+                    empleado_id=emp.id,
+                    nombre_completo=f'{rng.choice(NOMBRES_M + NOMBRES_F)} {emp.apellido_paterno}',
+                    parentesco=rng.choice(['padre', 'madre', 'esposo/a', 'hijo/a', 'hijo/a', 'hermano/a']),
+                    celular=str(rng.randint(60000000, 79999999)),
+                    fecha_nacimiento=self._random_date(rng, date(1950, 1, 1), self.today),
+                ))
+            for _ in range(rng.randint(1, 2)):
+                estudios.append(Estudio(
+                    empleado_id=emp.id,
+                    nivel=rng.choice(['secundaria', 'tecnico', 'universitario', 'curso']),
+                    carrera=rng.choice(CARRERAS),
+                    institucion=rng.choice(INSTITUCIONES),
+                    estado=rng.choice(['concluido', 'concluido', 'cursando', 'inconcluso']),
+                ))
+            contratos.extend(self._contratos(rng, emp))
+        Familiar.objects.bulk_create(familiares, batch_size=INSERT_BATCH_SIZE)
+        Estudio.objects.bulk_create(estudios, batch_size=INSERT_BATCH_SIZE)
+        Contrato.objects.bulk_create(contratos, batch_size=INSERT_BATCH_SIZE)
+
+        vigentes = {c.empleado_id: c.id for c in contratos if c.estado_contrato == 'vigente'}
+        jefes = dict(Departamento.objects.filter(jefe_departamento__isnull=False).values_list('id', 'jefe_departamento_id'))
+
+        permisos, horas, solicitudes, guardadas = [], [], [], []
+        for emp in empleados:
+            contrato_id = vigentes.get(emp.id)
+            jefe_id = jefes.get(emp.departamento_id)
+            desde = max(emp.fecha_ingreso_inicial, self.history_start)
+            for _ in range(rng.randint(2, 10)):
+                salida = rng.randint(8, 16)
+                permisos.append(Permiso(
+                    empleado_id=emp.id,
+                    aprobador_asignado_id=jefe_id,
+                    fecha_solicitud=self._random_date(rng, desde, self.today),
+                    tipo_permiso=rng.choice(['personal', 'personal', 'trabajo', 'hora_almuerzo']),
+                    observacion=rng.choice(OBSERVACIONES),
+                    hora_salida=dtime(salida, rng.choice([0, 30])),
+                    hora_regreso=dtime(min(salida + rng.randint(1, 3), 23), rng.choice([0, 30])),
+                    estado=rng.choice(['aprobado', 'aprobado', 'aprobado', 'pendiente', 'anulado']),
+                ))
+            for _ in range(rng.randint(0, 4)):
+                inicio = rng.randint(17, 20)
+                horas.append(HoraExtra(
+                    empleado_id=emp.id,
+                    aprobador_asignado_id=jefe_id,
+                    fecha_solicitud=self._random_date(rng, desde, self.today),
+                    tipo_hora_extra=rng.choice(['horas_extras', 'horas_extras', 'compensacion']),
+                    hora_inicio=dtime(inicio, 0),
+                    hora_fin=dtime(inicio + rng.randint(1, 3), 0),
+                    estado=rng.choice(['aprobado', 'aprobado', 'pendiente', 'anulado']),
+                ))
+            # Vacaciones del ciclo vigente: una o dos salidas por año de antigüedad
+            ciclo = emp.fecha_ingreso_vigente
+            years = max((self.today - ciclo).days // 365, 0)
+            for y in range(1, years + 1):
+                aniversario = ciclo + timedelta(days=365 * y)
+                for _ in range(rng.randint(1, 2)):
+                    inicio = aniversario + timedelta(days=rng.randint(0, 300))
+                    if inicio >= self.today:
+                        break
+                    dias = rng.randint(1, 7)
+                    solicitudes.append(SolicitudVacacion(
+                        empleado_id=emp.id,
+                        aprobador_id=jefe_id,
+                        contrato_id=contrato_id,
+                        fecha_solicitud=inicio - timedelta(days=rng.randint(1, 20)),
+                        fecha_inicio=inicio,
+                        fecha_fin=inicio + timedelta(days=dias - 1),
+                        dias_calculados=Decimal(dias),
+                        estado='aprobado' if rng.random() < 0.95 else 'anulado',
+                        fecha_aprobacion=self.now,
+                    ))
+            if rng.random() < 0.35:
+                guardadas.append(VacacionGuardada(
+                    empleado_id=emp.id,
+                    contrato_id=contrato_id,
+                    dias=Decimal(rng.randint(1, 20)),
+                    gestion=f'{ciclo.year}-{ciclo.year + 1}',
+                    fecha=ciclo,
+                ))
+        Permiso.objects.bulk_create(permisos, batch_size=INSERT_BATCH_SIZE)
+        HoraExtra.objects.bulk_create(horas, batch_size=INSERT_BATCH_SIZE)
+        # fecha_solicitud is auto_now_add, which bulk_create overwrites with
+        # today: put the generated request dates back afterwards
+        fechas = [s.fecha_solicitud for s in solicitudes]
+        SolicitudVacacion.objects.bulk_create(solicitudes, batch_size=INSERT_BATCH_SIZE)
+        for solicitud, fecha in zip(solicitudes, fechas):
+            solicitud.fecha_solicitud = fecha
+        SolicitudVacacion.objects.bulk_update(solicitudes, ['fecha_solicitud'], batch_size=INSERT_BATCH_SIZE)
+        VacacionGuardada.objects.bulk_create(guardadas, batch_size=INSERT_BATCH_SIZE)
+
+        # created_at/updated_at (and fecha_creacion) are auto_now: anchor them
+        # to --as-of so the same seed always yields the same rows
+        ids = [emp.id for emp in empleados]
+        Empleado.objects.filter(id__in=ids).update(created_at=self.now, updated_at=self.now)
+        for model in (Contrato, Permiso, HoraExtra, SolicitudVacacion):
+            model.objects.filter(empleado_id__in=ids).update(created_at=self.now, updated_at=self.now)
+        VacacionGuardada.objects.filter(empleado_id__in=ids).update(
+            created_at=self.now, updated_at=self.now, fecha_creacion=self.today,
+        )
+
+        # bulk_create skips post_save, so index the batch directly
+        rows = search.build_rows(empleados)
+        EmpleadoTrigrama.objects.bulk_create(rows, batch_size=INSERT_BATCH_SIZE * 10)
+        # ...and the monthly permiso counters are not reserved either
+        contadores = horas_permiso.reconciliar(ids)
+
+        return {
+            'empleados': len(empleados), 'familiares': len(familiares), 'estudios': len(estudios),
+            'contratos': len(contratos), 'permisos': len(permisos), 'horas extras': len(horas),
+            'solicitudes': len(solicitudes), 'guardadas': len(guardadas), 'trigramas': len(rows),
+            'contadores de permiso': len(contadores),
+        }
+
+    def _contratos(self, rng, emp):
+        contratos = []
+        # Contratos anteriores al ciclo vigente (recontratación)
+        if emp.fecha_ingreso_vigente > emp.fecha_ingreso_inicial:
+            contratos.append(Contrato(
+                empleado_id=emp.id,
+                tipo_contrato='plazo_fijo',
+                tipo_trabajador='eventual',
+                contrato_fiscal=rng.choice(['avicola', 'ovoplus', 'soya_cruz', 'opticargo']),
+                fecha_inicio=emp.fecha_ingreso_inicial,
+                fecha_fin=emp.fecha_ingreso_vigente - timedelta(days=1),
+                salario_base=Decimal(rng.randint(2500, 6000)),
+                jornada_laboral='tiempo_completo',
+                estado_contrato='finalizado',
+            ))
+        plazo_fijo = rng.random() < 0.3
+        contratos.append(Contrato(
+            empleado_id=emp.id,
+            tipo_contrato='plazo_fijo' if plazo_fijo else 'indefinido',
+            tipo_trabajador='eventual' if plazo_fijo else 'permanente',
+            contrato_fiscal=rng.choice(['avicola', 'avicola', 'ovoplus', 'soya_cruz', 'opticargo']),
+            fecha_inicio=emp.fecha_ingreso_vigente,
+            fecha_fin=None if emp.estado == 'activo' else self.today - timedelta(days=rng.randint(1, 200)),
+            fecha_fin_pactada=self.today + timedelta(days=rng.randint(-30, 365)) if plazo_fijo else None,
+            salario_base=Decimal(rng.randint(2500, 12000)),
+            jornada_laboral=rng.choice(['tiempo_completo', 'tiempo_completo', 'medio_tiempo', 'turnos']),
+            estado_contrato='vigente' if emp.estado == 'activo' else 'finalizado',
+        ))
+        return contratos
@@ -7,8 +7,15 @@ from datetime import datetime
 class Command(BaseCommand):
     help = 'Imports employees from an Excel file'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='../../Empleados.xlsx',
+            help='Excel file to import (no header row)',
+        )
+
     def handle(self, *args, **options):
-        excel_path = '../../Empleados.xlsx'
+        excel_path = options['path']
         self.stdout.write(self.style.SUCCESS(f'Importing employees from {excel_path}'))
 
         try:
@@ -0,0 +1,150 @@
+import json
+import time
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from api import search
+from api import cache as catalog_cache
+from api.backup import open_backup
+from api.signals import VERSIONED_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        'Restores a backup written by export_jsonl. Objects are streamed from the file and '
+        'inserted with bulk_create in batches inside a single transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Backup file (.jsonl or .jsonl.gz)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Objects inserted per bulk_create',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database to restore into',
+        )
+
+    def handle(self, *args, **options):
+        self.using = options['database']
+        self.batch_size = options['batch_size']
+        connection = connections[self.using]
+        start = time.perf_counter()
+        self.counts = {}
+        self.m2m = {}
+
+        try:
+            with open_backup(options['path'], 'r') as stream, transaction.atomic(using=self.using):
+                # Same as loaddata: FK cycles (Empleado <-> Departamento) are
+                # only checked once everything is in.
+                with connection.constraint_checks_disabled(), _stored_timestamps():
+                    self._load(stream)
+                connection.check_constraints(table_names=[m._meta.db_table for m in self.counts])
+                self._reset_sequences(connection)
+        except FileNotFoundError:
+            raise CommandError(f'{options["path"]} does not exist.')
+        except DeserializationError as e:
+            raise CommandError(f'Invalid backup file: {e}')
+
+        # bulk_create does not send post_save: rebuild the derived data here
+        search.rebuild_index()
+        for model in VERSIONED_MODELS:
+            catalog_cache.bump_version(model)
+
+        total = sum(self.counts.values())
+        for model, count in self.counts.items():
+            self.stdout.write(f'  {model._meta.label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} objects in {time.perf_counter() - start:.1f}s'
+        ))
+
+    def _load(self, stream):
+        model, batch, deferred = None, [], []
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                label = data['model']
+            except (ValueError, TypeError, KeyError) as e:
+                raise DeserializationError(e)
+            # Flush before deserializing the first object of the next model:
+            # its natural-key references (users, groups) are looked up in the
+            # database as it is built
+            if label != model or len(batch) >= self.batch_size:
+                self._flush(model, batch)
+                model, batch = label, []
+            for deserialized in PythonDeserializer([data], using=self.using, handle_forward_references=True):
+                obj = deserialized.object
+                batch.append(obj)
+                if deserialized.deferred_fields:
+                    deferred.append(deserialized)
+                for field_name, values in (deserialized.m2m_data or {}).items():
+                    if values:
+                        # Rows without a pk get theirs from bulk_create
+                        self.m2m.setdefault((type(obj), field_name), []).append((obj, values))
+        self._flush(model, batch)
+        self._flush_m2m()
+        for deserialized in deferred:
+            deserialized.save_deferred_fields(using=self.using)
+
+    def _flush(self, label, batch):
+        if not batch:
+            return
+        model = apps.get_model(label)
+        # Like loaddata, a row whose pk already exists (e.g. the groups created
+        # by migrations) is overwritten with the backed-up values.
+        fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+        model._base_manager.using(self.using).bulk_create(
+            batch, update_conflicts=bool(fields), ignore_conflicts=not fields,
+            unique_fields=[model._meta.pk.name] if fields else None, update_fields=fields or None,
+        )
+        self.counts[model] = self.counts.get(model, 0) + len(batch)
+
+    def _flush_m2m(self):
+        for (model, field_name), rows in self.m2m.items():
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            links = [through(**{source: obj.pk, target: value}) for obj, values in rows for value in values]
+            through._base_manager.using(self.using).bulk_create(links, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def _reset_sequences(self, connection):
+        # Rows were inserted with explicit pks; move the sequences past them
+        sql = connection.ops.sequence_reset_sql(no_style(), list(self.counts))
+        if sql:
+            with connection.cursor() as cursor:
+                for statement in sql:
+                    cursor.execute(statement)
+
+
+@contextmanager
+def _stored_timestamps():
+    """
+    bulk_create runs pre_save, which would stamp auto_now / auto_now_add fields
+    with the restore time; keep the backed-up values instead (loaddata gets the
+    same effect from raw saves).
+    """
+    fields = [
+        f for model in apps.get_models() for f in model._meta.concrete_fields
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
@@ -0,0 +1,420 @@
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, time as dtime, timedelta
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from api import conflicts, horas_permiso
+from api.models import Empleado, Permiso, PermisoHorasMes
+
+LOADTEST_USER = 'loadtest'
+LOADTEST_MARKER = 'loadtest'
+
+# Weights follow what the frontend actually calls: every screen loads its list
+# with ?no_pagination=true and the vacation screens ask for the saldo of the
+# selected employee on each change.
+DEFAULT_MIX = {
+    'saldo': 30,
+    'empleados': 10,
+    'permisos': 15,
+    'permisos_create': 10,
+    'vacaciones_solicitudes': 10,
+    'horas_extras': 5,
+    'departamentos': 10,
+    'cargos': 5,
+    'global_ledger': 5,
+}
+
+# permisos_create asks for one PERMISO_TIPO permiso of PERMISO_MINUTOS on a
+# day within the next PERMISO_DIAS
+PERMISO_TIPO = 'personal'
+PERMISO_MINUTOS = 90
+PERMISO_DIAS = 30
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class PermisoSlots:
+    """
+    Permisos the API will accept, handed out to the clients: each one on a
+    day where the employee has no live vacation, permiso or hora extra (one
+    per employee and day, so they do not overlap each other either), and only
+    while the employee's month stays within PERMISO_TOPE_HORAS_MES. Otherwise
+    permisos_create would mostly measure the 400 of the conflict or cap check.
+    """
+
+    def __init__(self, empleado_ids, rng, hoy):
+        ultimo = hoy + timedelta(days=PERMISO_DIAS - 1)
+        ocupados = set()
+        # Hours may start the day before and run past midnight
+        for interval in conflicts.all_intervals(empleado_ids, hoy - timedelta(days=1)):
+            dia = interval.inicio.date()
+            hasta = min((interval.fin - timedelta(microseconds=1)).date(), ultimo)
+            while dia <= hasta:
+                ocupados.add((interval.empleado_id, dia))
+                dia += timedelta(days=1)
+
+        self.tope = horas_permiso.tope(PERMISO_TIPO)
+        self.usados = Counter()
+        if self.tope is not None:
+            counters = PermisoHorasMes.objects.filter(
+                empleado_id__in=empleado_ids, tipo_permiso=PERMISO_TIPO, anio__gte=hoy.year,
+            ).values_list('empleado_id', 'anio', 'mes', 'minutos')
+            for empleado_id, anio, mes, minutos in counters:
+                self.usados[empleado_id, anio, mes] = minutos
+
+        dias = [hoy + timedelta(days=n) for n in range(PERMISO_DIAS)]
+        self.libres = [(e, d) for e in empleado_ids for d in dias if (e, d) not in ocupados]
+        rng.shuffle(self.libres)
+        self.lock = threading.Lock()
+
+    def take(self):
+        """(empleado_id, fecha) of the next free slot, None once they run out."""
+        with self.lock:
+            while self.libres:
+                empleado_id, fecha = self.libres.pop()
+                mes = (empleado_id, fecha.year, fecha.month)
+                if self.tope is not None and self.usados[mes] + PERMISO_MINUTOS > self.tope:
+                    continue
+                self.usados[mes] += PERMISO_MINUTOS
+                return empleado_id, fecha
+            return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Boots the app under gunicorn against the configured (seeded) database and replays '
+        'a weighted mix of the frontend calls from concurrent clients, reporting throughput '
+        'and p50/p95/p99 latency per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Target an already running server instead of booting one (e.g. http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='gunicorn sync workers to boot (production runs 4)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Concurrent clients; each waits for its response before the next request',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Measured seconds',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=float,
+            default=5,
+            help='Seconds of traffic before measuring (fills caches and connections)',
+        )
+        parser.add_argument(
+            '--mix',
+            help='Endpoint weights, e.g. "saldo=50,permisos=20,global_ledger=5". '
+                 f'Endpoints: {", ".join(DEFAULT_MIX)}',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Seed for the request sequence',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the report as JSON to this path',
+        )
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Keep the permisos created during the run',
+        )
+        parser.add_argument(
+            '--allow-database',
+            action='store_true',
+            help='Run even with DEBUG off: the run creates permisos and a superuser token in the configured database',
+        )
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options['allow_database']):
+            raise CommandError(
+                'DEBUG is off, so this may be a production database. The load test writes to it; '
+                'pass --allow-database if that is intended.'
+            )
+        mix = self._parse_mix(options['mix'])
+        empleado_ids = list(Empleado.objects.filter(estado='activo').values_list('id', flat=True)[:1000])
+        if not empleado_ids:
+            raise CommandError('The database has no active employees; seed it first with create_employees --count N.')
+        self.permiso_slots = None
+        if mix.get('permisos_create'):
+            self.permiso_slots = PermisoSlots(empleado_ids, random.Random(options['seed']), date.today())
+            self.stdout.write(f'{len(self.permiso_slots.libres)} free permiso slots for permisos_create')
+
+        user, created = User.objects.get_or_create(
+            username=LOADTEST_USER, defaults={'is_staff': True, 'is_superuser': True},
+        )
+        if not (user.is_active and user.is_superuser):
+            # The mix calls admin-only endpoints: the numbers would be 403s
+            raise CommandError(
+                f'User "{LOADTEST_USER}" already exists without superuser rights; '
+                'give it superuser access or delete it.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+
+        server = None
+        base_url = options['url']
+        # Ids of the permisos this run created, filled in by the clients
+        self.created_ids = []
+        try:
+            if not base_url:
+                server, base_url = self._boot_server(options['workers'])
+            self.stdout.write(
+                f'Target {base_url}: {options["concurrency"]} clients, '
+                f'{options["warmup"]:.0f}s warmup + {options["duration"]:.0f}s measured'
+            )
+            samples, elapsed = self._run(base_url, token.key, mix, empleado_ids, options)
+        finally:
+            if server is not None:
+                self._stop_server(server)
+            if not options['keep_data']:
+                self._delete_permisos(self.created_ids)
+            if created:
+                user.delete()
+
+        report = self._report(samples, elapsed)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+    def _delete_permisos(self, ids):
+        # Like PermisoViewSet.perform_destroy: release their monthly hours too
+        with transaction.atomic():
+            permisos = Permiso.objects.select_for_update().filter(pk__in=ids)
+            for permiso in permisos:
+                horas_permiso.mover(horas_permiso.entrada(permiso), None)
+            Permiso.objects.filter(pk__in=ids).delete()
+
+    def _parse_mix(self, spec):
+        if not spec:
+            return dict(DEFAULT_MIX)
+        mix = {}
+        for part in spec.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in DEFAULT_MIX:
+                raise CommandError(f'Unknown endpoint "{name}". Choose from: {", ".join(DEFAULT_MIX)}')
+            try:
+                mix[name] = float(weight) if weight else 1.0
+            except ValueError:
+                raise CommandError(f'Invalid weight for "{name}": {weight}')
+        if not any(mix.values()):
+            raise CommandError('--mix needs at least one positive weight.')
+        return mix
+
+    def _boot_server(self, workers):
+        if importlib.util.find_spec('gunicorn') is None:
+            raise CommandError('gunicorn is not installed; install it or pass --url to target a running server.')
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+
+        env = dict(os.environ)
+        # Never message real phones from a load test, and measure without the
+        # DEBUG query log that production does not have.
+        env['WHATSAPP_TOKEN'] = ''
+        env['WHATSAPP_PHONE_ID'] = ''
+        env['DEBUG'] = 'False'
+        env['ALLOWED_HOSTS'] = '127.0.0.1,localhost'
+
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', 'rrhh_backend.wsgi:application',
+                '--workers', str(workers), '--worker-class', 'sync',
+                '--bind', f'127.0.0.1:{port}', '--timeout', '120', '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with code {server.returncode} while booting.')
+            try:
+                # The first request also waits for a worker to import Django
+                requests.get(f'{base_url}/api/me/', timeout=30)
+                self.stdout.write(f'gunicorn booted with {workers} sync workers on port {port}')
+                return server, base_url
+            except requests.ConnectionError:
+                time.sleep(0.2)
+            except requests.RequestException:
+                break
+        self._stop_server(server)
+        raise CommandError('gunicorn did not answer within 30s.')
+
+    def _stop_server(self, server):
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    def _request_for(self, name, rng, empleado_ids):
+        """
+        (method, path, json body) for one call of the given endpoint, None
+        when permisos_create has no free slot left.
+        """
+        if name == 'saldo':
+            return 'GET', f'/api/vacaciones-solicitudes/saldo/?empleado_id={rng.choice(empleado_ids)}', None
+        if name == 'global_ledger':
+            return 'GET', '/api/vacaciones-solicitudes/global_ledger/', None
+        if name == 'permisos_create':
+            slot = self.permiso_slots.take()
+            if slot is None:
+                return None
+            empleado_id, fecha = slot
+            salida = dtime(rng.randint(8, 15), rng.choice([0, 30]))
+            regreso = (datetime.combine(fecha, salida) + timedelta(minutes=PERMISO_MINUTOS)).time()
+            return 'POST', '/api/permisos/', {
+                'empleado': empleado_id,
+                'fecha_solicitud': fecha.isoformat(),
+                'tipo_permiso': PERMISO_TIPO,
+                'hora_salida': f'{salida:%H:%M}',
+                'hora_regreso': f'{regreso:%H:%M}',
+                'observacion': LOADTEST_MARKER,
+            }
+        path = {
+            'empleados': '/api/empleados/',
+            'permisos': '/api/permisos/',
+            'vacaciones_solicitudes': '/api/vacaciones-solicitudes/',
+            'horas_extras': '/api/horas-extras/',
+            'departamentos': '/api/departamentos/',
+            'cargos': '/api/cargos/',
+        }[name]
+        return 'GET', f'{path}?no_pagination=true', None
+
+    def _run(self, base_url, token, mix, empleado_ids, options):
+        names = list(mix)
+        weights = [mix[n] for n in names]
+        samples = []
+        lock = threading.Lock()
+        start = time.monotonic()
+        measure_from = start + options['warmup']
+        stop_at = measure_from + options['duration']
+
+        def client(index):
+            rng = random.Random(options['seed'] + index)
+            session = requests.Session()
+            session.headers['Authorization'] = f'Token {token}'
+            local = []
+            client_names, client_weights = list(names), list(weights)
+            while True:
+                now = time.monotonic()
+                if now >= stop_at:
+                    break
+                name = rng.choices(client_names, client_weights)[0]
+                request = self._request_for(name, rng, empleado_ids)
+                if request is None:
+                    # Out of permiso slots: the rest of the mix keeps going
+                    i = client_names.index(name)
+                    del client_names[i], client_weights[i]
+                    if not any(client_weights):
+                        break
+                    continue
+                method, path, body = request
+                t0 = time.perf_counter()
+                try:
+                    response = session.request(method, base_url + path, json=body, timeout=120)
+                    status = response.status_code
+                    if method == 'POST' and status == 201:
+                        # Recorded right away so an interrupted run still cleans up
+                        with lock:
+                            self.created_ids.append(response.json()['id'])
+                except (requests.RequestException, ValueError, KeyError):
+                    status = 0
+                latency = time.perf_counter() - t0
+                if now >= measure_from:
+                    local.append((name, latency, status))
+            with lock:
+                samples.extend(local)
+
+        threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(options['concurrency'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return samples, options['duration']
+
+    def _stats(self, entries, elapsed):
+        """
+        Latency percentiles of the 2xx responses only: a 400 from validation
+        or a 500 returns at a different speed than the work being measured,
+        so the non-2xx ones are counted by status instead (0 = no response).
+        """
+        latencies = sorted(lat for lat, status in entries if 200 <= status < 300)
+        errores = Counter(status for _, status in entries if not 200 <= status < 300)
+        return {
+            'requests': len(entries),
+            'errors': sum(errores.values()),
+            'error_status': {str(status): n for status, n in sorted(errores.items())},
+            'rps': len(entries) / elapsed,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        }
+
+    def _report(self, samples, elapsed):
+        by_endpoint = {}
+        for name, latency, status in samples:
+            by_endpoint.setdefault(name, []).append((latency, status))
+
+        rows = {name: self._stats(entries, elapsed) for name, entries in sorted(by_endpoint.items())}
+        total = self._stats([(latency, status) for _, latency, status in samples], elapsed)
+
+        def ms(value):
+            return f'{value * 1000:8.1f}' if value is not None else '       -'
+
+        self.stdout.write(f'\n{"endpoint":<24}{"reqs":>7}{"errs":>6}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+        for name, r in list(rows.items()) + [('TOTAL', total)]:
+            self.stdout.write(
+                f'{name:<24}{r["requests"]:>7}{r["errors"]:>6}{r["rps"]:>8.1f}'
+                f' {ms(r["p50"])} {ms(r["p95"])} {ms(r["p99"])} {ms(r["max"])}'
+            )
+        self.stdout.write('Latencies are of the 2xx responses only.')
+        failed = [(name, r) for name, r in rows.items() if r['errors']]
+        if failed:
+            self.stdout.write(self.style.WARNING('\nNon-2xx responses (status: count, 0 = no response):'))
+            for name, r in failed:
+                detail = ', '.join(f'{status}: {n}' for status, n in r['error_status'].items())
+                self.stdout.write(f'  {name:<22}{detail}')
+        return {'duration': elapsed, 'endpoints': rows, 'total': total}
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import vencimientos
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends one digest per HR user (WhatsApp, or email when they have no celular) with the '
+        'vigente fixed-term contracts ending within the next N days and those already overdue. '
+        'HR users who prefer digests get the lines queued instead, once per contract. '
+        'Meant to run daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=settings.CONTRATOS_AVISO_DIAS,
+            help='Look-ahead window in days (default CONTRATOS_AVISO_DIAS)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the contracts and recipients without sending anything',
+        )
+
+    def handle(self, *args, **options):
+        dias = options['dias']
+        if dias < 0:
+            raise CommandError('--dias must not be negative')
+        rows, atrasados = vencimientos.proximos(dias), vencimientos.vencidos()
+        for r in [*atrasados, *rows]:
+            self.stdout.write(
+                f"  contrato {r['id']}: {r['empleado_nombre']} ends {r['fecha_fin_pactada']} ({r['dias_restantes']} days)"
+            )
+        if not rows and not atrasados:
+            self.stdout.write(self.style.SUCCESS(f'No contracts ending within {dias} days.'))
+            return
+        whatsapp, email, encolados, sin_contacto = vencimientos.send_digests(
+            rows, dias, atrasados, dry_run=options['dry_run'],
+        )
+        verb = 'Would send' if options['dry_run'] else 'Sent'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(rows)} contracts ending, {len(atrasados)} overdue; {verb} {whatsapp} WhatsApp and {email} email '
+            f'digests, queued lines for {encolados} digest users.'
+        ))
+        if sin_contacto:
+            self.stdout.write(self.style.WARNING(f'{sin_contacto} HR users have neither celular nor email.'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the accent-insensitive trigram index used by employee search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Employees processed per batch',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding employee search index...')
+        start = time.perf_counter()
+        written = search.rebuild_index(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Finished. Wrote {written} trigrams in {elapsed:.1f}s.'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import horas_permiso
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the monthly permiso hour counters (PermisoHorasMes) from the permisos and '
+        'fixes the ones that differ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empleado',
+            type=int,
+            action='append',
+            default=[],
+            help='Only this employee id; repeatable',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the differences without writing them',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Differences printed to the console (0 = none)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        diffs = horas_permiso.reconciliar(options['empleado'], dry_run=options['dry_run'])
+        for (empleado_id, anio, mes, tipo), guardado, real in diffs[:options['limit']]:
+            self.stdout.write(f'  empleado {empleado_id} {anio}-{mes:02d} {tipo}: {guardado} -> {real} min')
+        if len(diffs) > options['limit'] > 0:
+            self.stdout.write(f'  ... {len(diffs) - options["limit"]} more')
+        elapsed = time.perf_counter() - start
+        if not diffs:
+            self.stdout.write(self.style.SUCCESS(f'All counters match ({elapsed:.1f}s).'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(diffs)} counters differ ({elapsed:.1f}s); nothing written.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(diffs)} counters fixed ({elapsed:.1f}s).'))
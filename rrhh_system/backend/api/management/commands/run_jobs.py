@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Avg, Max
+
+from api import jobs
+from api.models import JobRun
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the periodic jobs declared in api/jobs.py. Several instances may run at once: '
+        'each job is claimed through a lease on its database row.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due and exit instead of polling',
+        )
+        parser.add_argument(
+            '--job',
+            action='append',
+            default=[],
+            help='Only this job; repeatable',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run the selected jobs now even if they are not due (implies --once)',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Show the jobs, their schedule, next run and average duration',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['job']) - set(jobs.REGISTRY)
+        if unknown:
+            raise CommandError(f'Unknown jobs: {", ".join(sorted(unknown))}. Known: {", ".join(jobs.REGISTRY)}')
+        if options['list']:
+            return self.list_jobs()
+
+        worker = jobs.worker_name()
+        if options['once'] or options['force']:
+            self.run_pass(worker, options['job'], options['force'])
+            return
+
+        self.stdout.write(f'Job runner {worker} started ({len(jobs.REGISTRY)} jobs).')
+        try:
+            while True:
+                self.run_pass(worker, options['job'], False)
+                # Long sleeps outlive the DB connection
+                close_old_connections()
+                time.sleep(jobs.seconds_until_next(settings.JOBS_POLL_SECONDS))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+
+    def run_pass(self, worker, names, force):
+        for record in jobs.run_pending(names, force=force, worker=worker):
+            line = f'{record.job.nombre}: {record.estado} in {record.duracion_ms} ms'
+            if record.estado == 'ok':
+                self.stdout.write(self.style.SUCCESS(f'{line}. {record.resultado}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'{line}\n{record.resultado}'))
+
+    def list_jobs(self):
+        rows = jobs.sync()
+        stats = {
+            s['job__nombre']: s for s in JobRun.objects.filter(estado='ok').values('job__nombre').annotate(
+                avg_ms=Avg('duracion_ms'), max_ms=Max('duracion_ms'),
+            )
+        }
+        for nombre, job in jobs.REGISTRY.items():
+            row = rows[nombre]
+            stat = stats.get(nombre)
+            self.stdout.write(
+                f'{nombre} [{job.schedule}]{"" if row.activo else " (inactive)"}\n'
+                f'  next: {row.proxima_ejecucion}  last: {row.ultima_ejecucion or "-"} {row.ultimo_estado}'
+                + (f'  avg {stat["avg_ms"]:.0f} ms, max {stat["max_ms"]} ms' if stat else '')
+                + (f'\n  leased by {row.bloqueado_por} until {row.bloqueado_hasta}' if row.bloqueado_por else '')
+            )
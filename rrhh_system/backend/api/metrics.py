@@ -0,0 +1,208 @@
+import os
+import socket
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+
+# Per-request timing (see api.middleware.PerformanceMiddleware) and the
+# latency histograms exposed on /api/metrics/ in Prometheus text format.
+#
+# Each worker aggregates its own histograms in memory and publishes a snapshot
+# to the shared cache every FLUSH_SECONDS; the endpoint sums the snapshots of
+# all workers, so it does not matter which gunicorn worker answers the scrape.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_SECONDS = 15
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+_WORKERS_KEY = 'metrics:workers'
+_WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+_current = ContextVar('request_timings', default=None)
+
+# {(view, method, phase): [bucket counts..., +Inf count, sum]}
+_histograms = {}
+# {(view, method): number of queries}
+_queries = {}
+_last_flush = 0.0
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.render = 0.0
+        self.ext = 0.0
+        self.serialize = 0.0
+        self._serializing = False
+
+    def phases(self):
+        total = time.perf_counter() - self.start
+        return {
+            'total': total,
+            'db': self.db,
+            'serialize': self.serialize,
+            'render': self.render,
+            'ext': self.ext,
+            'app': max(total - self.db - self.serialize - self.render - self.ext, 0.0),
+        }
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def track(phase='ext'):
+    """
+    Adds the time spent inside the block to the current request's `phase`.
+    Used around external calls (WhatsApp, SMTP); a no-op outside requests.
+    """
+    timings = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            setattr(timings, phase, getattr(timings, phase) + time.perf_counter() - start)
+
+
+@contextmanager
+def serializing():
+    """
+    Adds the time spent inside the block building response data (serializer
+    .data, api.fast) to the 'serialize' phase, minus the queries it runs
+    (lazy querysets, relations), which stay in 'db'. Nested blocks count once.
+    """
+    timings = _current.get()
+    if timings is None or timings._serializing:
+        yield
+        return
+    start, db = time.perf_counter(), timings.db
+    timings._serializing = True
+    try:
+        yield
+    finally:
+        timings._serializing = False
+        timings.serialize += max(time.perf_counter() - start - (timings.db - db), 0.0)
+
+
+def query_timer(execute, sql, params, many, context):
+    """connection.execute_wrapper hook counting queries and DB time."""
+    timings = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.db += time.perf_counter() - start
+            timings.queries += 1
+
+
+def observe(view, method, timings):
+    phases = timings.phases()
+    for phase, seconds in phases.items():
+        hist = _histograms.get((view, method, phase))
+        if hist is None:
+            hist = _histograms[(view, method, phase)] = [0] * (len(BUCKETS) + 2)
+        hist[bisect_left(BUCKETS, seconds)] += 1
+        hist[-1] += seconds
+    _queries[(view, method)] = _queries.get((view, method), 0) + timings.queries
+
+    if time.monotonic() - _last_flush >= FLUSH_SECONDS:
+        flush()
+    return phases
+
+
+def server_timing_header(phases, queries):
+    parts = [
+        f'db;dur={phases["db"] * 1000:.1f};desc="{queries} queries"',
+        f'serialize;dur={phases["serialize"] * 1000:.1f}',
+        f'render;dur={phases["render"] * 1000:.1f}',
+        f'ext;dur={phases["ext"] * 1000:.1f}',
+        f'app;dur={phases["app"] * 1000:.1f}',
+        f'total;dur={phases["total"] * 1000:.1f}',
+    ]
+    return ', '.join(parts)
+
+
+def flush():
+    """Publishes this worker's snapshot to the shared cache."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    snapshot = {
+        'histograms': {'|'.join(k): v for k, v in _histograms.items()},
+        'queries': {'|'.join(k): v for k, v in _queries.items()},
+    }
+    cache.set(f'metrics:worker:{_WORKER_ID}', snapshot, SNAPSHOT_TIMEOUT)
+    workers = cache.get(_WORKERS_KEY) or []
+    if _WORKER_ID not in workers:
+        cache.set(_WORKERS_KEY, workers + [_WORKER_ID], SNAPSHOT_TIMEOUT)
+
+
+def collect():
+    """Sums the snapshots of every worker that is still publishing."""
+    flush()
+    workers = cache.get(_WORKERS_KEY) or []
+    snapshots = cache.get_many([f'metrics:worker:{w}' for w in workers])
+    alive = [w for w in workers if f'metrics:worker:{w}' in snapshots]
+    if len(alive) != len(workers):
+        cache.set(_WORKERS_KEY, alive, SNAPSHOT_TIMEOUT)
+
+    histograms, queries = {}, {}
+    for snap in snapshots.values():
+        for key, values in snap['histograms'].items():
+            acc = histograms.setdefault(key, [0] * len(values))
+            for i, v in enumerate(values):
+                acc[i] += v
+        for key, value in snap['queries'].items():
+            queries[key] = queries.get(key, 0) + value
+    return histograms, queries
+
+
+def _labels(**labels):
+    inner = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    return '{' + inner + '}'
+
+
+def render_prometheus(extra_lines=()):
+    histograms, queries = collect()
+    lines = [
+        '# HELP rrhh_request_phase_seconds Request latency by view, method and phase.',
+        '# TYPE rrhh_request_phase_seconds histogram',
+    ]
+    for key in sorted(histograms):
+        view, method, phase = key.split('|')
+        values = histograms[key]
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            lines.append(f'rrhh_request_phase_seconds_bucket{_labels(view=view, method=method, phase=phase, le=bound)} {cumulative}')
+        cumulative += values[len(BUCKETS)]
+        lines.append(f'rrhh_request_phase_seconds_bucket{_labels(view=view, method=method, phase=phase, le="+Inf")} {cumulative}')
+        lines.append(f'rrhh_request_phase_seconds_sum{_labels(view=view, method=method, phase=phase)} {values[-1]:.6f}')
+        lines.append(f'rrhh_request_phase_seconds_count{_labels(view=view, method=method, phase=phase)} {cumulative}')
+
+    lines += [
+        '# HELP rrhh_request_db_queries_total SQL queries executed by view and method.',
+        '# TYPE rrhh_request_db_queries_total counter',
+    ]
+    for key in sorted(queries):
+        view, method = key.split('|')
+        lines.append(f'rrhh_request_db_queries_total{_labels(view=view, method=method)} {queries[key]}')
+
+    lines.extend(extra_lines)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,84 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import audit, metrics
+from .nplusone import NPlusOneDetector
+
+
+class PerformanceMiddleware:
+    """
+    Records per request the number of queries and DB time, the time spent
+    building the response data (metrics.serializing, see
+    TimedSerializationMixin), the render time of DRF responses and the time
+    spent in external calls (metrics.track), sends them back in a
+    Server-Timing header and feeds the /api/metrics/ histograms.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timings, token = metrics.start_request()
+        try:
+            with connection.execute_wrapper(metrics.query_timer):
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        phases = metrics.observe(view, request.method, timings)
+        response['Server-Timing'] = metrics.server_timing_header(phases, timings.queries)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; time it with a
+        # post-render callback.
+        timings = metrics.current()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def finish(rendered):
+                timings.render += time.perf_counter() - start
+
+            response.add_post_render_callback(finish)
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Opt-in N+1 detection for development (NPLUSONE_DETECTION = 'log' or
+    'raise'). Removed from the stack when the setting is 'off'.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.mode = getattr(settings, 'NPLUSONE_DETECTION', 'off')
+        self.threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        detector = NPlusOneDetector(threshold=self.threshold, mode=self.mode)
+        with detector.connection.execute_wrapper(detector):
+            response = self.get_response(request)
+        detector.check(f'{request.method} {request.path}')
+        return response
+
+
+class AuditMiddleware:
+    """
+    Buffers the audit entries of the request (api.audit) and writes them with
+    one bulk_create when it ends.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit.buffered(request):
+            return self.get_response(request)
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_search_index(apps, schema_editor):
+    from api.search import empleado_trigrams
+
+    Empleado = apps.get_model('api', 'Empleado')
+    EmpleadoTrigrama = apps.get_model('api', 'EmpleadoTrigrama')
+    rows = []
+    for emp in Empleado.objects.all().iterator(chunk_size=2000):
+        rows.extend(EmpleadoTrigrama(empleado_id=emp.id, trigrama=g) for g in empleado_trigrams(emp))
+        if len(rows) >= 20000:
+            EmpleadoTrigrama.objects.bulk_create(rows)
+            rows = []
+    EmpleadoTrigrama.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_empleado_estado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmpleadoTrigrama',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='api.empleado')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigrama', 'empleado'], name='api_trigrama_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'trigrama'), name='uniq_empleado_trigrama')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
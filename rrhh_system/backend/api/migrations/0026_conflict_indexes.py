@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_timestamps_registroeliminado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horaextra',
+            index=models.Index(fields=['empleado', 'fecha_solicitud'], name='api_horaextra_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='permiso',
+            index=models.Index(fields=['empleado', 'fecha_solicitud'], name='api_permiso_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudvacacion',
+            index=models.Index(fields=['empleado', 'fecha_inicio', 'fecha_fin'], name='api_vacacion_rango_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_conflict_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departamento',
+            name='minimo_personal',
+            field=models.PositiveIntegerField(blank=True, help_text='Empleados que deben quedar presentes cada día; vacío = sin control al aprobar vacaciones', null=True),
+        ),
+    ]
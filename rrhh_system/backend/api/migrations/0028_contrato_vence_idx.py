@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_departamento_minimo_personal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(fields=['estado_contrato', 'fecha_fin_pactada'], name='api_contrato_vence_idx'),
+        ),
+    ]
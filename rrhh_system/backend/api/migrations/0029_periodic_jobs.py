@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_contrato_vence_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodicJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('proxima_ejecucion', models.DateTimeField(blank=True, null=True)),
+                ('ultima_ejecucion', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_estado', models.CharField(blank=True, default='', max_length=10)),
+                ('bloqueado_por', models.CharField(blank=True, default='', max_length=100)),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(max_length=100)),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('duracion_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('ok', 'OK'), ('error', 'Error')], default='en_curso', max_length=10)),
+                ('resultado', models.TextField(blank=True, default='')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ejecuciones', to='api.periodicjob')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', 'inicio'], name='api_jobrun_job_inicio_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_periodic_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermisoHorasMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('tipo_permiso', models.CharField(choices=[('trabajo', 'Trabajo'), ('personal', 'Personal'), ('hora_almuerzo', 'Hora Almuerzo')], max_length=20)),
+                ('minutos', models.PositiveIntegerField(default=0)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='permiso_horas_mes', to='api.empleado')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'anio', 'mes', 'tipo_permiso'), name='uniq_permiso_horas_mes')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_audit_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoraExtraArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('fecha_solicitud', models.DateField()),
+                ('tipo_hora_extra', models.CharField(choices=[('compensacion', 'Compensación de Hrs Extra'), ('horas_extras', 'Horas Extras')], max_length=20)),
+                ('observacion', models.TextField(blank=True, null=True)),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('aprobado', 'Aprobado'), ('anulado', 'Anulado')], max_length=20)),
+                ('comentario_aprobador', models.TextField(blank=True, null=True)),
+                ('fecha_aprobacion', models.DateTimeField(blank=True, null=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('aprobador_asignado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.empleado')),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.empleado')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empleado', 'fecha_solicitud'], name='api_hearch_emp_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PermisoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('fecha_solicitud', models.DateField()),
+                ('tipo_permiso', models.CharField(choices=[('trabajo', 'Trabajo'), ('personal', 'Personal'), ('hora_almuerzo', 'Hora Almuerzo')], max_length=20)),
+                ('observacion', models.TextField(blank=True, null=True)),
+                ('hora_salida', models.TimeField()),
+                ('hora_regreso', models.TimeField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('aprobado', 'Aprobado'), ('anulado', 'Anulado')], max_length=20)),
+                ('comentario_aprobador', models.TextField(blank=True, null=True)),
+                ('fecha_aprobacion', models.DateTimeField(blank=True, null=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('aprobador_asignado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.empleado')),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.empleado')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empleado', 'fecha_solicitud'], name='api_permarch_emp_fecha_idx')],
+            },
+        ),
+    ]
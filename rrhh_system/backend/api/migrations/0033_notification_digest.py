@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='preferencia_notificacion',
+            field=models.CharField(choices=[('inmediata', 'Inmediata'), ('resumen', 'Resumen periódico')], default='inmediata', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='NotificacionPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=100)),
+                ('objeto_id', models.BigIntegerField()),
+                ('texto', models.CharField(max_length=500)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('destinatario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_pendientes', to='api.empleado')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['destinatario', 'creado_en'], name='api_notifpend_dest_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_notification_digest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='horaextraarchivada',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('aprobado', 'Aprobado'), ('anulado', 'Anulado')], default='pendiente', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='permisoarchivado',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('aprobado', 'Aprobado'), ('anulado', 'Anulado')], default='pendiente', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_archive_shared_bases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroeliminado',
+            name='aprobador_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registroeliminado',
+            name='empleado_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
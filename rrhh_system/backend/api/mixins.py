@@ -0,0 +1,307 @@
+import hashlib
+import re
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import cache as catalog_cache
+from . import metrics
+from .fast import FastSerializer
+from .models import RegistroEliminado, TimestampedModel
+from .pagination import is_cursor_request, keyset_chunks
+
+
+class VersionedViewMixin:
+    """
+    Reads model version counters (see api.cache) at most once per request,
+    however many mixins need them; DRF builds a view instance per request.
+    """
+
+    def get_model_versions(self, models):
+        memo = self.__dict__.setdefault('_model_versions', {})
+        missing = [m for m in models if m not in memo]
+        if missing:
+            memo.update(zip(missing, catalog_cache.get_versions(missing)))
+        return [memo[m] for m in models]
+
+
+class CachedListMixin(VersionedViewMixin):
+    """
+    Serves `list` from the versioned catalog cache (see api.cache).
+    `cache_models` lists every model whose changes must invalidate the
+    response, including the ones only read through nested serializers.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        key = catalog_cache.make_key(
+            self.__class__.__name__,
+            self.cache_models,
+            f'{request.get_host()}?{request.GET.urlencode()}',
+            versions=self.get_model_versions(self.cache_models),
+        )
+
+        def produce():
+            return _plain(super(CachedListMixin, self).list(request, *args, **kwargs).data)
+
+        return Response(catalog_cache.get_or_set(key, produce))
+
+
+class ConditionalGetMixin(VersionedViewMixin):
+    """
+    ETag / If-None-Match for `list` and `retrieve`. The tag is a fingerprint
+    computed before serializing:
+
+    - timestamped models: Max(updated_at) and Count of the filtered queryset
+      (the count catches deletions), or the object's updated_at on detail;
+    - the versions of `etag_models` (see api.cache), for the related rows the
+      payload embeds (names, departamento, contrato);
+    - the query string and the user, since querysets are per user.
+
+    A matching If-None-Match gets a 304 without running the serializer.
+    Catalog views without timestamps fall back to their `cache_models`.
+    """
+    etag_models = ()
+
+    def get_etag_models(self):
+        return self.etag_models or getattr(self, 'cache_models', ())
+
+    def _etag(self, request, *parts):
+        versions = self.get_model_versions(self.get_etag_models())
+        raw = '|'.join(str(p) for p in (
+            self.__class__.__name__, request.user.pk, sorted(request.GET.lists()), *versions, *parts,
+        ))
+        return '"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    def _conditional(self, request, etag, produce):
+        not_modified = get_conditional_response(request, etag=etag)
+        response = not_modified if not_modified is not None else produce()
+        response['ETag'] = etag
+        # Let browsers keep the body but always revalidate it
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # Delta sync responses carry server_time and are already small; the
+        # fingerprint of a cursor page would cost the COUNT the cursor avoids
+        if 'updated_since' in request.query_params or is_cursor_request(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.get_queryset()
+        if issubclass(queryset.model, TimestampedModel):
+            stats = self.filter_queryset(queryset).aggregate(last=Max('updated_at'), total=Count('pk'))
+            parts = (stats['last'], stats['total'])
+        elif self.get_etag_models():
+            parts = ()
+        else:
+            # Nothing would ever change the tag
+            return super().list(request, *args, **kwargs)
+        etag = self._etag(request, 'list', *parts)
+        return self._conditional(request, etag, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self._etag(request, 'detail', instance.pk, getattr(instance, 'updated_at', ''))
+        return self._conditional(request, etag, lambda: Response(_serialized(self.get_serializer(instance))))
+
+
+class DeltaSyncMixin:
+    """
+    `?updated_since=<ISO 8601>` on `list` returns only what changed since then:
+
+        {"results": [...], "deleted": [12, 40], "server_time": "..."}
+
+    `results` are the rows created or updated (the usual filters and
+    permissions still apply), `deleted` the ids removed. Clients keep
+    `server_time` and send it as `updated_since` on their next refresh.
+    Without the parameter, `list` behaves as before. Views whose get_queryset
+    depends on the user narrow `deleted` the same way in scope_deleted.
+    """
+
+    def scope_deleted(self, tombstones):
+        """The RegistroEliminado rows the user may see (all by default)."""
+        return tombstones
+
+    def list(self, request, *args, **kwargs):
+        raw = request.query_params.get('updated_since')
+        if raw is None:
+            return super().list(request, *args, **kwargs)
+        since = _parse_since(raw)
+        if since is None:
+            return Response({'error': 'updated_since debe ser una fecha ISO 8601.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Taken before reading, so a change made meanwhile is sent again next time
+        # rather than missed.
+        server_time = timezone.now()
+        if since < server_time - timedelta(days=settings.DELTA_SYNC_RETENTION_DAYS):
+            return Response(
+                {'error': 'La última sincronización es demasiado antigua; recargue la lista completa.'},
+                status=status.HTTP_410_GONE,
+            )
+
+        queryset = self.filter_queryset(self.get_queryset()).filter(updated_at__gte=since)
+        deleted = self.scope_deleted(RegistroEliminado.objects.filter(
+            modelo=queryset.model._meta.label_lower, eliminado_en__gte=since,
+        )).values_list('objeto_id', flat=True)
+        return Response({
+            'results': _serialized(self.get_serializer(queryset, many=True)),
+            'deleted': list(deleted),
+            'server_time': server_time,
+        })
+
+
+class FastListMixin:
+    """
+    Serves `list` through the compiled read path (api.fast) of the view's
+    serializer: same JSON, built from `.values()` rows. Filtering and
+    pagination work as usual; writes and detail views keep the serializer.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fast = FastSerializer.for_class(self.get_serializer_class())
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with metrics.serializing():
+            data = fast.represent(queryset if page is None else page, request)
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+
+class ArchiveMixin:
+    """
+    `?include_archived=true` on `list`: the rows api.archivo moved to
+    `archive_model` come after the same filters (the view's scoped(model))
+    and are merged with UNION ALL in the view's ordering, read through the
+    compiled serializer (api.fast), which only needs the shared columns.
+    Without the parameter only the hot table is read.
+    """
+    archive_model = None
+
+    def include_archived(self):
+        return self.request.query_params.get('include_archived', '').lower() in ('true', '1')
+
+    def with_archived(self, queryset, archived):
+        """UNION ALL of two querysets with the same columns, in the ordering of the first."""
+        ordering = queryset.query.order_by
+        return queryset.order_by().union(archived.order_by(), all=True).order_by(*ordering)
+
+    def archived_rows(self, fast):
+        """Hot and archived rows of the list, as `fast` values."""
+        return self.with_archived(
+            fast.values(self.filter_queryset(self.get_queryset())),
+            fast.values(self.filter_queryset(self.scoped(self.archive_model))),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.include_archived():
+            return super().list(request, *args, **kwargs)
+        fast = FastSerializer.for_class(self.get_serializer_class())
+        queryset = self.archived_rows(fast)
+        page = self.paginate_queryset(queryset)
+        with metrics.serializing():
+            data = fast.represent(queryset if page is None else page, request)
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+
+class TimedSerializationMixin:
+    """
+    DRF's list and retrieve, with the serializer's `.data` timed as the
+    'serialize' phase of the request metrics (api.metrics). Goes last in the
+    bases, right before the DRF view; the mixins above that serialize on
+    their own time it the same way.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        data = _serialized(self.get_serializer(queryset if page is None else page, many=True))
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(_serialized(self.get_serializer(self.get_object())))
+
+
+def _serialized(serializer):
+    with metrics.serializing():
+        return serializer.data
+
+
+class StreamingListMixin:
+    """
+    `?stream=ndjson` on `list`: the whole filtered list as newline-delimited
+    JSON, one object per row, read with keyset queries (keyset_chunks) and
+    serialized `stream_chunk_size` rows at a time, so memory stays flat
+    whatever the size of the table. Rows are the same objects `list` returns
+    (through the compiled serializer on FastListMixin views, archived rows
+    included with ?include_archived=true); there is no pagination envelope.
+    Goes first in the bases, before the ETag and cache mixins.
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') != 'ndjson':
+            return super().list(request, *args, **kwargs)
+        if 'updated_since' in request.query_params:
+            return Response({'error': 'stream=ndjson no se combina con updated_since.'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(_ndjson(self.stream_chunks()), content_type='application/x-ndjson')
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def stream_chunks(self):
+        """Lists of serialized rows, `stream_chunk_size` at a time."""
+        size = self.stream_chunk_size
+        if isinstance(self, ArchiveMixin) and self.include_archived():
+            fast = FastSerializer.for_class(self.get_serializer_class())
+            queryset = self.archived_rows(fast)
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+            fast = FastSerializer.for_class(self.get_serializer_class()) if isinstance(self, FastListMixin) else None
+            if fast is not None:
+                queryset = fast.values(queryset)
+        for chunk in keyset_chunks(queryset, size):
+            if fast is not None:
+                yield fast.represent(chunk, self.request)
+            else:
+                yield self.get_serializer(chunk, many=True).data
+
+
+def _ndjson(chunks):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in chunks:
+        yield ''.join(encoder.encode(row) + '\n' for row in chunk)
+
+
+# A time of day followed by a space and an offset: an unencoded '+' in the
+# offset arrives as a space. A space between date and time is left alone.
+_OFFSET_AS_SPACE = re.compile(r'(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?) (\d{2}(?::?\d{2})?)$')
+
+
+def _parse_since(raw):
+    raw = _OFFSET_AS_SPACE.sub(r'\1+\2', raw.strip())
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            value = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        return None
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _plain(data):
+    # ReturnList/ReturnDict keep a reference to the serializer, which should not
+    # end up pickled in the cache.
+    if isinstance(data, list):
+        return [_plain(item) for item in data]
+    if isinstance(data, dict):
+        return {k: _plain(v) for k, v in data.items()}
+    return data
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 # Helper function to create upload paths for files
 def employee_directory_path(instance, filename):
@@ -20,6 +21,20 @@ CONTRATO_FISCAL_CHOICES = [('avicola', 'Avicola Rolon S.R.L'), ('ovoplus', 'Ovop
 JORNADA_LABORAL_CHOICES = [('tiempo_completo', 'Tiempo Completo'), ('medio_tiempo', 'Medio Tiempo'), ('turnos', 'Turnos')]
 ESTADO_CONTRATO_CHOICES = [('vigente', 'Vigente'), ('finalizado', 'Finalizado'), ('anulado', 'Anulado')]
 
+# --- Base Models ---
+
+class TimestampedModel(models.Model):
+    """
+    created_at / updated_at for the collections the frontend syncs with
+    ?updated_since= (see api.mixins.DeltaSyncMixin). Note that
+    QuerySet.update() does not touch auto_now: pass updated_at explicitly.
+    """
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
 # --- Main Models ---
 
 class Departamento(models.Model):
@@ -31,13 +46,17 @@ class Departamento(models.Model):
         blank=True, 
         related_name='departamentos_liderados'
     )
+    minimo_personal = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Empleados que deben quedar presentes cada día; vacío = sin control al aprobar vacaciones",
+    )
     def __str__(self): return self.nombre
 
 class Cargo(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     def __str__(self): return self.nombre
 
-class Empleado(models.Model):
+class Empleado(TimestampedModel):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='empleado')
     # Personal Information
     nombres = models.CharField(max_length=100)
@@ -68,6 +87,13 @@ class Empleado(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_EMPLEADO_CHOICES, default='activo')
     
     feature_vacaciones = models.BooleanField(default=True)
+
+    # How new requests to approve reach this employee by WhatsApp (see api.notificaciones)
+    PREFERENCIA_NOTIFICACION_CHOICES = [
+        ('inmediata', 'Inmediata'),
+        ('resumen', 'Resumen periódico'),
+    ]
+    preferencia_notificacion = models.CharField(max_length=10, choices=PREFERENCIA_NOTIFICACION_CHOICES, default='inmediata')
     # vacaciones_guardadas removed in favor of separate model
     cargo = models.ForeignKey(Cargo, on_delete=models.SET_NULL, null=True, blank=True)
     departamento = models.ForeignKey(Departamento, on_delete=models.SET_NULL, null=True, blank=True) # Sector is Departamento
@@ -106,7 +132,7 @@ class Estudio(models.Model):
     def __str__(self):
         return f'{self.get_nivel_display()}: {self.carrera} - {self.empleado}'
 
-class Contrato(models.Model):
+class Contrato(TimestampedModel):
 
     empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='contratos')
 
@@ -129,6 +155,12 @@ class Contrato(models.Model):
     estado_contrato = models.CharField(max_length=20, choices=ESTADO_CONTRATO_CHOICES, default='vigente')
     observaciones = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Vigente contracts by end date (vencimientos)
+            models.Index(fields=['estado_contrato', 'fecha_fin_pactada'], name='api_contrato_vence_idx'),
+        ]
+
     def __str__(self):
         return f'Contrato {self.get_tipo_contrato_display()} para {self.empleado} ({self.fecha_inicio})'
 
@@ -147,9 +179,8 @@ ESTADO_PERMISO_CHOICES = [
 
 # --- Permiso Model ---
 
-class Permiso(models.Model):
-    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='permisos')
-    aprobador_asignado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='permisos_a_aprobar')
+class PermisoBase(models.Model):
+    """Columns of Permiso that PermisoArchivado keeps as they are."""
     fecha_solicitud = models.DateField()
     tipo_permiso = models.CharField(max_length=20, choices=TIPO_PERMISO_CHOICES)
     observacion = models.TextField(blank=True, null=True)
@@ -159,9 +190,44 @@ class Permiso(models.Model):
     comentario_aprobador = models.TextField(blank=True, null=True)
     fecha_aprobacion = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        abstract = True
+
+
+class Permiso(TimestampedModel, PermisoBase):
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='permisos')
+    aprobador_asignado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='permisos_a_aprobar')
+
+    class Meta:
+        indexes = [
+            # Overlap checks (api.conflicts) look up one employee's permisos by date
+            models.Index(fields=['empleado', 'fecha_solicitud'], name='api_permiso_emp_fecha_idx'),
+        ]
+
     def __str__(self):
         return f'Permiso para {self.empleado} - {self.fecha_solicitud}'
 
+
+class PermisoHorasMes(models.Model):
+    """
+    Minutes of live (pendiente / aprobado) permisos per employee, month and
+    tipo_permiso, kept by api.horas_permiso so monthly caps are checked
+    without scanning the permisos. reconcile_permiso_horas rebuilds it.
+    """
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='permiso_horas_mes')
+    anio = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    tipo_permiso = models.CharField(max_length=20, choices=TIPO_PERMISO_CHOICES)
+    minutos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'anio', 'mes', 'tipo_permiso'], name='uniq_permiso_horas_mes'),
+        ]
+
+    def __str__(self):
+        return f'{self.empleado} {self.anio}-{self.mes:02d} {self.tipo_permiso}: {self.minutos} min'
+
 # --- Choices for Hora Extra ---
 TIPO_HORA_EXTRA_CHOICES = [
     ('compensacion', 'Compensación de Hrs Extra'),
@@ -170,9 +236,8 @@ TIPO_HORA_EXTRA_CHOICES = [
 
 # --- Hora Extra Model ---
 
-class HoraExtra(models.Model):
-    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='horas_extras')
-    aprobador_asignado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='horas_extras_a_aprobar')
+class HoraExtraBase(models.Model):
+    """Columns of HoraExtra that HoraExtraArchivada keeps as they are."""
     fecha_solicitud = models.DateField()
     tipo_hora_extra = models.CharField(max_length=20, choices=TIPO_HORA_EXTRA_CHOICES)
     observacion = models.TextField(blank=True, null=True)
@@ -182,12 +247,25 @@ class HoraExtra(models.Model):
     comentario_aprobador = models.TextField(blank=True, null=True)
     fecha_aprobacion = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        abstract = True
+
+
+class HoraExtra(TimestampedModel, HoraExtraBase):
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='horas_extras')
+    aprobador_asignado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='horas_extras_a_aprobar')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empleado', 'fecha_solicitud'], name='api_horaextra_emp_fecha_idx'),
+        ]
+
     def __str__(self):
         return f'Hora Extra {self.get_tipo_hora_extra_display()} para {self.empleado} - {self.fecha_solicitud}'
 
 # --- Vacaciones Models ---
 
-class SolicitudVacacion(models.Model):
+class SolicitudVacacion(TimestampedModel):
     ESTADO_CHOICES = [
         ('aprobado', 'Aprobado'),
         ('anulado', 'Anulado'), 
@@ -206,10 +284,15 @@ class SolicitudVacacion(models.Model):
     comentario_aprobador = models.TextField(blank=True, null=True)
     fecha_aprobacion = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empleado', 'fecha_inicio', 'fecha_fin'], name='api_vacacion_rango_idx'),
+        ]
+
     def __str__(self):
         return f"Vacación {self.dias_calculados} días - {self.empleado}"
 
-class VacacionGuardada(models.Model):
+class VacacionGuardada(TimestampedModel):
     empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='vacaciones_guardadas_list')
     contrato = models.ForeignKey('Contrato', on_delete=models.SET_NULL, null=True, blank=True, related_name='vacaciones_guardadas')
     dias = models.DecimalField(max_digits=5, decimal_places=1)
@@ -219,3 +302,182 @@ class VacacionGuardada(models.Model):
     
     def __str__(self):
         return f"{self.empleado} - {self.dias} días ({self.gestion})"
+
+# --- Archive ---
+# Closed permisos and horas extras older than ARCHIVO_HORIZONTE_DIAS, moved out
+# of the hot tables by api.archivo with their original id. Same columns as the
+# source model (the shared ones come from the same abstract base, so the same
+# serializers read them), plus archivado_en.
+
+class ArchivedModel(models.Model):
+    """Original id and timestamps, copied as they are, plus the move date."""
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+class PermisoArchivado(ArchivedModel, PermisoBase):
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='+')
+    aprobador_asignado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empleado', 'fecha_solicitud'], name='api_permarch_emp_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f'Permiso archivado #{self.pk} - {self.fecha_solicitud}'
+
+
+class HoraExtraArchivada(ArchivedModel, HoraExtraBase):
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='+')
+    aprobador_asignado = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empleado', 'fecha_solicitud'], name='api_hearch_emp_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f'Hora extra archivada #{self.pk} - {self.fecha_solicitud}'
+
+# --- Delta Sync ---
+
+class RegistroEliminado(models.Model):
+    """
+    Tombstone written on delete of a synced model, so ?updated_since= can tell
+    clients which rows to drop. Old entries are pruned; a client whose last
+    sync is older than DELTA_SYNC_RETENTION_DAYS must reload everything.
+    empleado_id / aprobador_id keep the owner and approver of the deleted row
+    (when it has them), so each user is only told about rows they could see.
+    """
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    empleado_id = models.BigIntegerField(null=True, blank=True)
+    aprobador_id = models.BigIntegerField(null=True, blank=True)
+    eliminado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modelo', 'eliminado_en'], name='api_eliminado_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.modelo} #{self.objeto_id} ({self.eliminado_en})'
+
+# --- Audit Trail ---
+
+class AuditEntry(models.Model):
+    """
+    Field-level change of an audited model (see api.audit): cambios maps each
+    changed field (attname, so foreign keys by id) to [antes, despues].
+    """
+    ACCION_CHOICES = [
+        ('crear', 'Crear'),
+        ('modificar', 'Modificar'),
+        ('eliminar', 'Eliminar'),
+    ]
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    accion = models.CharField(max_length=10, choices=ACCION_CHOICES)
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fecha = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='api_audit_objeto_idx'),
+            models.Index(fields=['actor', 'fecha'], name='api_audit_actor_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.accion} {self.modelo} #{self.objeto_id} ({self.fecha})'
+
+# --- Search Index ---
+
+class EmpleadoTrigrama(models.Model):
+    """
+    Normalized (lowercase, unaccented) trigrams of an employee's names and CI.
+    Maintained by api.signals on every Empleado save; see api.search.
+    """
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='trigramas')
+    trigrama = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'trigrama'], name='uniq_empleado_trigrama'),
+        ]
+        indexes = [
+            models.Index(fields=['trigrama', 'empleado'], name='api_trigrama_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"'{self.trigrama}' - {self.empleado_id}"
+
+# --- Notification Digest ---
+
+class NotificacionPendiente(models.Model):
+    """
+    One line of a WhatsApp digest waiting to be sent to `destinatario`
+    (employees with preferencia_notificacion='resumen'). The row is deleted
+    once its digest goes out.
+    """
+    destinatario = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='notificaciones_pendientes')
+    modelo = models.CharField(max_length=100)
+    objeto_id = models.BigIntegerField()
+    texto = models.CharField(max_length=500)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['destinatario', 'creado_en'], name='api_notifpend_dest_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.destinatario_id}: {self.texto}'
+
+# --- Periodic Jobs ---
+
+class PeriodicJob(models.Model):
+    """
+    Run state of a job registered in api.jobs (the schedule itself lives in
+    code). bloqueado_por / bloqueado_hasta are the lease: a runner takes the
+    row with a conditional UPDATE, so only one instance runs a job at a time.
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    activo = models.BooleanField(default=True)
+    proxima_ejecucion = models.DateTimeField(null=True, blank=True)
+    ultima_ejecucion = models.DateTimeField(null=True, blank=True)
+    ultimo_estado = models.CharField(max_length=10, blank=True, default='')
+    bloqueado_por = models.CharField(max_length=100, blank=True, default='')
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.nombre
+
+
+class JobRun(models.Model):
+    ESTADO_CHOICES = [
+        ('en_curso', 'En curso'),
+        ('ok', 'OK'),
+        ('error', 'Error'),
+    ]
+    job = models.ForeignKey(PeriodicJob, on_delete=models.CASCADE, related_name='ejecuciones')
+    worker = models.CharField(max_length=100)
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField(null=True, blank=True)
+    duracion_ms = models.PositiveIntegerField(null=True, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='en_curso')
+    resultado = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['job', 'inicio'], name='api_jobrun_job_inicio_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.job} {self.inicio} ({self.estado})'
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import NotificacionPendiente
+from .services import send_whatsapp_message
+
+# WhatsApp notifications to approvers, immediate or in digests.
+#
+# Employees with preferencia_notificacion='inmediata' (the default) get one
+# message per event, as before. With 'resumen' each event only queues a line
+# in NotificacionPendiente; the first pending line opens a window of
+# NOTIFICACIONES_RESUMEN_MINUTOS and, once it has passed, the
+# enviar_resumenes job (api.jobs) sends everything queued for that recipient
+# in a single message and deletes the rows. Like immediate messages, a
+# digest that fails to send is not retried.
+
+
+def notificar(destinatario, mensaje, linea, objeto):
+    """
+    Sends `mensaje` now or queues `linea` for the digest of `destinatario`,
+    by their preference. `objeto` is the record the notification is about.
+    """
+    if destinatario.preferencia_notificacion == 'resumen':
+        NotificacionPendiente.objects.create(
+            destinatario=destinatario, modelo=objeto._meta.label_lower, objeto_id=objeto.pk, texto=linea[:500],
+        )
+    else:
+        send_whatsapp_message(destinatario.celular, mensaje)
+
+
+def pendientes_vencidos(ahora=None):
+    """Ids of the recipients whose oldest pending line is older than the window."""
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(minutes=settings.NOTIFICACIONES_RESUMEN_MINUTOS)
+    return list(
+        NotificacionPendiente.objects.values('destinatario_id')
+        .annotate(primero=Min('creado_en'))
+        .filter(primero__lte=limite)
+        .order_by('destinatario_id')
+        .values_list('destinatario_id', flat=True)
+    )
+
+
+def resumen_texto(lineas):
+    texts = [f"*Solicitudes pendientes de aprobación: {len(lineas)}* 📋", ""]
+    texts += [f"- {linea}" for linea in lineas]
+    texts += ["", "_Por favor, ingrese al sistema para aprobar o rechazar._"]
+    return "\n".join(texts)
+
+
+def enviar_resumenes(ahora=None, dry_run=False):
+    """
+    One message per recipient whose window has passed, with every line
+    queued for them. Returns (mensajes, lineas).
+    """
+    mensajes = lineas = 0
+    for destinatario_id in pendientes_vencidos(ahora):
+        rows = list(
+            NotificacionPendiente.objects.filter(destinatario_id=destinatario_id)
+            .select_related('destinatario').order_by('creado_en', 'id')
+        )
+        if not rows:
+            continue
+        celular = rows[0].destinatario.celular
+        if not dry_run:
+            if celular:
+                send_whatsapp_message(celular, resumen_texto([r.texto for r in rows]))
+            NotificacionPendiente.objects.filter(pk__in=[r.pk for r in rows]).delete()
+        mensajes += 1 if celular else 0
+        lineas += len(rows)
+    return mensajes, lineas
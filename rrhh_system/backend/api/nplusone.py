@@ -0,0 +1,105 @@
+import logging
+import os
+import re
+import traceback
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Frames in these api/ modules wrap every request and never explain a query
+_SKIP_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(API_DIR, 'middleware.py'),
+    os.path.join(API_DIR, 'metrics.py'),
+}
+
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """
+    Reduces a SQL statement to its template: literals and IN lists are
+    replaced so that the same query for different rows groups together.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def _api_frame():
+    """Innermost stack frame inside api/ that is not request plumbing."""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(API_DIR) and filename not in _SKIP_FILES:
+            return f'{os.path.relpath(filename, os.path.dirname(API_DIR))}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class NPlusOneDetector:
+    """
+    Groups the SQL executed inside the block by normalized template and
+    reports the templates that ran more than `threshold` times, together with
+    the api/ frame that issued them.
+
+        with NPlusOneDetector(threshold=3):
+            client.get('/api/permisos/')
+
+    mode='raise' raises NPlusOneError on exit (tests/CI); mode='log' logs a
+    warning instead (development server).
+    """
+    def __init__(self, threshold=5, mode='raise', using=None):
+        self.threshold = threshold
+        self.mode = mode
+        self.connection = connections[using or DEFAULT_DB_ALIAS]
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        template = normalize_sql(sql)
+        self.counts[template] += 1
+        if template not in self.origins:
+            self.origins[template] = _api_frame()
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._wrapper.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self.check()
+        return False
+
+    def offenders(self):
+        return [
+            (template, count, self.origins.get(template))
+            for template, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self, label=''):
+        lines = [f'Possible N+1 queries{f" in {label}" if label else ""}:']
+        for template, count, origin in self.offenders():
+            lines.append(f'  {count}x from {origin or "<outside api/>"}: {template[:300]}')
+        return '\n'.join(lines)
+
+    def check(self, label=''):
+        if not self.offenders():
+            return
+        if self.mode == 'raise':
+            raise NPlusOneError(self.report(label))
+        logger.warning(self.report(label))
@@ -1,10 +1,276 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime, parse_time
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
 class OptionalPagination(PageNumberPagination):
     """
-    A custom pagination class that allows disabling pagination via a query parameter.
+    A custom pagination class that allows disabling pagination via a query parameter
+    (?no_pagination=true, up to NO_PAGINATION_MAX_ROWS rows).
+
+    `?cursor=` (empty for the first page) switches to keyset pagination on the
+    same ordering as the queryset plus id: each page is one index seek past
+    the last row of the previous one, with no COUNT(*) and no OFFSET, so page
+    1000 costs the same as page 1. The response has `next` / `previous` URLs
+    carrying the cursor and `results`; with `?count=aprox` it also has a
+    `count` that is exact up to `count_limit` rows and an estimate beyond
+    (`count_exacto` says which).
     """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Exact count up to this many rows; past it, the planner estimate on PostgreSQL
+    count_limit = 1000
+
     def paginate_queryset(self, queryset, request, view=None):
         if 'no_pagination' in request.query_params:
+            # The unpaginated list is built in memory in one piece; past the
+            # cap, clients page or stream it (?stream=ndjson)
+            limit = settings.NO_PAGINATION_MAX_ROWS
+            if limit and queryset.order_by()[:limit + 1].count() > limit:
+                raise ValidationError({'error': (
+                    f'La lista tiene más de {limit} registros; use la paginación o ?stream=ndjson.'
+                )})
+            return None
+        self.cursor_mode = is_cursor_request(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        keys = _ordering(queryset)
+        raw = request.query_params.get(self.cursor_query_param)
+        reverse, position = _decode(raw) if raw else (False, None)
+        if position is not None and len(position) != len(keys):
+            raise NotFound('Cursor inválido.')
+
+        page_keys = [(name, not desc) for name, desc in keys] if reverse else keys
+        qs = _order(_with_keys(queryset, keys), page_keys)
+        if position is not None:
+            qs = _filter(qs, _after(queryset.model, page_keys, position))
+        rows = list(qs[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Coming back from a later page there is always a next one, and going
+        # forward from a cursor there is always a previous one
+        more_after = reverse or has_more
+        more_before = has_more if reverse else position is not None
+        self.next_position = self.previous_position = None
+        if rows:
+            if more_after:
+                self.next_position = _position(queryset, keys, rows[-1])
+            if more_before:
+                self.previous_position = _position(queryset, keys, rows[0])
+        elif reverse:
+            self.next_position = position
+
+        self.count = self.count_exacto = None
+        if request.query_params.get(self.count_query_param) == 'aprox':
+            self.count, self.count_exacto = approximate_count(queryset, self.count_limit)
+        return rows
+
+    def get_paginated_response(self, data):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_paginated_response(data)
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_exacto'] = self.count_exacto
+        payload['next'] = self._cursor_link(False, self.next_position)
+        payload['previous'] = self._cursor_link(True, self.previous_position)
+        payload['results'] = data
+        return Response(payload)
+
+    def _cursor_link(self, reverse, position):
+        if position is None:
             return None
-        return super().paginate_queryset(queryset, request, view)
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, _encode(reverse, position))
+
+
+def is_cursor_request(request):
+    return OptionalPagination.cursor_query_param in request.query_params
+
+
+def approximate_count(queryset, limit):
+    """
+    (count, exact): COUNT(*) of at most limit + 1 rows, so its cost is
+    bounded; when there are more, PostgreSQL's row estimate for the query
+    (EXPLAIN, nothing is read), elsewhere limit + 1 as a lower bound.
+    """
+    capped = queryset.order_by()[:limit + 1].count()
+    if capped <= limit:
+        return capped, True
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return max(capped, int(plan[0]['Plan']['Plan Rows'])), False
+    return capped, False
+
+
+def keyset_chunks(queryset, size):
+    """
+    Rows of `queryset` in its ordering, as lists of up to `size`, each read
+    by its own query that continues past the last row of the previous one
+    (like the cursor pages). Unlike .iterator() it needs no server-side
+    cursor, which the pgbouncer pooler in transaction mode cannot keep, and
+    only one chunk is ever in memory.
+    """
+    keys = _ordering(queryset)
+    fields = queryset._fields
+    if fields and queryset.query.combinator:
+        # A UNION cannot take the aliased key columns of _with_keys
+        missing = [name for name, _ in keys if name not in fields]
+        if missing:
+            queryset = queryset.values(*fields, *missing)
+    qs = _order(_with_keys(queryset, keys), keys)
+    position = None
+    while True:
+        page = qs if position is None else _filter(qs, _after(queryset.model, keys, position))
+        rows = list(page[:size])
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        position = _position(queryset, keys, rows[-1])
+
+
+# --- Keyset helpers ---
+
+def _ordering(queryset):
+    """[(name, descending)] of the queryset ordering, ending with the pk as tiebreaker."""
+    query = queryset.query
+    pk = queryset.model._meta.pk
+    ordering = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str) or item == '?':
+            raise NotFound('Este listado no admite paginación por cursor.')
+        name = item.lstrip('-')
+        keys.append((pk.attname if name == 'pk' else name, item.startswith('-')))
+    if not any(name in (pk.name, pk.attname) for name, _ in keys):
+        keys.append((pk.attname, keys[-1][1] if keys else False))
+    return keys
+
+
+def _nullable(model, name):
+    # Relations and annotations may always be NULL
+    try:
+        return '__' in name or model._meta.get_field(name).null
+    except FieldDoesNotExist:
+        return True
+
+
+def _order(queryset, keys):
+    # NULLs placed explicitly (last ascending, first descending, as PostgreSQL
+    # does by default) so _after agrees with the database on every backend
+    ordering = []
+    for name, desc in keys:
+        if not _nullable(queryset.model, name):
+            ordering.append(f'-{name}' if desc else name)
+        else:
+            ordering.append(F(name).desc(nulls_first=True) if desc else F(name).asc(nulls_last=True))
+    return queryset.order_by(*ordering)
+
+
+def _after(model, keys, position):
+    """Q for the rows that come after `position` in the `keys` ordering."""
+    condition = None
+    for (name, desc), value in reversed(list(zip(keys, position))):
+        if value is None:
+            beyond = Q(**{f'{name}__isnull': False}) if desc else None
+            same = Q(**{f'{name}__isnull': True})
+        else:
+            beyond = Q(**{f'{name}__lt' if desc else f'{name}__gt': value})
+            if not desc and _nullable(model, name):
+                beyond |= Q(**{f'{name}__isnull': True})
+            same = Q(**{name: value})
+        tail = same & condition if condition is not None else None
+        condition = beyond | tail if beyond is not None and tail is not None else (beyond or tail)
+    return condition
+
+
+def _filter(queryset, condition):
+    """queryset.filter() that also reaches each branch of a UNION."""
+    if not queryset.query.combinator:
+        return queryset.filter(condition)
+    clone = queryset.all()
+    branches = []
+    for branch in clone.query.combined_queries:
+        branch = branch.chain()
+        branch.add_q(condition)
+        branches.append(branch)
+    clone.query.combined_queries = tuple(branches)
+    return clone
+
+
+def _with_keys(queryset, keys):
+    # .values() rows must carry the ordering columns (e.g. search_rank) to
+    # build the cursor; extra keys are ignored by the serializers
+    fields = queryset._fields
+    if not fields or queryset.query.combinator:
+        return queryset
+    missing = {_key(i): F(name) for i, (name, _) in enumerate(keys) if name not in fields}
+    return queryset.values(*fields, **missing) if missing else queryset
+
+
+def _key(i):
+    return f'_cursor_{i}'
+
+
+def _position(queryset, keys, row):
+    names = [name for name, _ in keys]
+    if isinstance(row, dict):
+        return [row[name] if name in row else row[_key(i)] for i, name in enumerate(names)]
+    if all('__' not in name and hasattr(row, name) for name in names):
+        return [getattr(row, name) for name in names]
+    # Ordering on a relation the instances do not carry
+    return list(queryset.filter(pk=row.pk).values_list(*names).first())
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts times to milliseconds, and _after would then skip
+    # the rows later in the same millisecond: keep every digit, tagged so
+    # _decode gives the value back with its type
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return {'dt': o.isoformat()}
+        if isinstance(o, datetime.time):
+            return {'t': o.isoformat()}
+        return super().default(o)
+
+
+def _typed(obj):
+    if obj.keys() == {'dt'}:
+        return parse_datetime(obj['dt'])
+    if obj.keys() == {'t'}:
+        return parse_time(obj['t'])
+    return obj
+
+
+def _encode(reverse, position):
+    raw = json.dumps([int(reverse), *position], cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(raw):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)), object_hook=_typed)
+        return bool(data[0]), data[1:]
+    except (ValueError, TypeError, IndexError, KeyError, AttributeError):
+        raise NotFound('Cursor inválido.')
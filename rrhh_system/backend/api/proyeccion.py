@@ -0,0 +1,118 @@
+from datetime import date
+
+import numpy as np
+
+from .models import Empleado, SolicitudVacacion, VacacionGuardada
+
+# Forward projection of vacation balances for every employee at once.
+#
+# Same ledger as SolicitudVacacionViewSet._calculate_saldo_data: law days for
+# each completed year since fecha_ingreso_vigente (15 up to the 5th year, 20
+# from the 6th, 30 from the 11th), plus every VacacionGuardada and minus every
+# approved SolicitudVacacion dated from that day on. The ledger books an
+# approved vacation as soon as it exists, so future consumos are already in
+# today's saldo; what changes up to the target date is the law accrual of the
+# anniversaries in between.
+#
+# Everything runs on arrays indexed by employee (sorted ids): movements are
+# mapped with searchsorted, filtered with vectorised date comparisons and
+# summed with bincount, so the cost does not depend on a per-employee loop.
+
+
+def _month_day(dates):
+    """month * 100 + day of a datetime64[D] array."""
+    months = dates.astype('datetime64[M]')
+    return (months.astype(np.int64) % 12 + 1) * 100 + (dates - months).astype(np.int64) + 1
+
+
+def completed_years(start, on):
+    """Whole years from each `start` (datetime64[D], NaT = none) to the date `on`."""
+    years = on.year - (start.astype('datetime64[Y]').astype(np.int64) + 1970)
+    years -= (on.month * 100 + on.day) < _month_day(start)
+    years[np.isnat(start)] = 0
+    return np.clip(years, 0, None)
+
+
+def ley_acumulada(years):
+    """Law days accrued after `years` complete years (15 / 20 / 30 tiers)."""
+    return (
+        15 * np.minimum(years, 5)
+        + 20 * np.clip(np.minimum(years, 10) - 5, 0, None)
+        + 30 * np.clip(years - 10, 0, None)
+    )
+
+
+class _Ledger:
+    """Employees as arrays plus per-employee sums of their dated movements."""
+
+    def __init__(self, empleados):
+        rows = list(empleados.order_by('id').values_list(
+            'id', 'fecha_ingreso_vigente', 'nombres', 'apellido_paterno', 'apellido_materno', 'departamento__nombre',
+        ))
+        self.rows = rows
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.start = np.array([r[1] for r in rows], dtype='datetime64[D]')
+
+    def sums(self, movements, since=None):
+        """
+        Per-employee sum of `movements` ((empleado_id, fecha, dias) rows)
+        dated on or after the employee's start, like the saldo filters; with
+        `since`, only those dated after that day.
+        """
+        movements = list(movements)
+        if not movements or not len(self.ids):
+            return np.zeros(len(self.ids))
+        empleado_ids, fechas, dias = zip(*movements)
+        empleado_ids = np.array(empleado_ids, dtype=np.int64)
+        fechas = np.array(fechas, dtype='datetime64[D]')
+        dias = np.array(dias, dtype=float)
+
+        pos = np.clip(np.searchsorted(self.ids, empleado_ids), 0, len(self.ids) - 1)
+        start = self.start[pos]
+        # Without a start date every row counts (no filter in the ledger);
+        # with one, a row without fecha never passes fecha >= start.
+        keep = (self.ids[pos] == empleado_ids) & (np.isnat(start) | (fechas >= start))
+        if since is not None:
+            keep &= fechas > np.datetime64(since, 'D')
+        return np.bincount(pos[keep], weights=dias[keep], minlength=len(self.ids))
+
+
+def project(fecha, empleados=None, hoy=None):
+    """
+    Projected balance on `fecha` of each employee in `empleados` (all by
+    default), as a list of dicts ordered by name.
+    """
+    hoy = hoy or date.today()
+    empleados = empleados if empleados is not None else Empleado.objects.all()
+    ledger = _Ledger(empleados)
+
+    guardadas = VacacionGuardada.objects.filter(empleado__in=empleados).values_list('empleado_id', 'fecha', 'dias')
+    consumos = list(
+        SolicitudVacacion.objects.filter(empleado__in=empleados, estado='aprobado')
+        .values_list('empleado_id', 'fecha_inicio', 'dias_calculados')
+    )
+
+    anios_hoy = completed_years(ledger.start, hoy)
+    anios_fecha = completed_years(ledger.start, fecha)
+    ley_hoy = ley_acumulada(anios_hoy)
+    por_devengar = ley_acumulada(anios_fecha) - ley_hoy
+
+    saldo_actual = ley_hoy + ledger.sums(guardadas) - ledger.sums(consumos)
+    consumos_futuros = ledger.sums(consumos, since=hoy)
+    saldo_proyectado = saldo_actual + por_devengar
+
+    result = []
+    for i, (empleado_id, inicio, nombres, paterno, materno, departamento) in enumerate(ledger.rows):
+        result.append({
+            'empleado': empleado_id,
+            'empleado_nombre': f"{nombres} {paterno} {materno or ''}".strip(),
+            'departamento': departamento,
+            'fecha_ingreso_vigente': inicio,
+            'antiguedad_anios': int(anios_fecha[i]),
+            'saldo_actual': round(float(saldo_actual[i]), 1),
+            'consumos_futuros': round(float(consumos_futuros[i]), 1),
+            'ley_por_devengar': int(por_devengar[i]),
+            'saldo_proyectado': round(float(saldo_proyectado[i]), 1),
+        })
+    result.sort(key=lambda r: r['empleado_nombre'])
+    return result
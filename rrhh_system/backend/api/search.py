@@ -0,0 +1,149 @@
+import math
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Empleado, EmpleadoTrigrama
+
+# Campos de Empleado que alimentan el índice de búsqueda
+INDEXED_FIELDS = ('nombres', 'apellido_paterno', 'apellido_materno', 'ci')
+
+# Fracción mínima de trigramas de la consulta que un empleado debe contener
+MIN_SIMILARITY = 0.5
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    """
+    Lowercases, strips accents and collapses anything that is not a letter or
+    digit into single spaces ("Rolón  Ríos" -> "rolon rios").
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', stripped.lower()).strip()
+
+
+def word_trigrams(word):
+    """
+    Trigrams of a single word padded like pg_trgm: two leading spaces and one
+    trailing space, so short words and word boundaries are indexed too.
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        grams |= word_trigrams(word)
+    return grams
+
+
+def query_trigrams(query):
+    """
+    Trigrams used to look up a search term. Words of 3+ characters use only
+    their inner trigrams so they match anywhere inside an indexed word (like
+    the old icontains); shorter words match as a prefix.
+    """
+    grams = set()
+    for word in normalize(query).split():
+        if len(word) >= 3:
+            grams |= {word[i:i + 3] for i in range(len(word) - 2)}
+        else:
+            grams |= {g for g in word_trigrams(word) if not g.endswith(' ')}
+    return grams
+
+
+def empleado_trigrams(empleado):
+    grams = set()
+    for field in INDEXED_FIELDS:
+        grams |= text_trigrams(getattr(empleado, field, None))
+    return grams
+
+
+def build_rows(empleados):
+    return [
+        EmpleadoTrigrama(empleado_id=emp.id, trigrama=gram)
+        for emp in empleados
+        for gram in sorted(empleado_trigrams(emp))
+    ]
+
+
+@transaction.atomic
+def index_empleado(empleado):
+    """Rebuilds the trigrams of one employee (called on every save)."""
+    EmpleadoTrigrama.objects.filter(empleado_id=empleado.id).delete()
+    EmpleadoTrigrama.objects.bulk_create(build_rows([empleado]))
+
+
+def rebuild_index(batch_size=2000, empleado_ids=None):
+    """
+    Rebuilds the index for all employees (or only `empleado_ids`) in batches.
+    Used after bulk loads, which do not fire post_save.
+    Returns the number of trigram rows written.
+    """
+    qs = Empleado.objects.only('id', *INDEXED_FIELDS).order_by('pk')
+    stale = EmpleadoTrigrama.objects.all()
+    if empleado_ids is not None:
+        qs = qs.filter(pk__in=empleado_ids)
+        stale = stale.filter(empleado_id__in=empleado_ids)
+
+    written = 0
+    with transaction.atomic():
+        stale.delete()
+        batch = []
+        for emp in qs.iterator(chunk_size=batch_size):
+            batch.append(emp)
+            if len(batch) >= batch_size:
+                rows = build_rows(batch)
+                EmpleadoTrigrama.objects.bulk_create(rows, batch_size=batch_size * 10)
+                written += len(rows)
+                batch = []
+        if batch:
+            rows = build_rows(batch)
+            EmpleadoTrigrama.objects.bulk_create(rows, batch_size=batch_size * 10)
+            written += len(rows)
+    return written
+
+
+def rank_queryset(queryset, query, field='pk', min_similarity=MIN_SIMILARITY):
+    """
+    Restricts `queryset` to the rows whose employee (`field` holds the
+    Empleado id) matches `query`, annotated with `search_rank` (number of
+    query trigrams found) and ordered best match first.
+
+    Candidates come from a GROUP BY over the (trigrama, empleado) index, so the
+    cost depends on the matching trigrams, not on the size of the table.
+    """
+    grams = query_trigrams(query)
+    if not grams:
+        return queryset
+    needed = max(1, math.ceil(len(grams) * min_similarity))
+
+    matching = (
+        EmpleadoTrigrama.objects
+        .filter(trigrama__in=grams)
+        .values('empleado_id')
+        .annotate(hits=Count('id'))
+        .filter(hits__gte=needed)
+        .values('empleado_id')
+    )
+    rank = (
+        EmpleadoTrigrama.objects
+        .filter(empleado_id=OuterRef(field), trigrama__in=grams)
+        .values('empleado_id')
+        .annotate(hits=Count('id'))
+        .values('hits')[:1]
+    )
+    ordering = list(queryset.query.order_by)
+    return (
+        queryset
+        .filter(**{f'{field}__in': matching})
+        .annotate(search_rank=Subquery(rank))
+        .order_by('-search_rank', *ordering)
+    )
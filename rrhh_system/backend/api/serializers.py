@@ -3,7 +3,7 @@ from django.db import transaction
 from django.contrib.auth.models import User, Group
 from .models import (
     Empleado, Departamento, Cargo, Familiar, Estudio, Contrato, Permiso, HoraExtra,
-    SolicitudVacacion, VacacionGuardada
+    SolicitudVacacion, VacacionGuardada, AuditEntry
 )
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -81,7 +81,7 @@ class ContratoSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'empleado', 'tipo_contrato', 'tipo_trabajador', 'contrato_fiscal', 
             'fecha_inicio', 'fecha_fin', 'fecha_fin_pactada', 'salario_base',
-            'jornada_laboral', 'estado_contrato', 'observaciones'
+            'jornada_laboral', 'estado_contrato', 'observaciones', 'created_at', 'updated_at'
         ]
 
 # A simple serializer just for showing the name of the boss
@@ -118,12 +118,13 @@ class EmpleadoSerializer(serializers.ModelSerializer):
             'fecha_nacimiento', 'sexo', 'estado_civil', 'celular', 'email',
             'provincia', 'direccion', 'tipo_vivienda', 'nacionalidad',
             'nombre_conyuge', 'tiene_hijos', 'fecha_ingreso_inicial', 'fecha_ingreso_vigente', 'estado',
+            'preferencia_notificacion',
             'cargo', 'cargo_nombre',
             'departamento', 'departamento_nombre',
             'jefe', 'jefe_info', 'foto',
             'fotocopia_ci', 'curriculum_vitae', 'certificado_antecedentes',
             'fotocopia_luz_agua_gas', 'croquis_domicilio', 'fotocopia_licencia_conducir',
-            'familiares', 'estudios', 'contratos'
+            'familiares', 'estudios', 'contratos', 'created_at', 'updated_at'
         ]
         read_only_fields = ['departamento_nombre', 'cargo_nombre', 'jefe_info']
         # Also ensure related fields are optional on write
@@ -259,7 +260,7 @@ class DepartamentoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Departamento
-        fields = ['id', 'nombre', 'jefe_departamento', 'jefe_departamento_info']
+        fields = ['id', 'nombre', 'jefe_departamento', 'jefe_departamento_info', 'minimo_personal']
         extra_kwargs = {
             'jefe_departamento': {'required': False, 'allow_null': True},
         }
@@ -272,6 +273,15 @@ class CargoSerializer(serializers.ModelSerializer):
 
         fields = ['id', 'nombre']
 
+def validate_horario(serializer, attrs, inicio, fin):
+    # An end before the start runs past midnight (api.conflicts); an end equal
+    # to the start would be a 24-hour request, never what was meant
+    start = attrs.get(inicio, getattr(serializer.instance, inicio, None))
+    end = attrs.get(fin, getattr(serializer.instance, fin, None))
+    if start is not None and start == end:
+        raise serializers.ValidationError({fin: 'La hora de fin no puede ser igual a la de inicio.'})
+    return attrs
+
 class PermisoSerializer(serializers.ModelSerializer):
     empleado_info = JefeSerializer(source='empleado', read_only=True)
     aprobador_asignado_info = JefeSerializer(source='aprobador_asignado', read_only=True)
@@ -289,6 +299,9 @@ class PermisoSerializer(serializers.ModelSerializer):
             'comentario_aprobador',
         ]
 
+    def validate(self, attrs):
+        return validate_horario(self, attrs, 'hora_salida', 'hora_regreso')
+
 class HoraExtraSerializer(serializers.ModelSerializer):
     empleado_info = JefeSerializer(source='empleado', read_only=True)
     aprobador_asignado_info = JefeSerializer(source='aprobador_asignado', read_only=True)
@@ -306,6 +319,9 @@ class HoraExtraSerializer(serializers.ModelSerializer):
             'comentario_aprobador',
         ]
 
+    def validate(self, attrs):
+        return validate_horario(self, attrs, 'hora_inicio', 'hora_fin')
+
 class SolicitudVacacionSerializer(serializers.ModelSerializer):
     empleado_info = JefeSerializer(source='empleado', read_only=True)
     aprobador_info = JefeSerializer(source='aprobador', read_only=True)
@@ -324,9 +340,9 @@ class SolicitudVacacionSerializer(serializers.ModelSerializer):
         return None
 
     def get_contrato_identificador(self, obj):
-        if obj.contrato:
-            return f"{obj.contrato.id}-{obj.empleado.id}"
-        return f"Sin contrato-{obj.empleado.id}"
+        if obj.contrato_id:
+            return f"{obj.contrato_id}-{obj.empleado_id}"
+        return f"Sin contrato-{obj.empleado_id}"
 
 class VacacionGuardadaSerializer(serializers.ModelSerializer):
     empleado_nombre = serializers.SerializerMethodField()
@@ -344,3 +360,10 @@ class VacacionGuardadaSerializer(serializers.ModelSerializer):
         if obj.contrato:
             return f"Contrato {obj.contrato.fecha_inicio}"
         return None
+
+class AuditEntrySerializer(serializers.ModelSerializer):
+    actor_username = serializers.CharField(source='actor.username', read_only=True, allow_null=True)
+
+    class Meta:
+        model = AuditEntry
+        fields = ['id', 'fecha', 'modelo', 'objeto_id', 'accion', 'cambios', 'actor', 'actor_username']
@@ -2,6 +2,8 @@ import requests
 import json
 from django.conf import settings
 
+from . import metrics
+
 def send_whatsapp_message(phone_number, message_text):
     """
     Sends a WhatsApp message using the WhatsApp Business Cloud API.
@@ -41,7 +43,8 @@ def send_whatsapp_message(phone_number, message_text):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload_text)
+        with metrics.track('ext'):
+            response = requests.post(url, headers=headers, json=payload_text)
         response.raise_for_status()
         print(f"✅ WhatsApp (Texto) enviado exitosamente a {clean_number}")
         return response.json()
@@ -62,7 +65,8 @@ def send_whatsapp_message(phone_number, message_text):
             }
         }
         try:
-            response_t = requests.post(url, headers=headers, json=payload_template)
+            with metrics.track('ext'):
+                response_t = requests.post(url, headers=headers, json=payload_template)
             response_t.raise_for_status()
             print(f"✅ WhatsApp (Template hello_world) enviado exitosamente a {clean_number}")
             return response_t.json()
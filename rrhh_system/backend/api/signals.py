@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Cargo, Departamento, Empleado, Familiar, Estudio, Contrato, Permiso, HoraExtra,
+    SolicitudVacacion, VacacionGuardada, RegistroEliminado,
+)
+from . import audit
+from . import cache as catalog_cache
+from . import search
+
+# Models whose changes invalidate the cached catalogs (see api.cache)
+CATALOG_MODELS = (Departamento, Cargo, Empleado)
+
+# Every model with a version counter; bulk writers bump these themselves
+VERSIONED_MODELS = CATALOG_MODELS + (Contrato,)
+
+# Models served with ?updated_since= (see api.mixins.DeltaSyncMixin)
+SYNCED_MODELS = (Empleado, Contrato, Permiso, HoraExtra, SolicitudVacacion, VacacionGuardada)
+
+# Models with a field-level audit trail (see api.audit)
+AUDITED_MODELS = (Empleado, Contrato, Permiso, HoraExtra, SolicitudVacacion, VacacionGuardada)
+
+
+@receiver(post_save, sender=Empleado)
+def update_empleado_search_index(sender, instance, raw=False, **kwargs):
+    # loaddata passes raw=True; rebuild_search_index covers that case
+    if raw:
+        return
+    search.index_empleado(instance)
+
+
+@receiver(post_save, sender=Departamento)
+@receiver(post_save, sender=Cargo)
+@receiver(post_save, sender=Empleado)
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Departamento)
+@receiver(post_delete, sender=Cargo)
+@receiver(post_delete, sender=Empleado)
+@receiver(post_delete, sender=Contrato)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Contrato has no cached catalog; its version only feeds the ETags of the
+    # vacation lists, which embed contract dates (see ConditionalGetMixin).
+    # Bumped after commit: a read in between would cache the old rows under
+    # the new version.
+    transaction.on_commit(lambda: catalog_cache.bump_version(sender))
+
+
+def record_deletion(sender, instance, **kwargs):
+    RegistroEliminado.objects.create(
+        modelo=sender._meta.label_lower, objeto_id=instance.pk,
+        empleado_id=getattr(instance, 'empleado_id', None),
+        aprobador_id=getattr(instance, 'aprobador_asignado_id', getattr(instance, 'aprobador_id', None)),
+    )
+
+
+for _model in SYNCED_MODELS:
+    post_delete.connect(record_deletion, sender=_model, dispatch_uid=f'record_deletion_{_model._meta.label_lower}')
+
+for _model in AUDITED_MODELS:
+    _label = _model._meta.label_lower
+    post_init.connect(audit.remember, sender=_model, dispatch_uid=f'audit_remember_{_label}')
+    post_save.connect(audit.on_save, sender=_model, dispatch_uid=f'audit_save_{_label}')
+    post_delete.connect(audit.on_delete, sender=_model, dispatch_uid=f'audit_delete_{_label}')
+
+
+@receiver(post_save, sender=Familiar)
+@receiver(post_save, sender=Estudio)
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Familiar)
+@receiver(post_delete, sender=Estudio)
+@receiver(post_delete, sender=Contrato)
+def touch_empleado(sender, instance, raw=False, **kwargs):
+    # These are nested in the Empleado payload, so a delta sync of empleados
+    # has to see the employee as changed.
+    if raw:
+        return
+    Empleado.objects.filter(pk=instance.empleado_id).update(updated_at=timezone.now())
@@ -1,3 +1,1421 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .models import (
+    Empleado, Departamento, Cargo, Familiar, Estudio, Contrato, Permiso, HoraExtra,
+    SolicitudVacacion, VacacionGuardada, PeriodicJob, JobRun, PermisoHorasMes, AuditEntry,
+    PermisoArchivado, RegistroEliminado, NotificacionPendiente
+)
+from . import archivo, conflicts, horas_permiso, jobs, metrics, notificaciones, proyeccion, search
+from . import cache as catalog_cache
+from .fast import FastSerializer
+from .nplusone import NPlusOneDetector, NPlusOneError, normalize_sql
+from .mixins import _parse_since
+from .pagination import OptionalPagination
+from .serializers import EmpleadoSerializer, PermisoSerializer, UserSerializer
+from .signals import VERSIONED_MODELS
+from .views import EmpleadoViewSet, HoraExtraViewSet, PermisoViewSet, SolicitudVacacionViewSet
+
+
+def crear_empleado(n, **extra):
+    data = dict(
+        nombres=f'Empleado{n}', apellido_paterno=f'Paterno{n}', apellido_materno=f'Materno{n}',
+        ci=f'{1000 + n}', sexo='M', estado_civil='S', celular='70000000',
+        email=f'empleado{n}@example.com', provincia='Cercado', direccion='Calle 1',
+        tipo_vivienda='P', nacionalidad='Boliviana', fecha_ingreso_inicial=date(2018, 1, 1),
+        fecha_ingreso_vigente=date(2018, 1, 1),
+    )
+    data.update(extra)
+    return Empleado.objects.create(**data)
+
+
+class RRHHDataMixin:
+    """A handful of employees spread across departments, each with history."""
+    N = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cargo = Cargo.objects.create(nombre='AYUDANTE')
+        cls.empleados = []
+        for i in range(cls.N):
+            depto = Departamento.objects.create(nombre=f'Depto {i}')
+            emp = crear_empleado(i, departamento=depto, cargo=cargo)
+            depto.jefe_departamento = emp
+            depto.save()
+            contrato = Contrato.objects.create(
+                empleado=emp, tipo_contrato='indefinido', tipo_trabajador='permanente',
+                contrato_fiscal='avicola', fecha_inicio=date(2018, 1, 1), salario_base='3500.00',
+                jornada_laboral='tiempo_completo',
+            )
+            Familiar.objects.create(empleado=emp, nombre_completo=f'Hijo {i}', parentesco='hijo/a')
+            Estudio.objects.create(empleado=emp, nivel='secundaria', carrera='Bachiller', institucion='Colegio', estado='concluido')
+            Permiso.objects.create(
+                empleado=emp, aprobador_asignado=emp, fecha_solicitud=date(2024, 3, i + 1),
+                tipo_permiso='personal', hora_salida=time(9), hora_regreso=time(11),
+            )
+            HoraExtra.objects.create(
+                empleado=emp, aprobador_asignado=emp, fecha_solicitud=date(2024, 3, i + 1),
+                tipo_hora_extra='horas_extras', hora_inicio=time(18), hora_fin=time(20),
+            )
+            SolicitudVacacion.objects.create(
+                empleado=emp, aprobador=emp, contrato=contrato, fecha_inicio=date(2024, 4, i + 1),
+                fecha_fin=date(2024, 4, i + 2), dias_calculados=2,
+            )
+            VacacionGuardada.objects.create(empleado=emp, contrato=contrato, dias=5, fecha=date(2023, 1, 1))
+            cls.empleados.append(emp)
+
+        # Every running deployment has the version counters (see api.cache);
+        # the bumps that would create them run on commit, which never comes here
+        catalog_cache.get_versions(VERSIONED_MODELS)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class CatalogCacheVersionTests(TestCase):
+    def test_bumped_only_when_the_change_commits(self):
+        antes = catalog_cache.get_versions([Cargo])
+        with transaction.atomic():
+            Cargo.objects.create(nombre='DESCARTADO')
+            transaction.set_rollback(True)
+        self.assertEqual(catalog_cache.get_versions([Cargo]), antes)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Cargo.objects.create(nombre='CHOFER')
+            self.assertEqual(catalog_cache.get_versions([Cargo]), antes)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(catalog_cache.get_versions([Cargo]), antes)
+
+
+class NPlusOneDetectorTests(TestCase):
+    def test_normalize_sql_groups_literals_and_in_lists(self):
+        a = normalize_sql('SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 10')
+        b = normalize_sql('SELECT * FROM t WHERE id IN (%s) AND x = 7')
+        self.assertEqual(a, b)
+
+    def test_raises_with_api_frame(self):
+        crear_empleado(1)
+        crear_empleado(2)
+        with self.assertRaises(NPlusOneError) as ctx:
+            with NPlusOneDetector(threshold=1):
+                for emp in Empleado.objects.all():
+                    Empleado.objects.filter(pk=emp.pk).exists()
+        self.assertIn('api/tests.py', str(ctx.exception))
+
+
+class ListEndpointsQueryTests(RRHHDataMixin, TestCase):
+    """Listing endpoints must not issue one query per row."""
+
+    def assertNoNPlusOne(self, url):
+        with NPlusOneDetector(threshold=3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_empleados(self):
+        self.assertNoNPlusOne('/api/empleados/?no_pagination=true')
+
+    def test_permisos(self):
+        self.assertNoNPlusOne('/api/permisos/?no_pagination=true')
+
+    def test_horas_extras(self):
+        self.assertNoNPlusOne('/api/horas-extras/?no_pagination=true')
+
+    def test_solicitudes_vacacion(self):
+        self.assertNoNPlusOne('/api/vacaciones-solicitudes/?no_pagination=true')
+
+    def test_vacaciones_guardadas(self):
+        self.assertNoNPlusOne('/api/vacaciones-guardadas/')
+
+    def test_departamentos(self):
+        self.assertNoNPlusOne('/api/departamentos/?no_pagination=true')
+
+
+class FastSerializerTests(RRHHDataMixin, TestCase):
+    """The compiled read path must render the same bytes as the serializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # No department, cargo or jefe; files, an empty optional field and no history
+        cls.suelto = crear_empleado(
+            50, foto='empleado_50/foto ñ.jpg', fotocopia_ci='empleado_50/ci.pdf', email='',
+        )
+        Permiso.objects.create(
+            empleado=cls.suelto, fecha_solicitud=date(2024, 5, 1), tipo_permiso='medico',
+            hora_salida=time(8, 30), hora_regreso=time(10),
+        )
+        for i in range(60, 66):
+            crear_empleado(i, departamento=cls.empleados[0].departamento, jefe=cls.empleados[0])
+
+    def setUp(self):
+        super().setUp()
+        self.request = Request(APIRequestFactory().get('/api/empleados/'))
+
+    def assertSameJSON(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True, context={'request': self.request}).data
+        fast = FastSerializer.for_class(serializer_class)
+        actual = fast.represent(fast.values(queryset), self.request)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_empleados(self):
+        self.assertSameJSON(EmpleadoSerializer, EmpleadoViewSet.queryset.all())
+
+    def test_permisos(self):
+        queryset = Permiso.objects.select_related('empleado__departamento', 'aprobador_asignado').order_by('id')
+        self.assertSameJSON(PermisoSerializer, queryset)
+
+    def test_unsupported_field(self):
+        with self.assertRaises(ImproperlyConfigured):
+            FastSerializer(UserSerializer)
+
+    def assertListMatchesSerializer(self, url, paginated=True):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if paginated else response.data
+        self.assertTrue(rows)
+        by_id = {e.pk: e for e in EmpleadoViewSet.queryset.filter(pk__in=[r['id'] for r in rows])}
+        request = response.wsgi_request
+        expected = EmpleadoSerializer([by_id[r['id']] for r in rows], many=True, context={'request': request}).data
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_list_pages(self):
+        self.assertListMatchesSerializer('/api/empleados/')
+        self.assertListMatchesSerializer('/api/empleados/?page=2')
+
+    def test_list_search(self):
+        self.assertListMatchesSerializer('/api/empleados/?search=Empleado50&no_pagination=true', paginated=False)
+
+    def test_list_permisos(self):
+        response = self.client.get('/api/permisos/?no_pagination=true')
+        permisos = {p.pk: p for p in Permiso.objects.all()}
+        expected = PermisoSerializer(
+            [permisos[r['id']] for r in response.data], many=True, context={'request': response.wsgi_request},
+        ).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+
+class PerformanceMetricsTests(RRHHDataMixin, TestCase):
+    N = 3
+
+    def setUp(self):
+        super().setUp()
+        metrics._histograms.clear()
+        metrics._queries.clear()
+
+    def server_timing(self, response):
+        return {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+
+    def test_server_timing_phases(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/vacaciones-guardadas/')
+        timing = self.server_timing(response)
+        self.assertEqual(list(timing), ['db', 'serialize', 'render', 'ext', 'app', 'total'])
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+        # Serialization is its own phase; its lazy queries stay in db
+        with mock.patch.object(metrics, 'observe', wraps=metrics.observe) as observe:
+            self.client.get('/api/vacaciones-guardadas/')
+            self.client.get(f'/api/permisos/{Permiso.objects.first().pk}/')
+            self.client.get('/api/permisos/')
+        for call in observe.call_args_list:
+            timings = call.args[2]
+            self.assertGreater(timings.serialize, 0)
+            phases = timings.phases()
+            self.assertAlmostEqual(
+                phases['total'], sum(phases[p] for p in ('db', 'serialize', 'render', 'ext', 'app')), delta=1e-6,
+            )
+
+    def metric_lines(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_prometheus_output_and_label_cardinality(self):
+        for emp in self.empleados:
+            self.client.get(f'/api/empleados/{emp.pk}/')
+        self.client.get('/api/empleados/')
+        for path in ('/api/nada/1/', '/api/nada/2/', '/wp-login.php'):
+            self.client.get(path)
+
+        lines = self.metric_lines()
+        counts = {}
+        for line in lines:
+            if line.startswith('rrhh_request_phase_seconds_count'):
+                labels, value = line[len('rrhh_request_phase_seconds_count'):].split(' ')
+                counts[labels] = int(value)
+        # One series per route name, whatever the ids in the path
+        self.assertEqual(counts['{view="empleado-detail",method="GET",phase="serialize"}'], self.N)
+        self.assertEqual(counts['{view="empleado-list",method="GET",phase="total"}'], 1)
+        self.assertEqual(counts['{view="unresolved",method="GET",phase="total"}'], 3)
+        self.assertEqual(
+            {label.split(',')[0] for label in counts}, {'{view="empleado-detail"', '{view="empleado-list"', '{view="unresolved"'},
+        )
+        self.assertEqual(len(counts), 3 * 6)
+
+        # Buckets are cumulative and end at the count
+        prefix = 'rrhh_request_phase_seconds_bucket{view="empleado-detail",method="GET",phase="total",'
+        buckets = [int(line.rsplit(' ', 1)[1]) for line in lines if line.startswith(prefix)]
+        self.assertEqual(len(buckets), len(metrics.BUCKETS) + 1)
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], self.N)
+        self.assertIn('rrhh_request_db_queries_total{view="empleado-list",method="GET"}', '\n'.join(lines))
+
+        user = User.objects.create_user('sinrol', password='pw')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/api/empleados/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics._histograms, {})
+
+
+class JobRunnerTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.job = jobs.Job('prueba', lambda: self.calls.append(1) or 'hecho', jobs.Every(hours=1), timedelta(minutes=5))
+        self.row = PeriodicJob.objects.create(nombre='prueba', proxima_ejecucion=timezone.now() - timedelta(seconds=1))
+
+    def test_lease_is_exclusive(self):
+        self.assertTrue(jobs.acquire(self.row, 'a', self.job.lease))
+        self.assertFalse(jobs.acquire(self.row, 'b', self.job.lease))
+        self.assertFalse(jobs.acquire(self.row, 'b', self.job.lease, force=True))
+        # An expired lease can be taken over
+        PeriodicJob.objects.filter(pk=self.row.pk).update(bloqueado_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(jobs.acquire(self.row, 'b', self.job.lease))
+
+    def test_run_records_history_and_reschedules(self):
+        self.assertTrue(jobs.acquire(self.row, 'a', self.job.lease))
+        record = jobs.run(self.job, self.row, 'a')
+        self.assertEqual((record.estado, record.resultado, self.calls), ('ok', 'hecho', [1]))
+        self.assertIsNotNone(record.duracion_ms)
+        self.row.refresh_from_db()
+        self.assertEqual((self.row.bloqueado_por, self.row.ultimo_estado), ('', 'ok'))
+        self.assertGreater(self.row.proxima_ejecucion, timezone.now() + timedelta(minutes=59))
+        # Not due any more
+        self.assertFalse(jobs.acquire(self.row, 'a', self.job.lease))
+
+    def test_failure_is_recorded(self):
+        job = self.job._replace(func=lambda: 1 / 0)
+        jobs.acquire(self.row, 'a', job.lease)
+        record = jobs.run(job, self.row, 'a')
+        self.assertEqual(record.estado, 'error')
+        self.assertIn('ZeroDivisionError', record.resultado)
+        self.assertEqual(JobRun.objects.get().estado, 'error')
+
+    @override_settings(JOBS_TIME_ZONE='America/La_Paz')
+    def test_cron_next(self):
+        from zoneinfo import ZoneInfo
+
+        cron = jobs.Cron('0 8 * * 1-6')
+        la_paz, utc = ZoneInfo('America/La_Paz'), ZoneInfo('UTC')
+        saturday = datetime(2026, 10, 24, 8, 0, tzinfo=la_paz)
+        monday = cron.next_after(saturday)
+        self.assertEqual(monday.astimezone(la_paz).replace(tzinfo=None), datetime(2026, 10, 26, 8, 0))
+        # 8:00 in La Paz (UTC-4), whatever TIME_ZONE is
+        self.assertEqual(monday.astimezone(utc).hour, 12)
+        # Saturday 03:00 UTC is still Friday night in La Paz
+        self.assertEqual(cron.next_after(datetime(2026, 10, 24, 3, 0, tzinfo=utc)), saturday)
+        with self.assertRaises(ValueError):
+            jobs.Cron('61 * * * *')
+
+
+@override_settings(PERMISO_TOPE_HORAS_MES={'personal': 3})
+class PermisoHorasMesTests(RRHHDataMixin, TestCase):
+    N = 1
+
+    def solicitar(self, dia, salida, regreso):
+        return self.client.post('/api/permisos/', {
+            'empleado': self.empleados[0].pk, 'fecha_solicitud': f'2024-05-{dia:02d}', 'tipo_permiso': 'personal',
+            'hora_salida': salida, 'hora_regreso': regreso,
+        })
+
+    def test_cap_and_transitions(self):
+        self.assertEqual(self.solicitar(2, '08:00', '10:00').status_code, 201)
+        response = self.solicitar(3, '08:00', '09:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tipo_permiso', response.data)
+        self.assertEqual(horas_permiso.usados(self.empleados[0].pk, date(2024, 5, 1), 'personal'), 120)
+
+        # Annulling frees the hours; approving keeps them counted
+        permiso = Permiso.objects.get(fecha_solicitud=date(2024, 5, 2))
+        self.client.patch(f'/api/permisos/{permiso.pk}/', {'estado': 'anulado'})
+        self.assertEqual(horas_permiso.usados(self.empleados[0].pk, date(2024, 5, 1), 'personal'), 0)
+        response = self.solicitar(3, '08:00', '11:00')
+        self.assertEqual(response.status_code, 201)
+        self.client.post(f'/api/permisos/{response.data["id"]}/approve/')
+        self.assertEqual(horas_permiso.usados(self.empleados[0].pk, date(2024, 5, 1), 'personal'), 180)
+        self.assertEqual(horas_permiso.reconciliar(), [((self.empleados[0].pk, 2024, 3, 'personal'), 0, 120)])
+
+    def test_changes_cannot_exceed_cap(self):
+        emp = self.empleados[0].pk
+        mayo = lambda: horas_permiso.usados(emp, date(2024, 5, 1), 'personal')
+        a = self.solicitar(2, '08:00', '10:00').data['id']
+        b = self.solicitar(3, '08:00', '09:00').data['id']
+        self.assertEqual(mayo(), 180)
+
+        # Longer permiso
+        response = self.client.patch(f'/api/permisos/{a}/', {'hora_regreso': '10:30'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tipo_permiso', response.data)
+        self.assertEqual(Permiso.objects.get(pk=a).hora_regreso, time(10))
+        self.assertEqual(self.client.patch(f'/api/permisos/{a}/', {'hora_regreso': '09:30'}).status_code, 200)
+        self.assertEqual(mayo(), 150)
+
+        # Another tipo or month
+        c = self.client.post('/api/permisos/', {
+            'empleado': emp, 'fecha_solicitud': '2024-05-04', 'tipo_permiso': 'trabajo',
+            'hora_salida': '08:00', 'hora_regreso': '09:00',
+        }).data['id']
+        self.assertEqual(self.client.patch(f'/api/permisos/{c}/', {'tipo_permiso': 'personal'}).status_code, 400)
+        self.assertEqual(self.client.patch(f'/api/permisos/{b}/', {'fecha_solicitud': '2024-06-03'}).status_code, 200)
+        self.assertEqual((mayo(), horas_permiso.usados(emp, date(2024, 6, 1), 'personal')), (90, 60))
+        self.assertEqual(self.client.patch(f'/api/permisos/{c}/', {'tipo_permiso': 'personal'}).status_code, 200)
+        self.assertEqual(mayo(), 150)
+
+        # Rejected or annulled and then live again
+        self.client.post(f'/api/permisos/{c}/reject/')
+        d = self.solicitar(5, '08:00', '09:30').data['id']
+        self.assertEqual(mayo(), 180)
+        self.assertEqual(self.client.patch(f'/api/permisos/{c}/', {'estado': 'pendiente'}).status_code, 400)
+        self.assertEqual(self.client.post(f'/api/permisos/{c}/approve/').status_code, 400)
+        self.assertEqual(Permiso.objects.get(pk=c).estado, 'rechazado')
+        self.client.patch(f'/api/permisos/{d}/', {'estado': 'anulado'})
+        self.assertEqual(self.client.patch(f'/api/permisos/{d}/', {'estado': 'pendiente'}).status_code, 200)
+        self.assertEqual(mayo(), 180)
+        self.assertEqual(horas_permiso.reconciliar(empleado_ids=[emp], dry_run=True), [((emp, 2024, 3, 'personal'), 0, 120)])
+
+    def test_reconcile(self):
+        PermisoHorasMes.objects.create(empleado=self.empleados[0], anio=2024, mes=3, tipo_permiso='personal', minutos=5)
+        self.assertEqual(horas_permiso.reconciliar(), [((self.empleados[0].pk, 2024, 3, 'personal'), 5, 120)])
+        self.assertEqual(horas_permiso.reconciliar(), [])
+
+
+class ConflictTests(RRHHDataMixin, TestCase):
+    """The fixture employee has a permiso 09-11 and overtime 18-20 on 2024-03-01, vacation 04-01/04-02."""
+    N = 1
+
+    def post(self, url, fecha, inicio, fin, **extra):
+        campos = ('hora_salida', 'hora_regreso') if 'permisos' in url else ('hora_inicio', 'hora_fin')
+        data = {'empleado': self.empleados[0].pk, 'fecha_solicitud': fecha, campos[0]: inicio, campos[1]: fin, **extra}
+        return self.client.post(url, data)
+
+    def permiso(self, fecha, inicio, fin):
+        return self.post('/api/permisos/', fecha, inicio, fin, tipo_permiso='personal')
+
+    def hora_extra(self, fecha, inicio, fin):
+        return self.post('/api/horas-extras/', fecha, inicio, fin, tipo_hora_extra='horas_extras')
+
+    def test_same_type_overlap(self):
+        response = self.permiso('2024-03-01', '10:00', '12:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['conflictos']), 1)
+        self.assertTrue(response.data['conflictos'][0].startswith('Permiso #'))
+        # Half-open intervals: back-to-back is fine
+        self.assertEqual(self.permiso('2024-03-01', '11:00', '12:00').status_code, 201)
+
+    def test_cross_type_overlap(self):
+        response = self.hora_extra('2024-03-01', '10:30', '11:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['conflictos'][0].startswith('Permiso #'))
+        response = self.permiso('2024-04-02', '09:00', '10:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['conflictos'][0].startswith('Vacación #'))
+        # A permiso that is no longer live does not hold its hours
+        Permiso.objects.update(estado='anulado')
+        self.assertEqual(self.hora_extra('2024-03-01', '10:30', '11:30').status_code, 201)
+
+    def test_midnight_wrap(self):
+        self.assertEqual(self.hora_extra('2024-03-05', '22:00', '02:00').status_code, 201)
+        response = self.permiso('2024-03-06', '01:00', '03:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Hora extra #', response.data['conflictos'][0])
+        self.assertEqual(self.permiso('2024-03-06', '02:00', '03:00').status_code, 201)
+
+    def test_equal_start_and_end_rejected(self):
+        response = self.permiso('2024-03-10', '08:00', '08:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('hora_regreso', response.data)
+        self.assertIn('hora_fin', self.hora_extra('2024-03-10', '08:00', '08:00').data)
+        permiso = Permiso.objects.get()
+        response = self.client.patch(f'/api/permisos/{permiso.pk}/', {'hora_regreso': '09:00'})
+        self.assertEqual(response.status_code, 400)
+        # Rows that have them anyway (imports, admin) count as 24 hours
+        interval = conflicts.permiso(None, permiso.empleado_id, date(2024, 3, 10), time(8), time(8))
+        self.assertEqual(interval.fin - interval.inicio, timedelta(hours=24))
+
+    def test_sweep_pairs(self):
+        emp = self.empleados[0].pk
+        intervals = sorted([
+            conflicts.vacacion(1, emp, date(2024, 4, 1), date(2024, 4, 2)),
+            conflicts.permiso(2, emp, date(2024, 4, 2), time(9), time(10)),
+            conflicts.hora_extra(3, emp, date(2024, 4, 2), time(23), time(1)),
+            conflicts.permiso(4, emp, date(2024, 4, 3), time(0, 30), time(2)),
+            conflicts.permiso(5, emp + 1, date(2024, 4, 2), time(9), time(10)),
+        ], key=lambda i: (i.empleado_id, i.inicio))
+        pairs = {(a.id, b.id) for a, b in conflicts.sweep(intervals)}
+        self.assertEqual(pairs, {(1, 2), (1, 3), (3, 4)})
+
+
+class ValoracionTests(RRHHDataMixin, TestCase):
+    """Approved overtime of May 2024 priced with the contract in force each day."""
+    N = 3
+    URL = '/api/horas-extras/valoracion/?desde=2024-05-01&hasta=2024-05-31'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        renovado, medio, anulado = cls.empleados
+        # Renewed mid-period with a new salary and another company
+        Contrato.objects.filter(empleado=renovado).update(estado_contrato='finalizado', fecha_fin=date(2024, 5, 15))
+        cls.contrato_nuevo = Contrato.objects.create(
+            empleado=renovado, tipo_contrato='indefinido', tipo_trabajador='permanente', contrato_fiscal='ovoplus',
+            fecha_inicio=date(2024, 5, 16), salario_base='4800.00', jornada_laboral='tiempo_completo',
+        )
+        Contrato.objects.filter(empleado=medio).update(jornada_laboral='medio_tiempo', salario_base='3600.00')
+        # A later contract that was annulled does not replace the one in force
+        Contrato.objects.create(
+            empleado=anulado, tipo_contrato='indefinido', tipo_trabajador='permanente', contrato_fiscal='ovoplus',
+            fecha_inicio=date(2024, 5, 1), salario_base='9000.00', jornada_laboral='tiempo_completo',
+            estado_contrato='anulado',
+        )
+        cls.sin_contrato = crear_empleado(10)
+
+        def aprobada(emp, dia, inicio, fin, tipo='horas_extras'):
+            return HoraExtra.objects.create(
+                empleado=emp, fecha_solicitud=date(2024, 5, dia), tipo_hora_extra=tipo,
+                hora_inicio=inicio, hora_fin=fin, estado='aprobado',
+            )
+
+        aprobada(renovado, 10, time(18), time(20))
+        aprobada(renovado, 20, time(18), time(20))
+        aprobada(medio, 12, time(22), time(1))
+        aprobada(anulado, 14, time(18), time(19))
+        aprobada(cls.sin_contrato, 15, time(18), time(20))
+        # Not valued: paid back in time off, or not approved
+        aprobada(medio, 13, time(18), time(20), tipo='compensacion')
+        HoraExtra.objects.create(
+            empleado=medio, fecha_solicitud=date(2024, 5, 13), tipo_hora_extra='horas_extras',
+            hora_inicio=time(20), hora_fin=time(22),
+        )
+
+    def test_detalle(self):
+        from decimal import Decimal
+
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        renovado, medio, anulado = self.empleados
+        rows = [
+            (r['empleado'], r['fecha'].day, r['contrato'], r['horas'], r['tarifa_hora'], r['monto'])
+            for r in response.data['detalle']
+        ]
+        self.assertEqual(rows, [
+            (renovado.pk, 10, renovado.contratos.get(estado_contrato='finalizado').pk,
+             Decimal('2.00'), Decimal('14.58'), Decimal('58.33')),
+            (medio.pk, 12, medio.contratos.get().pk, Decimal('3.00'), Decimal('30.00'), Decimal('180.00')),
+            (anulado.pk, 14, anulado.contratos.get(estado_contrato='vigente').pk,
+             Decimal('1.00'), Decimal('14.58'), Decimal('29.17')),
+            (self.sin_contrato.pk, 15, None, Decimal('2.00'), None, None),
+            (renovado.pk, 20, self.contrato_nuevo.pk, Decimal('2.00'), Decimal('20.00'), Decimal('80.00')),
+        ])
+        self.assertEqual(response.data['sin_contrato'], 1)
+        fiscales = {r['contrato_fiscal']: (r['registros'], r['monto']) for r in response.data['por_contrato_fiscal']}
+        self.assertEqual(fiscales, {'avicola': (3, Decimal('267.50')), 'ovoplus': (1, Decimal('80.00'))})
+        self.assertEqual(response.data['total_monto'], Decimal('347.50'))
+
+        ovoplus = self.client.get(self.URL + '&contrato_fiscal=ovoplus').data
+        self.assertEqual([r['contrato'] for r in ovoplus['detalle']], [self.contrato_nuevo.pk])
+
+    def test_csv(self):
+        import csv
+
+        response = self.client.get(self.URL + '&formato=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('horas_extras_2024-05-01_2024-05-31.csv', response['Content-Disposition'])
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(lines[0], [h for h, _ in HoraExtraViewSet.valoracion_columns])
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[2][-1], '180.00')
+        self.assertEqual(lines[4][-1], '')
+
+    def test_requires_a_period(self):
+        self.assertEqual(self.client.get('/api/horas-extras/valoracion/?desde=2024-05-01').status_code, 400)
+
+
+class AusenciasTests(TestCase):
+    """Week of Monday 2025-03-03 to Sunday 2025-03-09."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        cls.planta = Departamento.objects.create(nombre='Planta', minimo_personal=2)
+        cls.oficina = Departamento.objects.create(nombre='Oficina')
+        cls.a, cls.b, cls.c = (crear_empleado(i, departamento=cls.planta) for i in range(3))
+        cls.d, cls.e = (crear_empleado(i, departamento=cls.oficina) for i in range(3, 5))
+        # Two overlapping vacations count once; the permiso on one of their days
+        # counts as a permiso but the employee is absent only once
+        for inicio, fin in ((date(2025, 3, 3), date(2025, 3, 5)), (date(2025, 3, 4), date(2025, 3, 6))):
+            SolicitudVacacion.objects.create(
+                empleado=cls.a, fecha_inicio=inicio, fecha_fin=fin, dias_calculados=3, estado='aprobado',
+            )
+        for emp, dia in ((cls.a, 4), (cls.b, 7)):
+            Permiso.objects.create(
+                empleado=emp, fecha_solicitud=date(2025, 3, dia), tipo_permiso='personal',
+                hora_salida=time(9), hora_regreso=time(10),
+            )
+        # Cancelled: not an absence
+        SolicitudVacacion.objects.create(
+            empleado=cls.c, fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 3, 9), dias_calculados=6, estado='anulado',
+        )
+        SolicitudVacacion.objects.create(
+            empleado=cls.d, fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 3, 7), dias_calculados=5, estado='aprobado',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_heatmap(self):
+        response = self.client.get('/api/departamentos/ausencias/?desde=2025-03-03&hasta=2025-03-09')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['fechas']), 7)
+        oficina, planta = response.data['departamentos']
+        self.assertEqual(
+            (planta['nombre'], planta['plantilla'], planta['minimo_personal']), ('Planta', 3, 2),
+        )
+        self.assertEqual(planta['vacaciones'], [1, 1, 1, 1, 0, 0, 0])
+        self.assertEqual(planta['permisos'], [0, 1, 0, 0, 1, 0, 0])
+        self.assertEqual(planta['ausentes'], [1, 1, 1, 1, 1, 0, 0])
+        # No minimum set: counted all the same
+        self.assertEqual((oficina['plantilla'], oficina['minimo_personal']), (2, None))
+        self.assertEqual(oficina['ausentes'], [1, 1, 1, 1, 1, 0, 0])
+
+        # Clipped to the range, and filtered by department
+        data = self.client.get(
+            f'/api/departamentos/ausencias/?desde=2025-03-05&hasta=2025-03-05&departamento={self.planta.pk}',
+        ).data
+        self.assertEqual([d['nombre'] for d in data['departamentos']], ['Planta'])
+        self.assertEqual(data['departamentos'][0]['vacaciones'], [1])
+        self.assertEqual(self.client.get('/api/departamentos/ausencias/?desde=2025-03-09&hasta=2025-03-03').status_code, 400)
+
+    def solicitar(self, empleado, inicio, fin):
+        return self.client.post('/api/vacaciones-solicitudes/', {
+            'empleado': empleado.pk, 'fecha_inicio': inicio, 'fecha_fin': fin,
+        }, format='json')
+
+    def test_minimo_personal(self):
+        # With a away until the 6th, c leaving would leave b alone on the 5th and 6th
+        response = self.solicitar(self.c, '2025-03-05', '2025-03-08')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['minimo_personal'], [
+            'Planta quedaría con 1 presentes (mínimo 2) el 2025-03-05',
+            'Planta quedaría con 1 presentes (mínimo 2) el 2025-03-06',
+        ])
+        self.assertEqual(self.solicitar(self.c, '2025-03-07', '2025-03-08').status_code, 201)
+
+        # Without a minimum the department is never checked
+        self.assertEqual(self.solicitar(self.e, '2025-03-03', '2025-03-07').status_code, 201)
+
+
+class ProyeccionTests(RRHHDataMixin, TestCase):
+    N = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        hoy = date.today()
+        # Seniority in every tier, no start date, a start date after some of
+        # the movements, and approved / cancelled requests in the future
+        for n, inicio in enumerate([
+            hoy - relativedelta(years=12, months=3), hoy - relativedelta(years=7, days=40),
+            hoy - relativedelta(months=8), None, date(2023, 6, 1),
+        ], start=10):
+            emp = crear_empleado(n, fecha_ingreso_vigente=inicio)
+            VacacionGuardada.objects.create(empleado=emp, dias=4, fecha=date(2023, 1, 1))
+            VacacionGuardada.objects.create(empleado=emp, dias=2.5, fecha=hoy - timedelta(days=3))
+            for dias, estado, inicio_vac in ((3, 'aprobado', hoy - timedelta(days=20)), (2, 'aprobado', hoy + timedelta(days=9)),
+                                             (4, 'anulado', hoy + timedelta(days=2))):
+                SolicitudVacacion.objects.create(
+                    empleado=emp, fecha_inicio=inicio_vac, fecha_fin=inicio_vac + timedelta(days=dias - 1),
+                    dias_calculados=dias, estado=estado,
+                )
+
+    def test_saldo_actual_matches_ledger(self):
+        viewset = SolicitudVacacionViewSet()
+        rows = proyeccion.project(date.today(), hoy=date.today())
+        self.assertEqual(len(rows), Empleado.objects.count())
+        for row in rows:
+            with self.subTest(empleado=row['empleado_nombre']):
+                emp = Empleado.objects.get(pk=row['empleado'])
+                self.assertEqual(row['saldo_actual'], viewset._calculate_saldo_data(emp)['saldo'])
+                self.assertEqual(row['saldo_proyectado'], row['saldo_actual'])
+
+    def test_future_consumption_and_anniversary(self):
+        hoy = date.today()
+        # 6th anniversary in 10 days: the tier moves from 15 to 20 days
+        emp = crear_empleado(20, fecha_ingreso_vigente=hoy + timedelta(days=10) - relativedelta(years=6))
+        VacacionGuardada.objects.create(empleado=emp, dias=5, fecha=hoy - timedelta(days=30))
+        SolicitudVacacion.objects.create(
+            empleado=emp, fecha_inicio=hoy + timedelta(days=5), fecha_fin=hoy + timedelta(days=7), dias_calculados=3,
+        )
+        fecha = hoy + timedelta(days=30)
+        projected, = proyeccion.project(fecha, Empleado.objects.filter(pk=emp.pk), hoy=hoy)
+        self.assertEqual(projected['saldo_actual'], SolicitudVacacionViewSet()._calculate_saldo_data(emp)['saldo'])
+        self.assertEqual(
+            [projected[k] for k in ('saldo_actual', 'consumos_futuros', 'ley_por_devengar', 'saldo_proyectado', 'antiguedad_anios')],
+            [5 * 15 + 5 - 3, 3, 20, 5 * 15 + 5 - 3 + 20, 6],
+        )
+        # The day before the anniversary nothing accrues yet
+        row, = proyeccion.project(hoy + timedelta(days=9), Empleado.objects.filter(pk=emp.pk), hoy=hoy)
+        self.assertEqual((row['ley_por_devengar'], row['antiguedad_anios']), (0, 5))
+
+        response = self.client.get(f'/api/vacaciones-solicitudes/proyeccion/?fecha={fecha}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(projected, response.data['empleados'])
+        self.assertEqual(self.client.get(f'/api/vacaciones-solicitudes/proyeccion/?fecha={hoy - timedelta(days=1)}').status_code, 400)
+
+
+class DeltaSyncTests(RRHHDataMixin, TestCase):
+    N = 2
+
+    def sync(self, url, since):
+        return self.client.get(url, {'updated_since': since.isoformat()})
+
+    def test_changed_and_deleted_rows(self):
+        since = timezone.now()
+        cambiado, borrado = Permiso.objects.order_by('pk')
+        self.client.patch(f'/api/permisos/{cambiado.pk}/', {'observacion': 'Cita médica'})
+        self.assertEqual(self.client.delete(f'/api/permisos/{borrado.pk}/').status_code, 204)
+
+        response = self.sync('/api/permisos/', since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.data['results']], [cambiado.pk])
+        self.assertEqual(response.data['results'][0]['observacion'], 'Cita médica')
+        self.assertEqual(response.data['deleted'], [borrado.pk])
+
+        # The next sync from server_time has nothing new
+        again = self.sync('/api/permisos/', response.data['server_time'])
+        self.assertEqual((again.data['results'], again.data['deleted']), ([], []))
+
+    def test_nested_change_touches_empleado(self):
+        since = timezone.now()
+        familiar = Familiar.objects.get(empleado=self.empleados[1])
+        familiar.nombre_completo = 'Otro'
+        familiar.save()
+        response = self.sync('/api/empleados/', since)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.empleados[1].pk])
+
+    def test_too_old_or_invalid(self):
+        old = timezone.now() - timedelta(days=settings.DELTA_SYNC_RETENTION_DAYS + 1)
+        self.assertEqual(self.sync('/api/permisos/', old).status_code, 410)
+        self.assertEqual(self.client.get('/api/permisos/?updated_since=ayer').status_code, 400)
+
+    def test_space_in_updated_since(self):
+        # Between date and time it is a separator; before an offset, a '+'
+        # the client did not encode
+        self.assertEqual(_parse_since('2025-01-01 10:00'), timezone.make_aware(datetime(2025, 1, 1, 10)))
+        self.assertEqual(
+            _parse_since('2025-01-01T10:00:00 05:00'), datetime(2025, 1, 1, 5, tzinfo=ZoneInfo('UTC')),
+        )
+        self.assertEqual(
+            _parse_since('2025-01-01 10:00:00.5 0530'), datetime(2025, 1, 1, 4, 30, 0, 500000, tzinfo=ZoneInfo('UTC')),
+        )
+        self.assertEqual(_parse_since('2025-01-01'), timezone.make_aware(datetime(2025, 1, 1)))
+
+        since = timezone.localtime() - timedelta(hours=1)
+        for raw in (f'{since:%Y-%m-%d %H:%M}', since.isoformat().replace('+', ' ')):
+            with self.subTest(raw=raw):
+                self.assertEqual(self.client.get('/api/permisos/', {'updated_since': raw}).status_code, 200)
+
+    def test_deleted_scoped_to_user(self):
+        # empleado0 leads their department, where a subordinate works
+        jefe, otro = self.empleados
+        user = User.objects.create_user('jefe', password='pw')
+        Empleado.objects.filter(pk=jefe.pk).update(user=user)
+        subordinado = crear_empleado(10, departamento=jefe.departamento, jefe=jefe)
+        sub_permiso = Permiso.objects.create(
+            empleado=subordinado, fecha_solicitud=date(2024, 5, 2), tipo_permiso='personal',
+            hora_salida=time(9), hora_regreso=time(10),
+        )
+        HoraExtra.objects.create(
+            empleado=subordinado, fecha_solicitud=date(2024, 5, 2), tipo_hora_extra='horas_extras',
+            hora_inicio=time(18), hora_fin=time(19),
+        )
+        since = timezone.now()
+        propios = {
+            model: model.objects.get(empleado=jefe).pk for model in (Permiso, HoraExtra, SolicitudVacacion)
+        }
+        for model in (Permiso, HoraExtra, SolicitudVacacion):
+            model.objects.filter(empleado__in=[jefe, otro, subordinado]).delete()
+
+        self.client.force_authenticate(user)
+        deleted = {url: sorted(self.sync(url, since).data['deleted']) for url in (
+            '/api/permisos/', '/api/horas-extras/', '/api/vacaciones-solicitudes/',
+        )}
+        # Department heads see their department's permisos and vacations, but
+        # only the horas extras they request or approve
+        self.assertEqual(deleted['/api/permisos/'], sorted([propios[Permiso], sub_permiso.pk]))
+        self.assertEqual(deleted['/api/horas-extras/'], [propios[HoraExtra]])
+        self.assertEqual(deleted['/api/vacaciones-solicitudes/'], [propios[SolicitudVacacion]])
+
+        # Admins see every deletion, narrowed by ?empleado= where the list is
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(len(self.sync('/api/horas-extras/', since).data['deleted']), 3)
+        response = self.client.get('/api/permisos/', {'updated_since': since.isoformat(), 'empleado': otro.pk})
+        self.assertEqual(len(response.data['deleted']), 1)
+
+
+class ConditionalGetTests(RRHHDataMixin, TestCase):
+    N = 2
+    URL = '/api/permisos/'
+
+    def test_list_etag(self):
+        first = self.client.get(self.URL)
+        etag = first['ETag']
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('private', first['Cache-Control'])
+        cached = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], etag)
+        # Other filters, another tag
+        self.assertNotEqual(self.client.get(self.URL + '?empleado=%d' % self.empleados[0].pk)['ETag'], etag)
+
+    def test_changes_invalidate(self):
+        etag = self.client.get(self.URL)['ETag']
+        permiso = Permiso.objects.order_by('pk').first()
+        self.client.patch(f'{self.URL}{permiso.pk}/', {'observacion': 'Nuevo motivo'})
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # A deletion changes the count
+        etag = self.client.get(self.URL)['ETag']
+        self.client.delete(f'{self.URL}{permiso.pk}/')
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # A change in an embedded model (etag_models) once it commits
+        etag = self.client.get(self.URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Departamento.objects.filter(pk=self.empleados[1].departamento_id).get().save()
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_per_user(self):
+        etag = self.client.get(self.URL)['ETag']
+        other = User.objects.create_superuser('otro', 'otro@example.com', 'pw')
+        self.client.force_authenticate(other)
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_etag(self):
+        permiso = Permiso.objects.order_by('pk').first()
+        url = f'{self.URL}{permiso.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.patch(url, {'observacion': 'Nuevo motivo'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AuditTrailTests(RRHHDataMixin, TestCase):
+    N = 1
+
+    def test_request_diff_and_filters(self):
+        contrato = Contrato.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/contratos/{contrato.pk}/', {'salario_base': '4000.00'})
+        self.assertEqual(response.status_code, 200)
+        entry = AuditEntry.objects.get(modelo='api.contrato', objeto_id=contrato.pk)
+        self.assertEqual((entry.accion, entry.actor_id), ('modificar', self.admin.pk))
+        self.assertEqual(entry.cambios, {'salario_base': ['3500.00', '4000.00']})
+
+        response = self.client.get(f'/api/auditoria/?modelo=contrato&objeto_id={contrato.pk}')
+        self.assertEqual([e['id'] for e in response.data['results']], [entry.pk])
+        self.assertEqual(self.client.get(f'/api/auditoria/?actor={self.admin.pk}').data['count'], 1)
+        self.assertEqual(self.client.get('/api/auditoria/?objeto_id=1').status_code, 400)
+
+    def test_rollback_discards_entries(self):
+        permiso = Permiso.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    permiso.estado = 'aprobado'
+                    permiso.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            permiso.delete()
+        self.assertEqual(list(AuditEntry.objects.values_list('accion', flat=True)), ['eliminar'])
+
+
+class AuditRequestBufferTests(RRHHDataMixin, TransactionTestCase):
+    """Real commits, so the entries go through the request buffer as in production."""
+    N = 2
+
+    def setUp(self):
+        self.setUpTestData()
+        super().setUp()
+
+    def test_request_diffs_written_once(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        AuditEntry.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/vacaciones-solicitudes/liquidar_masivo/', {'liquidaciones': [
+                {'empleado_id': emp.pk, 'dias_pagar': 1, 'dias_guardar': 1} for emp in self.empleados
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "api_auditentry"')]
+        self.assertEqual(len(inserts), 1)
+        # Two consumos, one guardada, the contrato and the empleado per employee
+        entries = AuditEntry.objects.all()
+        self.assertEqual(entries.count(), 10)
+        self.assertEqual(set(entries.values_list('actor_id', flat=True)), {self.admin.pk})
+
+
+class ArchiveTests(RRHHDataMixin, TestCase):
+    N = 2
+
+    def test_move_and_include_archived(self):
+        # The first employee's permiso is closed, the second one still pendiente
+        Permiso.objects.filter(empleado=self.empleados[0]).update(estado='aprobado')
+        horas_permiso.reconciliar()
+        before = self.client.get('/api/permisos/?no_pagination=true').data
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archivo.archivar(Permiso, PermisoArchivado, date(2025, 1, 1), chunk_size=1), 1)
+        archived = PermisoArchivado.objects.get()
+        self.assertEqual(archived.empleado_id, self.empleados[0].pk)
+        self.assertFalse(Permiso.objects.filter(pk=archived.pk).exists())
+        self.assertTrue(RegistroEliminado.objects.filter(modelo='api.permiso', objeto_id=archived.pk).exists())
+        # Nor an audited deletion
+        self.assertFalse(AuditEntry.objects.filter(accion='eliminar').exists())
+        # Both tables get their columns from the same bases
+        self.assertEqual(
+            sorted(f.name for f in PermisoArchivado._meta.concrete_fields if f.name != 'archivado_en'),
+            sorted(f.name for f in Permiso._meta.concrete_fields),
+        )
+        # Moving is not a change for the hour counters
+        self.assertEqual(horas_permiso.reconciliar(), [])
+
+        hot = self.client.get('/api/permisos/?no_pagination=true').data
+        self.assertEqual([p['id'] for p in hot], [Permiso.objects.get().pk])
+        both = self.client.get('/api/permisos/?no_pagination=true&include_archived=true').data
+        self.assertEqual(sorted(both, key=lambda p: p['id']), sorted(before, key=lambda p: p['id']))
+
+
+class SearchTests(RRHHDataMixin, TestCase):
+    N = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        contrato = cls.empleados[0].contratos.get()
+        nombres = [
+            ('María', 'Rolón', 'Ríos'),
+            ('Pedro', 'ROLON', 'Vargas'),
+            ('Ana', 'Ríos', 'Suárez'),
+            ('Rosa', 'Romero', 'Paz'),
+        ]
+        cls.buscados = {}
+        for n, (nombres_, paterno, materno) in enumerate(nombres, start=10):
+            emp = crear_empleado(n, nombres=nombres_, apellido_paterno=paterno, apellido_materno=materno)
+            VacacionGuardada.objects.create(empleado=emp, contrato=contrato, dias=1, fecha=date(2023, 1, 1))
+            cls.buscados[nombres_] = emp.id
+
+    def search(self, url, query):
+        response = self.client.get(url, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_accent_and_case_folding(self):
+        rolon = [self.buscados['María'], self.buscados['Pedro']]
+        for query in ('rolon', 'ROLÓN', 'Rolón', ' rolón! '):
+            with self.subTest(query=query):
+                self.assertCountEqual(self.search('/api/empleados/', query), rolon)
+        # Inside a word too, like the old icontains
+        self.assertEqual(self.search('/api/empleados/', 'suar'), [self.buscados['Ana']])
+
+    def test_ranking_and_cut_off(self):
+        # 'rolon rios' has 5 trigrams: María has all of them, Pedro the 3 of
+        # rolon (at MIN_SIMILARITY), Ana the 2 of rios (below it)
+        self.assertEqual(
+            self.search('/api/empleados/', 'rolon rios'), [self.buscados['María'], self.buscados['Pedro']],
+        )
+        # Stricter threshold: only the full match
+        qs = search.rank_queryset(Empleado.objects.order_by('nombres'), 'rolon rios', min_similarity=1)
+        self.assertEqual([(e.id, e.search_rank) for e in qs], [(self.buscados['María'], 5)])
+
+    def test_short_and_empty_queries(self):
+        # Words under 3 characters match as a prefix of a word: '  r' and
+        # ' ro', one of them is enough, words starting with 'ro' rank first
+        # (then by name)
+        b = self.buscados
+        self.assertEqual(self.search('/api/empleados/', 'ro'), [b['María'], b['Pedro'], b['Rosa'], b['Ana']])
+        self.assertEqual(self.search('/api/empleados/', 'ri'), [b['Ana'], b['María'], b['Pedro'], b['Rosa']])
+        # Nothing searchable: the list is not filtered
+        todos = self.search('/api/empleados/', '')
+        self.assertEqual(len(todos), Empleado.objects.count())
+        for query in ('  ', '¿?', '-'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search('/api/empleados/', query), todos)
+
+    def test_search_with_cursor(self):
+        expected = self.search('/api/empleados/', 'ro')
+        ids = []
+        url = '/api/empleados/?search=ro&cursor='
+        with mock.patch.object(OptionalPagination, 'page_size', 1):
+            while url:
+                data = self.client.get(url).data
+                ids += [row['id'] for row in data['results']]
+                url = data['next']
+        self.assertEqual(ids, expected)
+
+    def test_vacaciones_guardadas(self):
+        ids = self.search('/api/vacaciones-guardadas/', 'rolón')
+        empleados = VacacionGuardada.objects.filter(id__in=ids).values_list('empleado_id', flat=True)
+        self.assertCountEqual(empleados, [self.buscados['María'], self.buscados['Pedro']])
+
+        # The index follows renames
+        emp = Empleado.objects.get(id=self.buscados['Ana'])
+        emp.apellido_paterno = 'Rolón'
+        emp.save()
+        self.assertEqual(len(self.search('/api/vacaciones-guardadas/', 'rolon')), 3)
+
+
+class CursorPaginationTests(RRHHDataMixin, TestCase):
+    N = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Several rows per date, so the id tiebreaker matters
+        Permiso.objects.bulk_create([
+            Permiso(
+                empleado=cls.empleados[i % 2], fecha_solicitud=date(2024, 6, 1 + i // 5), tipo_permiso='personal',
+                hora_salida=time(8), hora_regreso=time(9),
+            )
+            for i in range(23)
+        ])
+
+    def walk(self, url, key):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data[key]
+        return ids, pages
+
+    def test_walk_both_ways(self):
+        expected = list(Permiso.objects.order_by('-fecha_solicitud', '-id').values_list('id', flat=True))
+        ids, pages = self.walk('/api/permisos/?cursor=', 'next')
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn('count', pages[0])
+        self.assertIsNone(pages[0]['previous'])
+
+        # Going back yields the same pages, in the same row order
+        back, _ = self.walk(pages[-1]['previous'], 'previous')
+        self.assertEqual(back, expected[10:20] + expected[:10])
+        self.assertEqual(self.client.get('/api/permisos/?cursor=nope').status_code, 404)
+
+    def test_approximate_count(self):
+        with mock.patch.object(OptionalPagination, 'count_limit', 50):
+            data = self.client.get('/api/permisos/?cursor=&count=aprox').data
+        self.assertEqual((data['count'], data['count_exacto']), (25, True))
+        with mock.patch.object(OptionalPagination, 'count_limit', 10):
+            data = self.client.get('/api/permisos/?cursor=&count=aprox').data
+        # Lower bound outside PostgreSQL
+        self.assertEqual((data['count'], data['count_exacto']), (11, False))
+
+    def test_datetime_cursor_keeps_microseconds(self):
+        # 30 entries inside one millisecond: a cursor that drops the
+        # microseconds would skip or repeat rows at every page boundary
+        base = timezone.now().replace(microsecond=0)
+        AuditEntry.objects.bulk_create([
+            AuditEntry(modelo='api.permiso', objeto_id=i, accion='crear', fecha=base + timedelta(microseconds=30 - i))
+            for i in range(30)
+        ])
+        expected = list(AuditEntry.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        with mock.patch.object(OptionalPagination, 'page_size', 7):
+            ids, pages = self.walk('/api/auditoria/?cursor=', 'next')
+            back, _ = self.walk(pages[-1]['previous'], 'previous')
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sorted(back), sorted(expected[:28]))
+
+
+class StreamingListTests(RRHHDataMixin, TestCase):
+    N = 3
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_same_rows_as_list(self):
+        for url in ('/api/empleados/', '/api/permisos/', '/api/vacaciones-solicitudes/'):
+            with self.subTest(url=url):
+                expected = json.loads(JSONRenderer().render(self.client.get(url + '?no_pagination=true').data))
+                self.assertEqual(self.stream(url + '?stream=ndjson'), expected)
+
+    def test_chunked_reads(self):
+        # Several keyset queries (no server-side cursor), the same rows
+        Permiso.objects.filter(empleado=self.empleados[0]).update(estado='aprobado')
+        archivo.archivar(Permiso, PermisoArchivado, date(2025, 1, 1))
+        for url in ('/api/empleados/', '/api/horas-extras/', '/api/vacaciones-solicitudes/', '/api/permisos/?include_archived=true&'):
+            with self.subTest(url=url):
+                sep = '' if url.endswith('&') else '?'
+                expected = json.loads(JSONRenderer().render(self.client.get(f'{url}{sep}no_pagination=true').data))
+                with mock.patch('api.mixins.StreamingListMixin.stream_chunk_size', 2), \
+                        CaptureQueriesContext(connection) as queries:
+                    rows = self.stream(f'{url}{sep}stream=ndjson')
+                self.assertEqual(rows, expected)
+                self.assertGreaterEqual(sum('LIMIT 2' in q['sql'] for q in queries), 2)
+
+    @override_settings(NO_PAGINATION_MAX_ROWS=2)
+    def test_no_pagination_cap(self):
+        self.assertEqual(self.client.get('/api/permisos/?no_pagination=true').status_code, 400)
+        self.assertEqual(len(self.stream('/api/permisos/?stream=ndjson')), 3)
+        with override_settings(NO_PAGINATION_MAX_ROWS=3):
+            self.assertEqual(len(self.client.get('/api/permisos/?no_pagination=true').data), 3)
+
+
+class ExportTests(RRHHDataMixin, TestCase):
+    N = 3
+
+    def download(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def csv_rows(self, url):
+        content = self.download(url).decode('utf-8')
+        # BOM so Excel reads the accents right
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(content[1:])))
+
+    def xlsx_rows(self, url):
+        sheet = load_workbook(io.BytesIO(self.download(url)), read_only=True).active
+        return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    def test_empleados(self):
+        header = [h for h, _ in EmpleadoViewSet.export_columns]
+        expected = list(Empleado.objects.order_by('nombres', 'apellido_paterno', 'apellido_materno').values_list('ci', flat=True))
+        for rows in (self.csv_rows('/api/empleados/exportar/?formato=csv'), self.xlsx_rows('/api/empleados/exportar/')):
+            self.assertEqual(rows[0], header)
+            self.assertEqual([row[0] for row in rows[1:]], expected)
+        self.assertEqual(self.client.get('/api/empleados/exportar/?formato=pdf').status_code, 400)
+
+    def test_permisos_include_archived(self):
+        Permiso.objects.filter(empleado=self.empleados[0]).update(estado='aprobado')
+        archivo.archivar(Permiso, PermisoArchivado, date(2025, 1, 1))
+        self.assertEqual((Permiso.objects.count(), PermisoArchivado.objects.count()), (self.N - 1, 1))
+
+        url = '/api/permisos/exportar/?desde=2024-01-01&hasta=2024-12-31'
+        hot = self.csv_rows(url + '&formato=csv')
+        self.assertEqual(hot[0], [h for h, _ in PermisoViewSet.export_columns])
+        self.assertEqual(len(hot) - 1, Permiso.objects.count())
+
+        # UNION ALL with the archive, in fecha_solicitud order
+        fechas = sorted(
+            [p.fecha_solicitud for p in Permiso.objects.all()] + [p.fecha_solicitud for p in PermisoArchivado.objects.all()]
+        )
+        both = self.csv_rows(url + '&formato=csv&include_archived=true')
+        self.assertEqual([row[0] for row in both[1:]], [f.isoformat() for f in fechas])
+        archived = self.empleados[0]
+        self.assertIn([archived.ci, 'Aprobado'], [[row[1], row[9]] for row in both[1:]])
+
+        rows = self.xlsx_rows(url + '&include_archived=true')
+        self.assertEqual([row[0].date() for row in rows[1:]], fechas)
+
+    def test_historial_todos(self):
+        SolicitudVacacion.objects.filter(empleado=self.empleados[1]).update(estado='aprobado')
+        viewset = SolicitudVacacionViewSet()
+        expected = [
+            (emp.ci, len(viewset._calculate_saldo_data(emp)['historial']))
+            for emp in Empleado.objects.order_by('apellido_paterno', 'apellido_materno', 'nombres', 'id')
+        ]
+        rows = self.csv_rows('/api/vacaciones-solicitudes/historial/exportar/?todos=true&formato=csv')
+        self.assertEqual(rows[0], ['CI', 'Empleado'] + SolicitudVacacionViewSet.historial_columns)
+        cis = [row[0] for row in rows[1:]]
+        self.assertEqual([(ci, cis.count(ci)) for ci, _ in expected], expected)
+        self.assertEqual(len(cis), sum(n for _, n in expected))
+        self.assertEqual(len(self.xlsx_rows('/api/vacaciones-solicitudes/historial/exportar/?todos=true')), len(rows))
+
+        user = User.objects.create_user('sinrol', password='pw')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/vacaciones-solicitudes/historial/exportar/?todos=true').status_code, 403)
+
+
+class NotificationDigestTests(RRHHDataMixin, TestCase):
+    N = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.jefe = cls.empleados[0]
+        cls.subordinados = [crear_empleado(10 + i, departamento=cls.jefe.departamento) for i in range(2)]
+
+    def solicitar(self, empleado, dia):
+        return self.client.post('/api/permisos/', {
+            'empleado': empleado.pk, 'fecha_solicitud': f'2024-07-{dia:02d}', 'tipo_permiso': 'personal',
+            'hora_salida': '08:00', 'hora_regreso': '09:00',
+        })
+
+    @mock.patch('api.notificaciones.send_whatsapp_message')
+    def test_immediate_by_default(self, send):
+        self.solicitar(self.subordinados[0], 1)
+        self.solicitar(self.subordinados[1], 2)
+        self.assertEqual(send.call_count, 2)
+        self.assertFalse(NotificacionPendiente.objects.exists())
+
+    @mock.patch('api.notificaciones.send_whatsapp_message')
+    def test_digest_per_window(self, send):
+        Empleado.objects.filter(pk=self.jefe.pk).update(preferencia_notificacion='resumen')
+        self.solicitar(self.subordinados[0], 1)
+        self.solicitar(self.subordinados[1], 2)
+        send.assert_not_called()
+        self.assertEqual(NotificacionPendiente.objects.filter(destinatario=self.jefe).count(), 2)
+
+        # Nothing goes out before the window has passed
+        self.assertEqual(notificaciones.enviar_resumenes(), (0, 0))
+        later = timezone.now() + timedelta(minutes=settings.NOTIFICACIONES_RESUMEN_MINUTOS)
+        self.assertEqual(notificaciones.enviar_resumenes(ahora=later), (1, 2))
+        (celular, texto), _ = send.call_args
+        self.assertEqual(celular, self.jefe.celular)
+        self.assertIn('Solicitudes pendientes de aprobación: 2', texto)
+        self.assertIn('Empleado10 Paterno10', texto)
+        self.assertIn('Empleado11 Paterno11', texto)
+        self.assertFalse(NotificacionPendiente.objects.exists())
+
+    def test_own_preference(self):
+        user = User.objects.create_user('jefe', 'jefe@example.com', 'pw')
+        Empleado.objects.filter(pk=self.jefe.pk).update(user=user)
+        self.client.force_authenticate(user)
+        response = self.client.patch('/api/me/notificaciones/', {'preferencia_notificacion': 'resumen'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['preferencia_notificacion'], 'resumen')
+        self.assertEqual(Empleado.objects.get(pk=self.jefe.pk).preferencia_notificacion, 'resumen')
+        self.assertEqual(self.client.patch('/api/me/notificaciones/', {'preferencia_notificacion': 'x'}).status_code, 400)
+
+
+class VencimientosTests(RRHHDataMixin, TestCase):
+    N = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        hoy = date.today()
+        cls.contratos = {}
+        for n, (nombre, tipo, estado, dias) in enumerate([
+            ('vencido', 'plazo_fijo', 'vigente', -3),
+            ('hoy', 'plazo_fijo', 'vigente', 0),
+            ('pronto', 'plazo_fijo', 'vigente', 10),
+            ('lejos', 'plazo_fijo', 'vigente', 40),
+            ('indefinido', 'indefinido', 'vigente', 5),
+            ('finalizado', 'plazo_fijo', 'finalizado', 5),
+        ], start=10):
+            cls.contratos[nombre] = cls.contrato(crear_empleado(n), tipo, estado, hoy + timedelta(days=dias))
+
+        # An RRHH user whose profile prefers digests, and the superuser without
+        # a profile (email)
+        cls.rrhh = User.objects.create_user('rrhh', 'rrhh@example.com', 'pw')
+        cls.rrhh.groups.add(Group.objects.create(name='RRHH'))
+        cls.perfil = crear_empleado(20, user=cls.rrhh, preferencia_notificacion='resumen')
+
+    @staticmethod
+    def contrato(empleado, tipo, estado, fin):
+        return Contrato.objects.create(
+            empleado=empleado, tipo_contrato=tipo, tipo_trabajador='eventual', contrato_fiscal='avicola',
+            fecha_inicio=date(2024, 1, 1), fecha_fin_pactada=fin, salario_base='3000.00',
+            jornada_laboral='tiempo_completo', estado_contrato=estado,
+        ).pk
+
+    def test_endpoint(self):
+        data = self.client.get('/api/contratos/vencimientos/?dias=30').data
+        self.assertEqual(
+            [(c['id'], c['dias_restantes']) for c in data['contratos']],
+            [(self.contratos['hoy'], 0), (self.contratos['pronto'], 10)],
+        )
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([(c['id'], c['dias_restantes']) for c in data['vencidos']], [(self.contratos['vencido'], -3)])
+        data = self.client.get('/api/contratos/vencimientos/?dias=60').data
+        self.assertEqual(data['total'], 3)
+        for dias in ('-1', 'x'):
+            self.assertEqual(self.client.get(f'/api/contratos/vencimientos/?dias={dias}').status_code, 400)
+
+    def notify(self, *args):
+        out = io.StringIO()
+        call_command('notify_contract_expiry', '--dias=30', *args, stdout=out)
+        return out.getvalue()
+
+    @mock.patch('api.vencimientos.send_whatsapp_message')
+    def test_command_queues_each_contract_once(self, send):
+        self.notify('--dry-run')
+        self.assertEqual((len(mail.outbox), NotificacionPendiente.objects.count()), (0, 0))
+
+        out = self.notify()
+        self.assertIn('2 contracts ending, 1 overdue', out)
+        send.assert_not_called()
+        # The superuser gets the email, with the overdue contract apart
+        email, = mail.outbox
+        self.assertEqual(email.to, ['admin@example.com'])
+        self.assertLess(email.body.index('vencidos sin renovar'), email.body.index('por vencer (próximos 30 días)'))
+        self.assertIn('venció hace 3 días', email.body)
+        self.assertIn('vence hoy', email.body)
+        pendientes = NotificacionPendiente.objects.filter(destinatario=self.perfil, modelo='api.contrato')
+        esperados = [self.contratos['vencido'], self.contratos['hoy'], self.contratos['pronto']]
+        self.assertCountEqual(pendientes.values_list('objeto_id', flat=True), esperados)
+
+        # A second run, or one with a new contract, does not queue the others again
+        self.notify()
+        self.assertEqual(pendientes.count(), 3)
+        nuevo = self.contrato(crear_empleado(30), 'plazo_fijo', 'vigente', date.today() + timedelta(days=20))
+        self.notify()
+        self.assertCountEqual(pendientes.values_list('objeto_id', flat=True), esperados + [nuevo])
+
+        # With an immediate preference the digest goes out by WhatsApp
+        Empleado.objects.filter(pk=self.perfil.pk).update(preferencia_notificacion='inmediata')
+        self.notify()
+        (celular, texto), _ = send.call_args
+        self.assertEqual(celular, self.perfil.celular)
+        self.assertIn('Empleado30', texto)
+
+
+class LiquidacionMasivaTests(RRHHDataMixin, TestCase):
+    URL = '/api/vacaciones-solicitudes/liquidar_masivo/'
+
+    def saldo(self, emp):
+        return SolicitudVacacionViewSet()._saldos_bulk([emp])[emp.pk]
+
+    def post(self, *items):
+        return self.client.post(self.URL, {'liquidaciones': list(items)}, format='json')
+
+    def test_liquidates_every_employee(self):
+        a, b = self.empleados[:2]
+        saldo = self.saldo(a)
+        self.assertGreaterEqual(saldo, 3)
+        response = self.post(
+            {'empleado_id': a.pk, 'dias_pagar': 2, 'dias_guardar': 1, 'nueva_fecha': '2025-06-30'},
+            {'empleado_id': b.pk, 'dias_pagar': 1, 'nueva_fecha': '2025-06-30'},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {
+            'status': 'ok', 'liquidados': 2, 'solicitudes_creadas': 3,
+            'guardadas_creadas': 1, 'contratos_finalizados': 2,
+        })
+        # The day moved to guardadas stays in the balance
+        self.assertEqual(self.saldo(a), round(saldo - 2, 1))
+        consumos = SolicitudVacacion.objects.filter(empleado=a, fecha_inicio=date(2025, 6, 30))
+        self.assertEqual(sorted(consumos.values_list('dias_calculados', flat=True)), [1, 2])
+        self.assertTrue(VacacionGuardada.objects.filter(empleado=a, dias=1, fecha=date(2025, 6, 30)).exists())
+        for emp in (a, b):
+            contrato = emp.contratos.get()
+            self.assertEqual((contrato.estado_contrato, contrato.fecha_fin), ('finalizado', date(2025, 6, 30)))
+            emp.refresh_from_db()
+            self.assertEqual(emp.estado, 'inactivo')
+        self.assertEqual(self.empleados[2].contratos.get().estado_contrato, 'vigente')
+
+    def test_insufficient_balance_writes_nothing(self):
+        a, b = self.empleados[:2]
+        antes = SolicitudVacacion.objects.count()
+        response = self.post(
+            {'empleado_id': a.pk, 'dias_pagar': 1},
+            {'empleado_id': b.pk, 'dias_pagar': self.saldo(b) + 1},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([d['indice'] for d in response.json()['detalles']], [1])
+        self.assertEqual(SolicitudVacacion.objects.count(), antes)
+        self.assertEqual(a.contratos.get().estado_contrato, 'vigente')
+        a.refresh_from_db()
+        self.assertNotEqual(a.estado, 'inactivo')
+
+    def test_repeated_employee_is_rejected(self):
+        a = self.empleados[0]
+        antes = SolicitudVacacion.objects.count()
+        response = self.post({'empleado_id': a.pk, 'dias_pagar': 1}, {'empleado_id': a.pk, 'dias_guardar': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detalles'], [
+            {'indice': 1, 'empleado_id': a.pk, 'error': 'Empleado repetido en la lista.'},
+        ])
+        self.assertEqual(SolicitudVacacion.objects.count(), antes)
+        self.assertEqual(VacacionGuardada.objects.filter(empleado=a).count(), 1)
+
+    def test_versions_bumped_after_commit(self):
+        antes = catalog_cache.get_versions([Empleado, Contrato])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.post({'empleado_id': self.empleados[0].pk, 'dias_pagar': 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(catalog_cache.get_versions([Empleado, Contrato]), antes)
+        for callback in callbacks:
+            callback()
+        despues = catalog_cache.get_versions([Empleado, Contrato])
+        self.assertTrue(all(d > a for a, d in zip(antes, despues)))
+
+    def test_locks_the_employees(self):
+        a = self.empleados[0]
+        with mock.patch('api.views.Empleado.objects.select_for_update', wraps=Empleado.objects.select_for_update) as lock:
+            response = self.post({'empleado_id': a.pk, 'dias_pagar': 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        lock.assert_called_once_with()
+
+
+class BackupRoundTripTests(TransactionTestCase):
+    def test_permissions_survive_renumbering(self):
+        import os
+        import tempfile
+
+        from django.apps import apps
+        from django.contrib.auth.management import create_permissions
+        from django.contrib.auth.models import Group, Permission
+        from django.core.management import call_command
+
+        codenames = {'change_permiso', 'view_empleado'}
+        group = Group.objects.create(name='Revisores')
+        group.permissions.set(Permission.objects.filter(codename__in=codenames))
+        user = User.objects.create_user('revisor', 'revisor@example.com', 'pw')
+        user.groups.add(group)
+        user.user_permissions.add(Permission.objects.get(codename='add_horaextra'))
+
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command('export_jsonl', path, stdout=io.StringIO())
+        call_command('flush', interactive=False, verbosity=0)
+        # A fresh database numbers the permissions on its own
+        Permission.objects.all().delete()
+        for app_config in apps.get_app_configs():
+            create_permissions(app_config, verbosity=0)
+        call_command('import_jsonl', path, stdout=io.StringIO())
+
+        group = Group.objects.get(name='Revisores')
+        self.assertEqual(set(group.permissions.values_list('codename', flat=True)), codenames)
+        user = User.objects.get(username='revisor')
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Revisores'])
+        self.assertEqual(list(user.user_permissions.values_list('codename', flat=True)), ['add_horaextra'])
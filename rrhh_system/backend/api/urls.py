@@ -2,9 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserCreate, EmpleadoViewSet, DepartamentoViewSet, CargoViewSet,
-    FamiliarViewSet, EstudioViewSet, ContratoViewSet, get_current_user, UserViewSet,
+    FamiliarViewSet, EstudioViewSet, ContratoViewSet, get_current_user, mis_notificaciones, UserViewSet,
     JefesDepartamentoListView, PermisoViewSet, HoraExtraViewSet,
-    SolicitudVacacionViewSet, VacacionGuardadaViewSet, PasswordResetRequestView
+    SolicitudVacacionViewSet, VacacionGuardadaViewSet, PasswordResetRequestView,
+    CatalogCacheStatsView, MetricsView, AuditEntryViewSet
 )
 
 # Create a router and register our viewsets with it.
@@ -20,12 +21,16 @@ router.register(r'permisos', PermisoViewSet)
 router.register(r'horas-extras', HoraExtraViewSet, basename='horas-extras')
 router.register(r'vacaciones-solicitudes', SolicitudVacacionViewSet)
 router.register(r'vacaciones-guardadas', VacacionGuardadaViewSet)
+router.register(r'auditoria', AuditEntryViewSet, basename='auditoria')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
     path('jefes-departamento/', JefesDepartamentoListView.as_view(), name='jefes-departamento-list'),
     path('register/', UserCreate.as_view(), name='user-create'),
     path('me/', get_current_user, name='current-user'),
+    path('me/notificaciones/', mis_notificaciones, name='mis-notificaciones'),
+    path('catalog-cache/stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('password_reset/', PasswordResetRequestView.as_view(), name='password_reset_request'),
     path('', include('django.contrib.auth.urls')), # This adds: password_reset_confirm, password_reset_complete, etc.
     path('', include(router.urls)),
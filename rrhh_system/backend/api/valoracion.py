@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import CONTRATO_FISCAL_CHOICES, JORNADA_LABORAL_CHOICES, Contrato, HoraExtra, HoraExtraArchivada
+
+# Overtime valuation for a period.
+#
+# Each approved 'horas_extras' record is priced with the contract in force on
+# its fecha_solicitud: the non-anulado contract of the employee that started
+# on or before that day and had not ended (fecha_fin) yet, the latest one if
+# renewals overlap. The contract is picked by a correlated subquery in the same
+# query that reads the horas extras, so the whole period takes two queries
+# whatever the number of employees.
+#
+# Hourly rate = salario_base / monthly hours of the jornada (30 days of 8 hours,
+# 4 for medio tiempo); overtime is paid with a 100% surcharge (LGT art. 55).
+# 'compensacion' records are paid back in time off and are not valued.
+
+HORAS_MES = {
+    'tiempo_completo': Decimal(240),
+    'medio_tiempo': Decimal(120),
+    'turnos': Decimal(240),
+}
+RECARGO = Decimal(2)
+CENTAVOS = Decimal('0.01')
+
+
+def horas(fecha, inicio, fin):
+    """Hours between inicio and fin on fecha; an end at or before the start runs past midnight."""
+    start = datetime.combine(fecha, inicio)
+    end = datetime.combine(fecha, fin)
+    if end <= start:
+        end += timedelta(days=1)
+    return Decimal((end - start).seconds) / 3600
+
+
+def contrato_en_fecha():
+    """Subquery: pk of the contract in force on the outer row's fecha_solicitud."""
+    return Subquery(
+        Contrato.objects.filter(empleado_id=OuterRef('empleado_id'), fecha_inicio__lte=OuterRef('fecha_solicitud'))
+        .filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=OuterRef('fecha_solicitud')))
+        .exclude(estado_contrato='anulado')
+        .order_by('-fecha_inicio', '-id')
+        .values('pk')[:1]
+    )
+
+
+COLUMNS = (
+    'id', 'fecha_solicitud', 'hora_inicio', 'hora_fin', 'contrato_id', 'empleado_id', 'empleado__ci',
+    'empleado__nombres', 'empleado__apellido_paterno', 'empleado__apellido_materno', 'empleado__departamento__nombre',
+)
+
+
+def _pagables(model, desde, hasta, empleados):
+    qs = model.objects.filter(
+        estado='aprobado', tipo_hora_extra='horas_extras', fecha_solicitud__range=(desde, hasta),
+    )
+    if empleados is not None:
+        qs = qs.filter(empleado__in=empleados)
+    return qs.annotate(contrato_id=contrato_en_fecha()).values_list(*COLUMNS)
+
+
+def detalle(desde, hasta, empleados=None, include_archived=False):
+    """
+    One dict per approved overtime record in [desde, hasta], ordered by date
+    and employee; with `include_archived`, HoraExtraArchivada rows too.
+    Records without a contract in force have contrato None and monto None.
+    """
+    qs = _pagables(HoraExtra, desde, hasta, empleados)
+    if include_archived:
+        qs = qs.union(_pagables(HoraExtraArchivada, desde, hasta, empleados), all=True)
+    rows = list(qs.order_by('fecha_solicitud', 'empleado_id', 'hora_inicio', 'id'))
+    contratos = {
+        c[0]: c for c in Contrato.objects.filter(pk__in={r[4] for r in rows if r[4]}).values_list(
+            'id', 'contrato_fiscal', 'jornada_laboral', 'salario_base',
+        )
+    }
+    fiscales = dict(CONTRATO_FISCAL_CHOICES)
+    jornadas = dict(JORNADA_LABORAL_CHOICES)
+
+    result = []
+    for he_id, fecha, inicio, fin, contrato_id, empleado_id, ci, nombres, paterno, materno, depto in rows:
+        cantidad = horas(fecha, inicio, fin)
+        row = {
+            'id': he_id,
+            'fecha': fecha,
+            'hora_inicio': inicio,
+            'hora_fin': fin,
+            'horas': cantidad.quantize(CENTAVOS, ROUND_HALF_UP),
+            'empleado': empleado_id,
+            'ci': ci,
+            'empleado_nombre': f"{nombres} {paterno} {materno or ''}".strip(),
+            'departamento': depto,
+            'contrato': contrato_id,
+            'contrato_fiscal': None,
+            'contrato_fiscal_display': None,
+            'jornada_laboral': None,
+            'jornada_laboral_display': None,
+            'salario_base': None,
+            'tarifa_hora': None,
+            'monto': None,
+        }
+        if contrato_id:
+            _, fiscal, jornada, salario = contratos[contrato_id]
+            tarifa = salario / HORAS_MES.get(jornada, HORAS_MES['tiempo_completo'])
+            row.update(
+                contrato_fiscal=fiscal,
+                contrato_fiscal_display=fiscales.get(fiscal, fiscal),
+                jornada_laboral=jornada,
+                jornada_laboral_display=jornadas.get(jornada, jornada),
+                salario_base=salario,
+                tarifa_hora=tarifa.quantize(CENTAVOS, ROUND_HALF_UP),
+                monto=(cantidad * tarifa * RECARGO).quantize(CENTAVOS, ROUND_HALF_UP),
+            )
+        result.append(row)
+    return result
+
+
+def resumen(rows):
+    """Totals per contrato_fiscal (records without contract are left out and counted apart)."""
+    totals = defaultdict(lambda: {'registros': 0, 'empleados': set(), 'horas': Decimal(0), 'monto': Decimal(0)})
+    sin_contrato = 0
+    for row in rows:
+        if row['contrato'] is None:
+            sin_contrato += 1
+            continue
+        t = totals[(row['contrato_fiscal'], row['contrato_fiscal_display'])]
+        t['registros'] += 1
+        t['empleados'].add(row['empleado'])
+        t['horas'] += row['horas']
+        t['monto'] += row['monto']
+    por_fiscal = [
+        {'contrato_fiscal': fiscal, 'contrato_fiscal_display': display, **t, 'empleados': len(t['empleados'])}
+        for (fiscal, display), t in sorted(totals.items(), key=lambda item: item[0][1])
+    ]
+    return {
+        'por_contrato_fiscal': por_fiscal,
+        'total_horas': sum((r['horas'] for r in por_fiscal), Decimal(0)),
+        'total_monto': sum((r['monto'] for r in por_fiscal), Decimal(0)),
+        'sin_contrato': sin_contrato,
+    }
@@ -0,0 +1,158 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+
+from .models import Contrato, NotificacionPendiente
+from .services import send_whatsapp_message
+
+# Vigente fixed-term contracts reaching their fecha_fin_pactada, for the
+# /api/contratos/vencimientos/ endpoint and the notify_contract_expiry
+# command. One range query on the (estado_contrato, fecha_fin_pactada)
+# index for the window from today to `dias` ahead; contracts already past
+# their date but still vigente are listed apart (vencidos), since those need
+# a decision rather than a heads-up. Other contract types have no agreed end
+# date to warn about.
+#
+# Alerts go out as one digest per HR recipient: WhatsApp when the user has an
+# employee profile with a celular, email otherwise. Recipients whose profile
+# prefers digests (preferencia_notificacion='resumen') get one line per
+# contract queued in NotificacionPendiente instead, sent with their other
+# notifications (see api.notificaciones); a contract already queued for them
+# is not queued again.
+
+HR_GROUPS = ('Admin', 'RRHH')
+TIPO = 'plazo_fijo'
+
+
+def proximos(dias=None, hoy=None):
+    """Vigente plazo fijo contracts ending from `hoy` to `dias` days later, soonest first."""
+    dias = settings.CONTRATOS_AVISO_DIAS if dias is None else dias
+    hoy = hoy or date.today()
+    return _rows(_vigentes().filter(fecha_fin_pactada__range=(hoy, hoy + timedelta(days=dias))), hoy)
+
+
+def vencidos(hoy=None):
+    """Vigente plazo fijo contracts whose fecha_fin_pactada has passed, oldest first."""
+    hoy = hoy or date.today()
+    return _rows(_vigentes().filter(fecha_fin_pactada__lt=hoy), hoy)
+
+
+def _vigentes():
+    return Contrato.objects.filter(estado_contrato='vigente', tipo_contrato=TIPO)
+
+
+def _rows(queryset, hoy):
+    rows = list(
+        queryset.order_by('fecha_fin_pactada', 'id')
+        .values(
+            'id', 'empleado_id', 'empleado__nombres', 'empleado__apellido_paterno', 'empleado__apellido_materno',
+            'empleado__departamento__nombre', 'tipo_contrato', 'fecha_inicio', 'fecha_fin_pactada',
+        )
+    )
+    tipos = dict(Contrato._meta.get_field('tipo_contrato').flatchoices)
+    return [
+        {
+            'id': r['id'],
+            'empleado': r['empleado_id'],
+            'empleado_nombre': ' '.join(filter(None, (
+                r['empleado__nombres'], r['empleado__apellido_paterno'], r['empleado__apellido_materno'],
+            ))),
+            'departamento': r['empleado__departamento__nombre'],
+            'tipo_contrato': r['tipo_contrato'],
+            'tipo_contrato_display': tipos.get(r['tipo_contrato'], r['tipo_contrato']),
+            'fecha_inicio': r['fecha_inicio'],
+            'fecha_fin_pactada': r['fecha_fin_pactada'],
+            'dias_restantes': (r['fecha_fin_pactada'] - hoy).days,
+        }
+        for r in rows
+    ]
+
+
+def hr_recipients():
+    """Active Admin/RRHH users (and superusers) as (user, empleado or None, celular or None)."""
+    users = (
+        User.objects.filter(is_active=True)
+        .filter(Q(is_superuser=True) | Q(groups__name__in=HR_GROUPS))
+        .select_related('empleado')
+        .distinct()
+        .order_by('id')
+    )
+    result = []
+    for user in users:
+        empleado = getattr(user, 'empleado', None)
+        result.append((user, empleado, empleado.celular if empleado and empleado.celular else None))
+    return result
+
+
+def line_text(r):
+    if r['dias_restantes'] < 0:
+        cuando = f"venció hace {-r['dias_restantes']} días"
+    elif r['dias_restantes'] == 0:
+        cuando = "vence hoy"
+    else:
+        cuando = f"vence en {r['dias_restantes']} días"
+    depto = f" ({r['departamento']})" if r['departamento'] else ""
+    return f"{r['empleado_nombre']}{depto}: {r['tipo_contrato_display']}, {r['fecha_fin_pactada']} — {cuando}"
+
+
+def digest_text(rows, dias, atrasados=()):
+    lines = []
+    if atrasados:
+        lines += ["*Contratos vencidos sin renovar ni finalizar* ⚠️", ""]
+        lines += [f"- {line_text(r)}" for r in atrasados]
+        lines.append("")
+    if rows:
+        lines += [f"*Contratos por vencer (próximos {dias} días)* 📄", ""]
+        lines += [f"- {line_text(r)}" for r in rows]
+        lines.append("")
+    lines.append("_Ingrese al sistema para renovar o finalizar los contratos._")
+    return "\n".join(lines)
+
+
+def queue_lines(destinatario, rows):
+    """Queues a digest line per contract of `rows` not already pending for `destinatario`; returns how many."""
+    queued = set(
+        NotificacionPendiente.objects.filter(destinatario=destinatario, modelo=Contrato._meta.label_lower)
+        .values_list('objeto_id', flat=True)
+    )
+    nuevas = [
+        NotificacionPendiente(
+            destinatario=destinatario, modelo=Contrato._meta.label_lower, objeto_id=r['id'],
+            texto=f"Contrato por vencer: {line_text(r)}"[:500],
+        )
+        for r in rows if r['id'] not in queued
+    ]
+    NotificacionPendiente.objects.bulk_create(nuevas)
+    return len(nuevas)
+
+
+def send_digests(rows, dias, atrasados=(), dry_run=False):
+    """
+    One digest with every row per HR recipient, or its lines queued for those
+    who prefer digests. Emails share a single SMTP connection. Returns
+    (whatsapp, email, encolados, sin_contacto) counts; encolados counts the
+    recipients that got new lines queued.
+    """
+    text = digest_text(rows, dias, atrasados)
+    whatsapp, emails, encolados, sin_contacto = 0, [], 0, 0
+    for user, empleado, celular in hr_recipients():
+        if celular and empleado.preferencia_notificacion == 'resumen':
+            if dry_run or queue_lines(empleado, [*atrasados, *rows]):
+                encolados += 1
+        elif celular:
+            if not dry_run:
+                send_whatsapp_message(celular, text)
+            whatsapp += 1
+        elif user.email:
+            emails.append(EmailMessage(
+                subject=f'Contratos por vencer: {len(rows) + len(atrasados)}', body=text.replace('*', '').replace('_', ''),
+                to=[user.email],
+            ))
+        else:
+            sin_contacto += 1
+    if emails and not dry_run:
+        get_connection().send_messages(emails)
+    return whatsapp, len(emails), encolados, sin_contacto
@@ -6,35 +6,96 @@ from rest_framework.response import Response
 from django.contrib.auth.models import User, Group
 from django.db import transaction, models
 from django.db import transaction, models
+from django.db.models import Prefetch
 from django.utils import timezone
 from django.conf import settings
-from .services import send_whatsapp_message
+from datetime import date, datetime, time, timedelta
+from itertools import chain
 import json
 
 from .models import (
     Empleado, Departamento, Cargo, Familiar, Estudio, Contrato, Permiso, HoraExtra,
-    SolicitudVacacion, VacacionGuardada
+    SolicitudVacacion, VacacionGuardada, AuditEntry, PermisoArchivado, HoraExtraArchivada
 )
 from .serializers import (
     EmpleadoSerializer, DepartamentoSerializer, CargoSerializer,
     FamiliarSerializer, EstudioSerializer, ContratoSerializer, UserSerializer, UserCreateSerializer,
     JefeSerializer, PermisoSerializer, HoraExtraSerializer,
-    SolicitudVacacionSerializer, VacacionGuardadaSerializer
+    SolicitudVacacionSerializer, VacacionGuardadaSerializer, AuditEntrySerializer
 )
 from .permissions import IsAdminUser, IsStaffUser, IsStaffReadOnly
-from .pagination import OptionalPagination
+from .pagination import OptionalPagination, keyset_chunks
+from .filters import TrigramSearchFilter
+from .mixins import (
+    ArchiveMixin, CachedListMixin, ConditionalGetMixin, DeltaSyncMixin, FastListMixin, StreamingListMixin,
+    TimedSerializationMixin,
+)
+from .signals import AUDITED_MODELS, CATALOG_MODELS
+from . import cache as catalog_cache
+from . import metrics
+from . import exports
+from . import conflicts
+from . import ausencias
+from . import proyeccion
+from . import vencimientos
+from . import valoracion
+from . import horas_permiso
+from . import audit
+from . import notificaciones
+from django.http import HttpResponse
 from django.contrib.auth.forms import PasswordResetForm
 
 # ... (omitted code) ...
 
-class EmpleadoViewSet(viewsets.ModelViewSet):
-    queryset = Empleado.objects.all().order_by('nombres', 'apellido_paterno', 'apellido_materno')
+def _export_format(request):
+    """?formato= of the export actions (xlsx by default); None if unsupported."""
+    formato = request.query_params.get('formato', 'xlsx').lower()
+    return formato if formato in exports.FORMATS else None
+
+FORMATO_ERROR = {'error': f'Formato no soportado. Usa: {", ".join(exports.FORMATS)}.'}
+
+def _scope_tombstones(request, tombstones, all_rows_groups, departamentos=False, por_empleado=False):
+    """
+    Deletions (RegistroEliminado) the user could have seen, by the same rules
+    as the view's get_queryset: all for `all_rows_groups` (with `por_empleado`,
+    narrowed by ?empleado= like the list), otherwise their own rows, those
+    they approve and, with `departamentos`, those of the departments they lead.
+    """
+    user = request.user
+    if user.is_superuser or user.groups.filter(name__in=all_rows_groups).exists():
+        empleado_id = request.query_params.get('empleado') if por_empleado else None
+        return tombstones.filter(empleado_id=empleado_id) if empleado_id else tombstones
+    if not hasattr(user, 'empleado'): return tombstones.none()
+    empleado = user.empleado
+    q_filter = models.Q(empleado_id=empleado.pk) | models.Q(aprobador_id=empleado.pk)
+    if departamentos:
+        q_filter |= models.Q(empleado_id__in=Empleado.objects.filter(departamento__jefe_departamento=empleado).values('pk'))
+    return tombstones.filter(q_filter)
+
+def _check_conflicts(candidate):
+    """Rejects a new vacación / permiso / hora extra overlapping the employee's live ones."""
+    found = conflicts.find_conflicts(candidate)
+    if found:
+        raise serializers.ValidationError({'conflictos': [conflicts.describe(c) for c in found]})
+
+class EmpleadoViewSet(StreamingListMixin, ConditionalGetMixin, DeltaSyncMixin, FastListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
+    queryset = (
+        Empleado.objects.select_related('cargo', 'departamento', 'jefe')
+        .prefetch_related(
+            # Explicit order so the nested lists match the fast path (api.fast)
+            Prefetch('familiares', queryset=Familiar.objects.order_by('id')),
+            Prefetch('estudios', queryset=Estudio.objects.order_by('id')),
+            Prefetch('contratos', queryset=Contrato.objects.order_by('id')),
+        )
+        .order_by('nombres', 'apellido_paterno', 'apellido_materno')
+    )
     serializer_class = EmpleadoSerializer
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsStaffReadOnly]
     pagination_class = OptionalPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['nombres', 'apellido_paterno', 'apellido_materno', 'ci']
+    filter_backends = [TrigramSearchFilter]
+    search_index_field = 'pk'
+    etag_models = (Cargo, Departamento, Empleado)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -73,6 +134,8 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=data, partial=True)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        # Nested collections were prefetched; drop them so the response is fresh
+        instance._prefetched_objects_cache = {}
         return Response(serializer.data)
 
         # Refrescamos y devolvemos la data actualizada
@@ -80,6 +143,27 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    export_columns = [
+        ('CI', 'ci'), ('Nombres', 'nombres'), ('Apellido Paterno', 'apellido_paterno'),
+        ('Apellido Materno', 'apellido_materno'), ('Sexo', 'sexo'), ('Estado Civil', 'estado_civil'),
+        ('Fecha Nacimiento', 'fecha_nacimiento'), ('Celular', 'celular'), ('Email', 'email'),
+        ('Departamento', 'departamento__nombre'), ('Cargo', 'cargo__nombre'),
+        ('Jefe Nombres', 'jefe__nombres'), ('Jefe Apellido', 'jefe__apellido_paterno'),
+        ('Fecha Ingreso Inicial', 'fecha_ingreso_inicial'), ('Fecha Ingreso Vigente', 'fecha_ingreso_vigente'),
+        ('Estado', 'estado'),
+    ]
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Planilla de empleados (?formato=xlsx|csv, ?search=, ?estado=)."""
+        formato = _export_format(request)
+        if formato is None: return Response(FORMATO_ERROR, status=400)
+        qs = self.filter_queryset(self.get_queryset())
+        estado = request.query_params.get('estado')
+        if estado: qs = qs.filter(estado=estado)
+        filename = f'empleados_{timezone.localdate():%Y%m%d}'
+        return exports.export_queryset(formato, filename, qs, self.export_columns, title='Empleados')
+
 from .permissions import IsAdminUser, IsStaffUser, IsStaffReadOnly
 from .pagination import OptionalPagination
 from django.contrib.auth.forms import PasswordResetForm
@@ -97,16 +181,17 @@ class PasswordResetRequestView(generics.GenericAPIView):
         if form.is_valid():
             # opts dict can configure domain_override, subject_template_name, etc.
             # For now, default is fine.
-            form.save(
-                request=request, 
-                use_https=request.is_secure(),
-                email_template_name='registration/password_reset_email.html', # Django defaults, but ensuring
-            )
+            with metrics.track('ext'): # SMTP
+                form.save(
+                    request=request, 
+                    use_https=request.is_secure(),
+                    email_template_name='registration/password_reset_email.html', # Django defaults, but ensuring
+                )
             return Response({'message': 'Si el correo existe, se ha enviado un enlace de recuperación.'}, status=status.HTTP_200_OK)
         
         return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(StreamingListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('username')
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
@@ -158,62 +243,129 @@ class UserCreate(generics.CreateAPIView):
     serializer_class = UserCreateSerializer
     permission_classes = [IsAdminUser]
 
-class JefesDepartamentoListView(generics.ListAPIView):
+class JefesDepartamentoListView(StreamingListMixin, ConditionalGetMixin, CachedListMixin, TimedSerializationMixin, generics.ListAPIView):
     queryset = Empleado.objects.filter(departamentos_liderados__isnull=False).distinct().order_by('nombres', 'apellido_paterno', 'apellido_materno')
     serializer_class = JefeSerializer
     permission_classes = [IsStaffUser]
     pagination_class = None
+    cache_models = (Empleado, Departamento)
 
-class DepartamentoViewSet(viewsets.ModelViewSet):
-    queryset = Departamento.objects.all().order_by('nombre')
+class DepartamentoViewSet(StreamingListMixin, ConditionalGetMixin, CachedListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
+    queryset = Departamento.objects.select_related('jefe_departamento').order_by('nombre')
     serializer_class = DepartamentoSerializer
     permission_classes = [IsStaffReadOnly]
     pagination_class = OptionalPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ['nombre']
+    cache_models = (Departamento, Empleado)
 
-class CargoViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='ausencias')
+    def mapa_ausencias(self, request):
+        """Ausentes por día y departamento entre ?desde= y ?hasta= (YYYY-MM-DD); ?departamento= filtra (repetible)."""
+        try:
+            desde, hasta = _period(request)
+            ids = [int(d) for d in request.query_params.getlist('departamento')] or None
+        except ValueError:
+            return Response({'error': 'Parámetros inválidos. Usa fechas YYYY-MM-DD e ids numéricos.'}, status=400)
+        if not desde or not hasta or hasta < desde:
+            return Response({'error': 'Indica un rango válido con desde y hasta.'}, status=400)
+        if (hasta - desde).days + 1 > ausencias.MAX_DIAS:
+            return Response({'error': f'El rango no puede superar {ausencias.MAX_DIAS} días.'}, status=400)
+        return Response(ausencias.heatmap(desde, hasta, ids))
+
+class CargoViewSet(StreamingListMixin, ConditionalGetMixin, CachedListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = Cargo.objects.all().order_by('nombre')
     serializer_class = CargoSerializer
     permission_classes = [IsStaffReadOnly]
     pagination_class = OptionalPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ['nombre']
+    cache_models = (Cargo,)
+
+class CatalogCacheStatsView(generics.GenericAPIView):
+    permission_classes = [IsAdminUser]
+    serializer_class = serializers.Serializer # Dummy serializer to avoid error
+
+    def get(self, request):
+        return Response(catalog_cache.get_stats(CATALOG_MODELS))
 
-class FamiliarViewSet(viewsets.ModelViewSet):
+class MetricsView(generics.GenericAPIView):
+    """Request latency histograms and cache counters in Prometheus text format."""
+    permission_classes = [IsAdminUser]
+    serializer_class = serializers.Serializer # Dummy serializer to avoid error
+
+    def get(self, request):
+        stats = catalog_cache.get_stats(CATALOG_MODELS)
+        extra = [
+            '# TYPE rrhh_catalog_cache_hits_total counter',
+            f'rrhh_catalog_cache_hits_total {stats["hits"]}',
+            '# TYPE rrhh_catalog_cache_misses_total counter',
+            f'rrhh_catalog_cache_misses_total {stats["misses"]}',
+            '# TYPE rrhh_catalog_cache_invalidations_total counter',
+        ] + [
+            f'rrhh_catalog_cache_invalidations_total{{model="{label}"}} {count}'
+            for label, count in stats['invalidations'].items()
+        ]
+        return HttpResponse(metrics.render_prometheus(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class FamiliarViewSet(StreamingListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = Familiar.objects.all()
     serializer_class = FamiliarSerializer
     permission_classes = [IsAdminUser]
 
-class EstudioViewSet(viewsets.ModelViewSet):
+class EstudioViewSet(StreamingListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = Estudio.objects.all()
     serializer_class = EstudioSerializer
     permission_classes = [IsAdminUser]
 
-class ContratoViewSet(viewsets.ModelViewSet):
+class ContratoViewSet(StreamingListMixin, ConditionalGetMixin, DeltaSyncMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = Contrato.objects.all()
     serializer_class = ContratoSerializer
     permission_classes = [IsAdminUser]
 
-class PermisoViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def vencimientos(self, request):
+        """Contratos a plazo fijo vigentes cuya fecha_fin_pactada cae entre hoy y los próximos ?dias=; los ya vencidos van aparte."""
+        try:
+            dias = int(request.query_params.get('dias', settings.CONTRATOS_AVISO_DIAS))
+        except ValueError:
+            return Response({'error': 'El parámetro dias debe ser un número entero.'}, status=400)
+        if dias < 0:
+            return Response({'error': 'El parámetro dias no puede ser negativo.'}, status=400)
+        contratos = vencimientos.proximos(dias)
+        return Response({'dias': dias, 'total': len(contratos), 'contratos': contratos, 'vencidos': vencimientos.vencidos()})
+
+class PermisoViewSet(StreamingListMixin, ConditionalGetMixin, DeltaSyncMixin, ArchiveMixin, FastListMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = Permiso.objects.all()
     serializer_class = PermisoSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    related = ('empleado__departamento', 'aprobador_asignado')
+    etag_models = (Empleado, Departamento)
+    archive_model = PermisoArchivado
+    # Groups that see every permiso
+    all_rows_groups = ['Admin', 'RRHH', 'Porteria']
 
     def get_queryset(self):
+        return self.scoped(Permiso)
+
+    def scoped(self, model):
+        # Same visibility rules for the hot table and the archive
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name__in=['Admin', 'RRHH', 'Porteria']).exists():
-            qs = Permiso.objects.all().order_by('-fecha_solicitud')
+        if user.is_superuser or user.groups.filter(name__in=self.all_rows_groups).exists():
+            qs = model.objects.select_related(*self.related).order_by('-fecha_solicitud', '-id')
             empleado_id = self.request.query_params.get('empleado')
             if empleado_id: qs = qs.filter(empleado_id=empleado_id)
             return qs
-        if not hasattr(user, 'empleado'): return Permiso.objects.none()
+        if not hasattr(user, 'empleado'): return model.objects.none()
         empleado = user.empleado
         q_filter = models.Q(empleado=empleado) | models.Q(aprobador_asignado=empleado)
         deptos_liderados = empleado.departamentos_liderados.all()
         if deptos_liderados.exists(): q_filter |= models.Q(empleado__departamento__in=deptos_liderados)
-        return Permiso.objects.filter(q_filter).distinct().order_by('-fecha_solicitud')
+        return model.objects.select_related(*self.related).filter(q_filter).distinct().order_by('-fecha_solicitud', '-id')
+
+    def scope_deleted(self, tombstones):
+        return _scope_tombstones(self.request, tombstones, self.all_rows_groups, departamentos=True, por_empleado=True)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -225,8 +377,20 @@ class PermisoViewSet(viewsets.ModelViewSet):
             if not hasattr(user, 'empleado'): raise PermissionDenied("No tienes un perfil de empleado.")
             empleado = user.empleado
         
+        data = serializer.validated_data
+        _check_conflicts(conflicts.permiso(
+            None, empleado.id, data['fecha_solicitud'], data['hora_salida'], data['hora_regreso'],
+        ))
         aprobador = empleado.jefe
-        permiso = serializer.save(empleado=empleado, aprobador_asignado=aprobador)
+        with transaction.atomic():
+            try:
+                horas_permiso.reservar(
+                    empleado.id, data['fecha_solicitud'], data['tipo_permiso'],
+                    horas_permiso.minutos(data['fecha_solicitud'], data['hora_salida'], data['hora_regreso']),
+                )
+            except horas_permiso.TopeExcedido as e:
+                raise serializers.ValidationError({'tipo_permiso': [str(e)]})
+            permiso = serializer.save(empleado=empleado, aprobador_asignado=aprobador)
 
         # --- Enviar Notificación al Jefe de Departamento vía WhatsApp ---
         print(f"DEBUG_NOTIF: Iniciando proceso de notificación para {empleado}")
@@ -255,50 +419,160 @@ Motivo: {permiso.observacion or 'Sin observaciones'}
 
 _Por favor, ingrese al sistema para aprobar o rechazar._"""
                     
-                    send_whatsapp_message(jefe_depto.celular, message)
-                    
+                    linea = (
+                        f"{empleado} ({empleado.departamento.nombre}): {permiso.get_tipo_permiso_display()}, "
+                        f"{permiso.fecha_solicitud:%d/%m} {permiso.hora_salida:%H:%M}-{permiso.hora_regreso:%H:%M}"
+                    )
+                    # Immediate message or a line in the jefe's digest, by their preference
+                    notificaciones.notificar(jefe_depto, message, linea, permiso)
+
         except Exception as e:
             # No detener el flujo si falla la notificación
             print(f"DEBUG_NOTIF: Error CRITICO en notificación WhatsApp: {e}")
 
+    # Every change of a permiso moves its hours in the monthly counters
+    # (api.horas_permiso) in the same transaction, reading the permiso as it
+    # was under a row lock so concurrent changes cannot count it twice
+
+    def _locked(self, permiso):
+        return Permiso.objects.select_for_update().get(pk=permiso.pk)
+
+    def _cambiar_horas(self, antes, permiso):
+        try:
+            horas_permiso.cambiar(antes, horas_permiso.entrada(permiso))
+        except horas_permiso.TopeExcedido as e:
+            raise serializers.ValidationError({'tipo_permiso': [str(e)]})
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.instance = self._locked(serializer.instance)
+            antes = horas_permiso.entrada(serializer.instance)
+            permiso = serializer.save()
+            self._cambiar_horas(antes, permiso)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance = self._locked(instance)
+            horas_permiso.mover(horas_permiso.entrada(instance), None)
+            instance.delete()
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         solicitud = self.get_object()
-        solicitud.estado = 'aprobado'
-        solicitud.fecha_aprobacion = timezone.now()
-        solicitud.comentario_aprobador = request.data.get('comentario', 'Aprobado')
-        solicitud.save()
+        with transaction.atomic():
+            solicitud = self._locked(solicitud)
+            antes = horas_permiso.entrada(solicitud)
+            solicitud.estado = 'aprobado'
+            solicitud.fecha_aprobacion = timezone.now()
+            solicitud.comentario_aprobador = request.data.get('comentario', 'Aprobado')
+            solicitud.save()
+            self._cambiar_horas(antes, solicitud)
         return Response(self.get_serializer(solicitud).data)
 
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
         solicitud = self.get_object()
-        solicitud.estado = 'rechazado'
-        solicitud.fecha_aprobacion = timezone.now()
-        solicitud.comentario_aprobador = request.data.get('comentario', 'Rechazado')
-        solicitud.save()
+        with transaction.atomic():
+            solicitud = self._locked(solicitud)
+            antes = horas_permiso.entrada(solicitud)
+            solicitud.estado = 'rechazado'
+            solicitud.fecha_aprobacion = timezone.now()
+            solicitud.comentario_aprobador = request.data.get('comentario', 'Rechazado')
+            solicitud.save()
+            horas_permiso.mover(antes, horas_permiso.entrada(solicitud))
         return Response(self.get_serializer(solicitud).data)
 
+    export_columns = [
+        ('Fecha Solicitud', 'fecha_solicitud'), ('CI', 'empleado__ci'), ('Nombres', 'empleado__nombres'),
+        ('Apellido Paterno', 'empleado__apellido_paterno'), ('Apellido Materno', 'empleado__apellido_materno'),
+        ('Departamento', 'empleado__departamento__nombre'), ('Tipo', 'tipo_permiso'),
+        ('Hora Salida', 'hora_salida'), ('Hora Regreso', 'hora_regreso'), ('Estado', 'estado'),
+        ('Aprobador Nombres', 'aprobador_asignado__nombres'), ('Aprobador Apellido', 'aprobador_asignado__apellido_paterno'),
+        ('Fecha Aprobación', 'fecha_aprobacion'), ('Observación', 'observacion'), ('Comentario Aprobador', 'comentario_aprobador'),
+    ]
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Permisos del periodo ?desde=&hasta= (YYYY-MM-DD, por fecha de solicitud) que el usuario puede ver; ?include_archived=true suma los archivados."""
+        formato = _export_format(request)
+        if formato is None: return Response(FORMATO_ERROR, status=400)
+        try:
+            desde, hasta = _period(request)
+        except ValueError:
+            return Response({'error': 'Fechas inválidas. Usa el formato YYYY-MM-DD.'}, status=400)
+        estado = request.query_params.get('estado')
+
+        def filtrar(qs):
+            if desde: qs = qs.filter(fecha_solicitud__gte=desde)
+            if hasta: qs = qs.filter(fecha_solicitud__lte=hasta)
+            if estado: qs = qs.filter(estado=estado)
+            return qs
+
+        qs = filtrar(self.get_queryset())
+        if self.include_archived():
+            qs = self.with_archived(qs, filtrar(self.scoped(PermisoArchivado)))
+        filename = f'permisos_{desde or "inicio"}_{hasta or timezone.localdate()}'
+        return exports.export_queryset(formato, filename, qs.order_by('fecha_solicitud', 'id'), self.export_columns, title='Permisos')
+
+def _period(request):
+    """(desde, hasta) dates from the query string; None when not given."""
+    desde = request.query_params.get('desde')
+    hasta = request.query_params.get('hasta')
+    return (date.fromisoformat(desde) if desde else None, date.fromisoformat(hasta) if hasta else None)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_current_user(request):
     serializer = UserSerializer(request.user)
     return Response(serializer.data)
 
-class HoraExtraViewSet(viewsets.ModelViewSet):
+@api_view(['GET', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def mis_notificaciones(request):
+    """
+    Preferencia de avisos por WhatsApp del empleado del usuario: 'inmediata' (un mensaje por
+    solicitud) o 'resumen' (uno cada NOTIFICACIONES_RESUMEN_MINUTOS). PATCH con
+    {"preferencia_notificacion": ...} la cambia.
+    """
+    empleado = getattr(request.user, 'empleado', None)
+    if empleado is None:
+        return Response({'error': 'No tienes un perfil de empleado.'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'PATCH':
+        preferencia = request.data.get('preferencia_notificacion')
+        if preferencia not in dict(Empleado.PREFERENCIA_NOTIFICACION_CHOICES):
+            return Response({'error': "preferencia_notificacion debe ser 'inmediata' o 'resumen'."}, status=status.HTTP_400_BAD_REQUEST)
+        empleado.preferencia_notificacion = preferencia
+        empleado.save(update_fields=['preferencia_notificacion', 'updated_at'])
+    return Response({
+        'preferencia_notificacion': empleado.preferencia_notificacion,
+        'resumen_minutos': settings.NOTIFICACIONES_RESUMEN_MINUTOS,
+        'pendientes': empleado.notificaciones_pendientes.count(),
+    })
+
+class HoraExtraViewSet(StreamingListMixin, ConditionalGetMixin, DeltaSyncMixin, ArchiveMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = HoraExtra.objects.all()
     serializer_class = HoraExtraSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    related = ('empleado__departamento', 'aprobador_asignado')
+    etag_models = (Empleado, Departamento)
+    archive_model = HoraExtraArchivada
+    all_rows_groups = ['Admin', 'RRHH']
 
     def get_queryset(self):
+        return self.scoped(HoraExtra)
+
+    def scoped(self, model):
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name__in=['Admin', 'RRHH']).exists():
-            return HoraExtra.objects.all().order_by('-fecha_solicitud')
-        if not hasattr(user, 'empleado'): return HoraExtra.objects.none()
+        if user.is_superuser or user.groups.filter(name__in=self.all_rows_groups).exists():
+            return model.objects.select_related(*self.related).order_by('-fecha_solicitud', '-id')
+        if not hasattr(user, 'empleado'): return model.objects.none()
         empleado = user.empleado
         q_filter = models.Q(empleado=empleado) | models.Q(aprobador_asignado=empleado)
-        return HoraExtra.objects.filter(q_filter).distinct().order_by('-fecha_solicitud')
+        return model.objects.select_related(*self.related).filter(q_filter).distinct().order_by('-fecha_solicitud', '-id')
+
+    def scope_deleted(self, tombstones):
+        return _scope_tombstones(self.request, tombstones, self.all_rows_groups)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -309,6 +583,10 @@ class HoraExtraViewSet(viewsets.ModelViewSet):
         else:
             if not hasattr(user, 'empleado'): raise PermissionDenied("No tienes un perfil de empleado.")
             empleado = user.empleado
+        data = serializer.validated_data
+        _check_conflicts(conflicts.hora_extra(
+            None, empleado.id, data['fecha_solicitud'], data['hora_inicio'], data['hora_fin'],
+        ))
         aprobador = empleado.jefe
         serializer.save(empleado=empleado, aprobador_asignado=aprobador)
 
@@ -330,14 +608,50 @@ class HoraExtraViewSet(viewsets.ModelViewSet):
         solicitud.save()
         return Response(self.get_serializer(solicitud).data)
 
+    valoracion_columns = [
+        ('Fecha', 'fecha'), ('CI', 'ci'), ('Empleado', 'empleado_nombre'), ('Departamento', 'departamento'),
+        ('Empresa', 'contrato_fiscal_display'), ('Jornada', 'jornada_laboral_display'), ('Desde', 'hora_inicio'),
+        ('Hasta', 'hora_fin'), ('Horas', 'horas'), ('Salario Base', 'salario_base'), ('Tarifa Hora', 'tarifa_hora'),
+        ('Monto', 'monto'),
+    ]
+
+    @action(detail=False, methods=['get'])
+    def valoracion(self, request):
+        """
+        Monto a pagar por las horas extras aprobadas entre ?desde= y ?hasta= según el contrato vigente
+        de cada día, con resumen por contrato fiscal. ?contrato_fiscal= filtra, ?include_archived=true
+        suma las archivadas y ?formato=xlsx|csv descarga el detalle.
+        """
+        if not (request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'RRHH']).exists()):
+            return Response({'error': 'No tienes permiso.'}, status=403)
+        try:
+            desde, hasta = _period(request)
+        except ValueError:
+            return Response({'error': 'Fechas inválidas. Usa el formato YYYY-MM-DD.'}, status=400)
+        if not desde or not hasta or hasta < desde:
+            return Response({'error': 'Indica un rango válido con desde y hasta.'}, status=400)
+
+        rows = valoracion.detalle(desde, hasta, include_archived=self.include_archived())
+        fiscal = request.query_params.get('contrato_fiscal')
+        if fiscal: rows = [r for r in rows if r['contrato_fiscal'] == fiscal]
+
+        if 'formato' in request.query_params:
+            formato = _export_format(request)
+            if formato is None: return Response(FORMATO_ERROR, status=400)
+            header = [h for h, _ in self.valoracion_columns]
+            data = ([r[key] for _, key in self.valoracion_columns] for r in rows)
+            return exports.export_response(formato, f'horas_extras_{desde}_{hasta}', header, data, title='Horas Extras')
+        return Response({'desde': desde, 'hasta': hasta, **valoracion.resumen(rows), 'detalle': rows})
+
 # --- Vacaciones ViewSets ---
 
-class VacacionGuardadaViewSet(viewsets.ModelViewSet):
-    queryset = VacacionGuardada.objects.all().order_by('-fecha_creacion')
+class VacacionGuardadaViewSet(StreamingListMixin, ConditionalGetMixin, DeltaSyncMixin, TimedSerializationMixin, viewsets.ModelViewSet):
+    queryset = VacacionGuardada.objects.select_related('empleado__departamento', 'contrato').order_by('-fecha_creacion')
     serializer_class = VacacionGuardadaSerializer
     permission_classes = [IsStaffUser]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['empleado__nombres', 'empleado__apellido_paterno']
+    filter_backends = [TrigramSearchFilter]
+    search_index_field = 'empleado_id'
+    etag_models = (Empleado, Departamento, Contrato)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -345,16 +659,19 @@ class VacacionGuardadaViewSet(viewsets.ModelViewSet):
         if empleado_id: qs = qs.filter(empleado_id=empleado_id)
         return qs
 
-class SolicitudVacacionViewSet(viewsets.ModelViewSet):
+class SolicitudVacacionViewSet(StreamingListMixin, ConditionalGetMixin, DeltaSyncMixin, TimedSerializationMixin, viewsets.ModelViewSet):
     queryset = SolicitudVacacion.objects.all()
     serializer_class = SolicitudVacacionSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    related = ('empleado__departamento', 'aprobador', 'contrato')
+    etag_models = (Empleado, Departamento, Contrato)
+    all_rows_groups = ['Admin', 'RRHH']
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name__in=['Admin', 'RRHH']).exists():
-            qs = SolicitudVacacion.objects.all().order_by('-fecha_solicitud')
+        if user.is_superuser or user.groups.filter(name__in=self.all_rows_groups).exists():
+            qs = SolicitudVacacion.objects.select_related(*self.related).order_by('-fecha_solicitud', '-id')
             empleado_id = self.request.query_params.get('empleado')
             if empleado_id: qs = qs.filter(empleado_id=empleado_id)
             return qs
@@ -363,7 +680,10 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
         q_filter = models.Q(empleado=empleado) | models.Q(aprobador=empleado)
         deptos_liderados = empleado.departamentos_liderados.all()
         if deptos_liderados.exists(): q_filter |= models.Q(empleado__departamento__in=deptos_liderados)
-        return SolicitudVacacion.objects.filter(q_filter).distinct().order_by('-fecha_solicitud')
+        return SolicitudVacacion.objects.select_related(*self.related).filter(q_filter).distinct().order_by('-fecha_solicitud', '-id')
+
+    def scope_deleted(self, tombstones):
+        return _scope_tombstones(self.request, tombstones, self.all_rows_groups, departamentos=True, por_empleado=True)
 
     @action(detail=False, methods=['get'])
     def saldo(self, request):
@@ -378,7 +698,8 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
             if not hasattr(user, 'empleado'): return Response({'saldo': 0.0})
             empleado = user.empleado
 
-    def _calculate_saldo_data(self, empleado):
+    def _calculate_saldo_data(self, empleado, ganados=None, consumidos=None):
+        # ganados / consumidos: the rows below, already loaded (see _saldos_bulk)
         # --- FILTERS BY VIGENTE ---
         filters_g = {'empleado': empleado}
         filters_s = {'empleado': empleado, 'estado': 'aprobado'}
@@ -387,8 +708,8 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
              filters_g['fecha__gte'] = start_date
              filters_s['fecha_inicio__gte'] = start_date
  
-        ganados_objs = VacacionGuardada.objects.filter(**filters_g).order_by('fecha', 'id')
-        consumidos_objs = SolicitudVacacion.objects.filter(**filters_s).order_by('fecha_inicio', 'id')
+        ganados_objs = ganados if ganados is not None else VacacionGuardada.objects.filter(**filters_g).order_by('fecha', 'id')
+        consumidos_objs = consumidos if consumidos is not None else SolicitudVacacion.objects.filter(**filters_s).order_by('fecha_inicio', 'id')
         
         # Antiquity and Law (Cumulative)
         anios, meses, dias = 0, 0, 0
@@ -434,7 +755,7 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
                 'tipo': 'Guardadas/Abono',
                 'incidencia': g.gestion or 'Carga Manual',
                 'dias': d_val,
-                'contrato': f"{g.contrato.id if g.contrato else 'S/C'} - {empleado.id}",
+                'contrato': f"{g.contrato_id or 'S/C'} - {empleado.id}",
                 'sort_order': 2 # Priority 2: Deposit/Transfer In (Evening) - applied AFTER consumption
             }
             entries.append(entry)
@@ -456,7 +777,7 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
                 'tipo': 'Consumo',
                 'incidencia': s.observacion or 'Vacaciones tomadas',
                 'dias': -float(s.dias_calculados),
-                'contrato': f"{s.contrato.id if s.contrato else 'S/C'} - {empleado.id}",
+                'contrato': f"{s.contrato_id or 'S/C'} - {empleado.id}",
                 'sort_order': 1 # Priority 1: Consumption (Noon) - applied BEFORE new manual deposits on same day
             })
 
@@ -575,6 +896,86 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
                 if 'entry_ref' in q: del q['entry_ref']
         return Response(data)
 
+    proyeccion_columns = [
+        ('Empleado', 'empleado_nombre'), ('Departamento', 'departamento'), ('Fecha Ingreso Vigente', 'fecha_ingreso_vigente'),
+        ('Antigüedad (años)', 'antiguedad_anios'), ('Saldo Actual', 'saldo_actual'), ('Consumos Futuros', 'consumos_futuros'),
+        ('Ley por Devengar', 'ley_por_devengar'), ('Saldo Proyectado', 'saldo_proyectado'),
+    ]
+
+    @action(detail=False, methods=['get'])
+    def proyeccion(self, request):
+        """
+        Saldo proyectado de todos los empleados a ?fecha= (por defecto el 31/12 del año en curso)
+        si no toman nada más. ?departamento= filtra, ?incluir_inactivos=true incluye a los inactivos
+        y ?formato=xlsx|csv descarga el resultado.
+        """
+        if not (request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'RRHH']).exists()):
+            return Response({'error': 'No tienes permiso.'}, status=403)
+        hoy = date.today()
+        try:
+            fecha = date.fromisoformat(request.query_params['fecha']) if request.query_params.get('fecha') else date(hoy.year, 12, 31)
+        except ValueError:
+            return Response({'error': 'Fecha inválida. Usa el formato YYYY-MM-DD.'}, status=400)
+        if fecha < hoy:
+            return Response({'error': 'La fecha de proyección no puede ser anterior a hoy.'}, status=400)
+
+        empleados = Empleado.objects.all()
+        if request.query_params.get('incluir_inactivos') != 'true':
+            empleados = empleados.filter(estado='activo')
+        departamento = request.query_params.get('departamento')
+        if departamento: empleados = empleados.filter(departamento_id=departamento)
+        rows = proyeccion.project(fecha, empleados, hoy=hoy)
+
+        if 'formato' in request.query_params:
+            formato = _export_format(request)
+            if formato is None: return Response(FORMATO_ERROR, status=400)
+            header = [h for h, _ in self.proyeccion_columns]
+            data = ([r[key] for _, key in self.proyeccion_columns] for r in rows)
+            return exports.export_response(formato, f'proyeccion_vacaciones_{fecha}', header, data, title='Proyección')
+        return Response({'fecha': fecha, 'hoy': hoy, 'empleados': rows})
+
+    historial_columns = ['Fecha', 'Tipo', 'Incidencia', 'Días', 'Saldo Anterior', 'Saldo Actual', 'Desglose', 'Contrato']
+
+    def _historial_rows(self, empleados):
+        # One employee's kardex at a time, so memory does not grow with the roster
+        for emp in empleados:
+            emp_name = f"{emp.nombres} {emp.apellido_paterno} {emp.apellido_materno or ''}".strip()
+            for e in self._calculate_saldo_data(emp)['historial']:
+                yield (
+                    emp.ci, emp_name, e['fecha'], e['tipo'], e['incidencia'], e['dias'],
+                    e['saldo_anterior'], e['saldo_actual'], e['desglose'], e['contrato'],
+                )
+
+    @action(detail=False, methods=['get'], url_path='historial/exportar')
+    def exportar_historial(self, request):
+        """Historial (kardex) de vacaciones de ?empleado_id=, del propio usuario o, con ?todos=true, de todos."""
+        formato = _export_format(request)
+        if formato is None: return Response(FORMATO_ERROR, status=400)
+        user = request.user
+        empleado_id = request.query_params.get('empleado_id')
+        if request.query_params.get('todos') == 'true':
+            if not (user.is_superuser or user.groups.filter(name__in=['Admin', 'RRHH']).exists()):
+                return Response({'error': 'No tienes permiso.'}, status=403)
+            empleados = chain.from_iterable(keyset_chunks(
+                Empleado.objects.order_by('apellido_paterno', 'apellido_materno', 'nombres', 'id'), exports.CHUNK_SIZE,
+            ))
+            filename = 'historial_vacaciones'
+        elif empleado_id:
+            if not (user.is_superuser or user.groups.filter(name__in=['Admin', 'RRHH', 'Jefe de Departamento']).exists()):
+                 return Response({'error': 'No tienes permiso.'}, status=403)
+            try: empleado = Empleado.objects.get(pk=empleado_id)
+            except (Empleado.DoesNotExist, ValueError): return Response({'error': 'No existe.'}, status=404)
+            empleados = [empleado]
+            filename = f'historial_vacaciones_{empleado.ci}'
+        else:
+            if not hasattr(user, 'empleado'): return Response({'error': 'No tienes un perfil de empleado.'}, status=404)
+            empleados = [user.empleado]
+            filename = f'historial_vacaciones_{user.empleado.ci}'
+
+        header = ['CI', 'Empleado'] + self.historial_columns
+        filename = f'{filename}_{timezone.localdate():%Y%m%d}'
+        return exports.export_response(formato, filename, header, self._historial_rows(empleados), title='Historial Vacaciones')
+
     @action(detail=False, methods=['get'])
     def global_ledger(self, request):
         if not (request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'RRHH']).exists()):
@@ -634,15 +1035,16 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
         dias_pagar = float(data.get('dias_pagar', 0))
         dias_guardar = float(data.get('dias_guardar', 0))
 
-        try:
-            empleado = Empleado.objects.get(pk=empleado_id)
-        except Empleado.DoesNotExist:
-            return Response({'error': 'Empleado no existe.'}, status=404)
-
         from datetime import datetime
         fecha_dt = datetime.strptime(fecha_accion, '%Y-%m-%d').date()
 
         with transaction.atomic():
+            # Same employee lock as liquidar_masivo and new vacations
+            try:
+                empleado = Empleado.objects.select_for_update().get(pk=empleado_id)
+            except Empleado.DoesNotExist:
+                return Response({'error': 'Empleado no existe.'}, status=404)
+
             # 1. Vacación Pagada (Consumo)
             if dias_pagar > 0:
                 SolicitudVacacion.objects.create(
@@ -692,12 +1094,154 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
 
         return Response({'status': 'ok'})
 
+    # Empleados per query in the bulk liquidation (IN lists stay under SQLite's limit)
+    SALDO_CHUNK_SIZE = 900
+
+    def _saldos_bulk(self, empleados):
+        """{empleado_id: saldo} for `empleados`, same as _calculate_saldo_data but with two queries per chunk."""
+        saldos = {}
+        for i in range(0, len(empleados), self.SALDO_CHUNK_SIZE):
+            chunk = empleados[i:i + self.SALDO_CHUNK_SIZE]
+            ids = [e.id for e in chunk]
+            ganados, consumidos = {}, {}
+            for g in VacacionGuardada.objects.filter(empleado_id__in=ids).order_by('fecha', 'id'):
+                ganados.setdefault(g.empleado_id, []).append(g)
+            for s in SolicitudVacacion.objects.filter(empleado_id__in=ids, estado='aprobado').order_by('fecha_inicio', 'id'):
+                consumidos.setdefault(s.empleado_id, []).append(s)
+            for emp in chunk:
+                # Same filters as the per-employee queries (a NULL fecha never passes __gte)
+                start = emp.fecha_ingreso_vigente
+                g = [x for x in ganados.get(emp.id, []) if not start or (x.fecha is not None and x.fecha >= start)]
+                c = [x for x in consumidos.get(emp.id, []) if not start or x.fecha_inicio >= start]
+                saldos[emp.id] = self._calculate_saldo_data(emp, ganados=g, consumidos=c)['saldo']
+        return saldos
+
+    @action(detail=False, methods=['post'])
+    def liquidar_masivo(self, request):
+        """
+        Liquidación de fin de periodo de varios empleados a la vez:
+        {"liquidaciones": [{"empleado_id", "dias_pagar", "dias_guardar", "nueva_fecha"}, ...]}.
+        Mismo efecto que `liquidar` por cada uno, validado contra el saldo actual
+        y escrito todo o nada en una transacción, con los empleados bloqueados.
+        """
+        if not (request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'RRHH']).exists()):
+            return Response({'error': 'No tienes permiso.'}, status=403)
+
+        items = request.data.get('liquidaciones')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Envía una lista de liquidaciones.'}, status=400)
+
+        errores = []
+        parsed = []
+        for i, item in enumerate(items):
+            try:
+                empleado_id = int(item.get('empleado_id'))
+                dias_pagar = float(item.get('dias_pagar') or 0)
+                dias_guardar = float(item.get('dias_guardar') or 0)
+                fecha = date.fromisoformat(item['nueva_fecha']) if item.get('nueva_fecha') else date.today()
+            except (AttributeError, TypeError, ValueError):
+                errores.append({'indice': i, 'error': 'Datos inválidos.'})
+                continue
+            if dias_pagar < 0 or dias_guardar < 0:
+                errores.append({'indice': i, 'empleado_id': empleado_id, 'error': 'Los días no pueden ser negativos.'})
+                continue
+            parsed.append((i, empleado_id, dias_pagar, dias_guardar, fecha))
+
+        seen = set()
+        for i, empleado_id, *_ in parsed:
+            if empleado_id in seen:
+                errores.append({'indice': i, 'empleado_id': empleado_id, 'error': 'Empleado repetido en la lista.'})
+            seen.add(empleado_id)
+
+        with transaction.atomic():
+            # Balances are read and spent under the employees' row locks (taken in
+            # pk order), so a concurrent liquidation or vacation waits for this one
+            empleados = {e.pk: e for e in Empleado.objects.select_for_update().filter(pk__in=seen).order_by('pk')}
+            saldos = self._saldos_bulk(list(empleados.values()))
+            for i, empleado_id, dias_pagar, dias_guardar, fecha in parsed:
+                if empleado_id not in empleados:
+                    errores.append({'indice': i, 'empleado_id': empleado_id, 'error': 'Empleado no existe.'})
+                elif round(dias_pagar + dias_guardar, 1) > saldos[empleado_id]:
+                    errores.append({
+                        'indice': i, 'empleado_id': empleado_id,
+                        'error': f'Saldo insuficiente: {saldos[empleado_id]} días disponibles.',
+                    })
+            if errores:
+                errores.sort(key=lambda e: e['indice'])
+                transaction.set_rollback(True)
+                return Response({'error': 'No se realizó ninguna liquidación.', 'detalles': errores}, status=400)
+
+            aprobador = request.user.empleado if hasattr(request.user, 'empleado') else None
+            now = timezone.now()
+            solicitudes, guardadas, por_fecha = [], [], {}
+            for _, empleado_id, dias_pagar, dias_guardar, fecha in parsed:
+                consumo = dict(
+                    empleado_id=empleado_id, fecha_inicio=fecha, fecha_fin=fecha, estado='aprobado',
+                    fecha_aprobacion=now, aprobador=aprobador,
+                )
+                if dias_pagar > 0:
+                    solicitudes.append(SolicitudVacacion(dias_calculados=dias_pagar, observacion="Liquidación - Vacación Pagada", **consumo))
+                if dias_guardar > 0:
+                    solicitudes.append(SolicitudVacacion(dias_calculados=dias_guardar, observacion="Liquidación - Traspaso a Guardadas", **consumo))
+                    guardadas.append(VacacionGuardada(
+                        empleado_id=empleado_id, dias=dias_guardar, fecha=fecha, gestion="Traspaso de Antiguos Saldos",
+                    ))
+                por_fecha.setdefault(fecha, []).append(empleado_id)
+
+            SolicitudVacacion.objects.bulk_create(solicitudes, batch_size=500)
+            VacacionGuardada.objects.bulk_create(guardadas, batch_size=500)
+            # One UPDATE per distinct fecha (usually a single one for a period close)
+            contratos = 0
+            for fecha, ids in por_fecha.items():
+                for j in range(0, len(ids), self.SALDO_CHUNK_SIZE):
+                    vigentes = Contrato.objects.filter(
+                        empleado_id__in=ids[j:j + self.SALDO_CHUNK_SIZE], estado_contrato='vigente',
+                    )
+                    finalizados = list(vigentes.values_list('id', 'fecha_fin'))
+                    contratos += vigentes.update(estado_contrato='finalizado', fecha_fin=fecha, updated_at=now)
+                    for contrato_id, fecha_fin in finalizados:
+                        audit.record(Contrato, contrato_id, 'modificar', {
+                            'estado_contrato': ['vigente', 'finalizado'], 'fecha_fin': [fecha_fin, fecha],
+                        })
+            ids = list(empleados)
+            for j in range(0, len(ids), self.SALDO_CHUNK_SIZE):
+                Empleado.objects.filter(pk__in=ids[j:j + self.SALDO_CHUNK_SIZE]).update(estado='inactivo', updated_at=now)
+
+            # bulk_create and update() send no signals
+            for obj in (*solicitudes, *guardadas):
+                audit.on_save(type(obj), obj, created=True)
+            for empleado in empleados.values():
+                if empleado.estado != 'inactivo':
+                    audit.record(Empleado, empleado.pk, 'modificar', {'estado': [empleado.estado, 'inactivo']})
+
+            # update() sends no post_save: invalidate what the signals would have
+            for model in (Empleado, Contrato):
+                transaction.on_commit(lambda model=model: catalog_cache.bump_version(model))
+
+        return Response({
+            'status': 'ok',
+            'liquidados': len(parsed),
+            'solicitudes_creadas': len(solicitudes),
+            'guardadas_creadas': len(guardadas),
+            'contratos_finalizados': contratos,
+        })
+
+    @transaction.atomic
     def perform_create(self, serializer):
         data = self.request.data
-        empleado = Empleado.objects.get(pk=data.get('empleado'))
+        # Locked so the vacation cannot slip between liquidar_masivo's balance check and its write
+        empleado = Empleado.objects.select_for_update().get(pk=data.get('empleado'))
         from datetime import datetime, timedelta
         start = datetime.strptime(data.get('fecha_inicio'), '%Y-%m-%d').date()
         end = datetime.strptime(data.get('fecha_fin'), '%Y-%m-%d').date()
+        if end < start: raise serializers.ValidationError({'fecha_fin': 'La fecha fin no puede ser anterior a la de inicio.'})
+        _check_conflicts(conflicts.vacacion(None, empleado.id, start, end))
+        faltas = ausencias.staffing_shortfalls(empleado, start, end)
+        if faltas:
+            raise serializers.ValidationError({'minimo_personal': [
+                f"{empleado.departamento.nombre} quedaría con {presentes} presentes (mínimo {minimo}) el {dia}"
+                for dia, presentes, minimo in faltas
+            ]})
         es_medio_dia = data.get('es_medio_dia', False)
         dias = 0.5 if es_medio_dia else 0.0
         if not es_medio_dia:
@@ -716,3 +1260,34 @@ class SolicitudVacacionViewSet(viewsets.ModelViewSet):
         sol.estado = 'anulado'
         sol.save()
         return Response(self.get_serializer(sol).data)
+
+class AuditEntryViewSet(StreamingListMixin, TimedSerializationMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Historial de cambios. Filtros: ?modelo= (empleado, contrato, permiso, horaextra,
+    solicitudvacacion, vacacionguardada) con ?objeto_id=, ?actor= (id de usuario) y ?desde= / ?hasta=.
+    """
+    serializer_class = AuditEntrySerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = OptionalPagination
+    modelos = {m._meta.model_name: m._meta.label_lower for m in AUDITED_MODELS}
+
+    def get_queryset(self):
+        qs = AuditEntry.objects.select_related('actor').order_by('-fecha', '-id')
+        params = self.request.query_params
+        try:
+            modelo = params.get('modelo')
+            if modelo:
+                if modelo not in self.modelos and modelo not in self.modelos.values():
+                    raise ValueError
+                qs = qs.filter(modelo=self.modelos.get(modelo, modelo))
+                if params.get('objeto_id'): qs = qs.filter(objeto_id=int(params['objeto_id']))
+            elif params.get('objeto_id'):
+                raise ValueError
+            if params.get('actor'): qs = qs.filter(actor_id=int(params['actor']))
+            desde, hasta = _period(self.request)
+        except ValueError:
+            raise serializers.ValidationError({'error': 'Filtros inválidos: objeto_id requiere modelo, y los ids y fechas deben ser válidos.'})
+        # Datetime bounds rather than fecha__date, so the (…, fecha) indexes apply
+        if desde: qs = qs.filter(fecha__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+        if hasta: qs = qs.filter(fecha__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min)))
+        return qs
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.PerformanceMiddleware',
+    'api.middleware.NPlusOneMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.AuditMiddleware',
 ]
 
 ROOT_URLCONF = 'rrhh_backend.urls'
@@ -92,6 +95,28 @@ DATABASES = {
     )
 }
 
+# The Neon pooler (pgbouncer, transaction mode) cannot keep the server-side
+# cursors that .iterator() opens on PostgreSQL across statements. The
+# streamed lists (?stream=ndjson) and the exports read with keyset queries
+# instead (api.pagination.keyset_chunks); the batch commands that still use
+# .iterator() get each result buffered client-side. May be set to False when
+# connecting to PostgreSQL directly.
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = config('DISABLE_SERVER_SIDE_CURSORS', default=True, cast=bool)
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Must be shared by all gunicorn workers (database by default, Redis/Memcached
+# also work) so catalog version bumps are seen everywhere. The table is created
+# by the api migrations (createcachetable).
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='rrhh_cache'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -148,6 +173,46 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Per-request Server-Timing header and /api/metrics/ histograms
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', default=True, cast=bool)
+
+# N+1 query detection: 'off', 'log' or 'raise' (see api/nplusone.py)
+NPLUSONE_DETECTION = config('NPLUSONE_DETECTION', default='off')
+NPLUSONE_THRESHOLD = config('NPLUSONE_THRESHOLD', default=5, cast=int)
+
+# Delta sync (?updated_since=): deletions are remembered this many days; older
+# clients get 410 and must reload the full collection.
+DELTA_SYNC_RETENTION_DAYS = config('DELTA_SYNC_RETENTION_DAYS', default=30, cast=int)
+
+# Rows allowed in one ?no_pagination=true list (0 = no cap); larger lists are
+# paged (?page=, ?cursor=) or streamed (?stream=ndjson)
+NO_PAGINATION_MAX_ROWS = config('NO_PAGINATION_MAX_ROWS', default=20000, cast=int)
+
+# Contracts whose fecha_fin_pactada falls within this many days are listed in
+# /api/contratos/vencimientos/ and in the notify_contract_expiry digest.
+CONTRATOS_AVISO_DIAS = config('CONTRATOS_AVISO_DIAS', default=30, cast=int)
+
+# Periodic jobs (manage.py run_jobs, see api/jobs.py): idle wait between
+# passes, and days of run history kept
+JOBS_POLL_SECONDS = config('JOBS_POLL_SECONDS', default=30, cast=int)
+JOBS_HISTORIAL_DIAS = config('JOBS_HISTORIAL_DIAS', default=90, cast=int)
+# Zone the cron schedules are written in ("0 8 * * 1-6" is 8:00 there);
+# TIME_ZONE stays UTC for storage
+JOBS_TIME_ZONE = config('JOBS_TIME_ZONE', default='America/La_Paz')
+
+# Closed permisos / horas extras older than this many days are moved to the
+# archive tables (manage.py archive_history, monthly from run_jobs); lists
+# show them with ?include_archived=true
+ARCHIVO_HORIZONTE_DIAS = config('ARCHIVO_HORIZONTE_DIAS', default=730, cast=int)
+
+# Monthly hours allowed per employee for each tipo_permiso, checked when a
+# permiso is requested (pendiente and aprobado count); 0 = no cap
+PERMISO_TOPE_HORAS_MES = {
+    'trabajo': config('PERMISO_TOPE_TRABAJO', default=0, cast=float),
+    'personal': config('PERMISO_TOPE_PERSONAL', default=0, cast=float),
+    'hora_almuerzo': config('PERMISO_TOPE_HORA_ALMUERZO', default=0, cast=float),
+}
+
 # Media files (User-uploaded files)
 # https://docs.djangoproject.com/en/6.0/topics/files/
 
@@ -173,3 +238,8 @@ WHATSAPP_API_URL = 'https://graph.facebook.com/v22.0'
 WHATSAPP_TOKEN = config('WHATSAPP_TOKEN')
 WHATSAPP_PHONE_ID = config('WHATSAPP_PHONE_ID')
 
+# Employees with preferencia_notificacion='resumen' get one WhatsApp message
+# with everything that arrived in this many minutes (api.notificaciones,
+# sent by the enviar_resumenes job)
+NOTIFICACIONES_RESUMEN_MINUTOS = config('NOTIFICACIONES_RESUMEN_MINUTOS', default=60, cast=int)
+